@@ -3,11 +3,31 @@
 from __future__ import annotations
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP, Platform
+from homeassistant.core import Event, HomeAssistant
 
+from .board_coordinator import BoardCoordinator
 from .client import NationalRailClient
-from .const import DOMAIN, NATIONAL_RAIL_DATA_CLIENT
+from .const import (
+    BOARD_COORDINATORS,
+    CONF_HISTORY_DAYS,
+    DEFAULT_HISTORY_DAYS,
+    DOMAIN,
+    HISTORY_DATABASE,
+    HISTORY_ENTRIES,
+    HISTORY_UNSUB_STOP,
+    NATIONAL_RAIL_DATA_CLIENT,
+)
+from .history_store import HistoryStore
+from .journey_coordinator import (
+    JourneyPlannerCoordinator,
+    async_release_itinerary_cache,
+)
+from .push_feed import async_release_push_feed
+from .services import async_setup_services
+from .snapshot import async_remove_snapshots
+from .stations import get_registry
+from .websocket import async_setup_websocket
 
 PLATFORMS = [Platform.SENSOR]
 
@@ -20,6 +40,48 @@ def setup(hass: HomeAssistant, config):
     return True
 
 
+def _setup_history(
+    hass: HomeAssistant, client: NationalRailClient, entry_id: str, days: int
+) -> None:
+    """Attach the history store to the shared client, once for every entry"""
+    entries = hass.data[DOMAIN].setdefault(HISTORY_ENTRIES, {})
+    entries[entry_id] = days
+    store = client.history_store
+    if store is not None:
+        # Entries share the database, the longest retention wins
+        store.retention_days = max(entries.values())
+        return
+
+    store = HistoryStore(hass.config.path(HISTORY_DATABASE), days)
+    client.attach_history(store)
+
+    async def _close(_event: Event) -> None:
+        await store.async_close()
+
+    hass.data[DOMAIN][HISTORY_UNSUB_STOP] = hass.bus.async_listen_once(
+        EVENT_HOMEASSISTANT_STOP, _close
+    )
+
+
+async def _async_release_history(
+    hass: HomeAssistant, client: NationalRailClient, entry_id: str
+) -> None:
+    """Stop recording the history once no entry keeps it"""
+    entries = hass.data[DOMAIN].get(HISTORY_ENTRIES, {})
+    if entries.pop(entry_id, None) is None:
+        return
+    store = client.history_store
+    if store is None:
+        return
+    if entries:
+        store.retention_days = max(entries.values())
+        return
+
+    client.attach_history(None)
+    hass.data[DOMAIN].pop(HISTORY_UNSUB_STOP)()
+    await store.async_close()
+
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up National Rail UK from a config entry."""
 
@@ -31,6 +93,32 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     # TODO 3. Store an API object for your platforms to access
     # hass.data[DOMAIN][entry.entry_id] = MyApi(...)
 
+    # The station registry decodes every record of the dataset when first
+    # used, which must not happen on the event loop
+    await hass.async_add_executor_job(get_registry)
+
+    # The sensors start from the last snapshot, the first live refreshes run
+    # in the background so a slow API does not hold the setup back
+    board = BoardCoordinator(hass, entry)
+    await board.snapshot.async_restore()
+    await board.async_restore_punctuality()
+    hass.data[DOMAIN].setdefault(BOARD_COORDINATORS, {})[entry.entry_id] = board
+
+    if days := int(entry.data.get(CONF_HISTORY_DAYS, DEFAULT_HISTORY_DAYS)):
+        _setup_history(hass, board.client, entry.entry_id, days)
+
+    journey = JourneyPlannerCoordinator(hass, entry)
+    await journey.snapshot.async_restore()
+    hass.data[DOMAIN][entry.entry_id] = journey
+
+    for coordinator in (board, journey):
+        entry.async_create_background_task(
+            hass, coordinator.async_refresh(), f"{DOMAIN} {coordinator.name} refresh"
+        )
+
+    await async_setup_services(hass)
+    async_setup_websocket(hass)
+
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
     return True
@@ -39,7 +127,17 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
-        # hass.data[DOMAIN].pop(entry.entry_id)
-        pass
+        hass.data[DOMAIN].pop(entry.entry_id, None)
+        board = hass.data[DOMAIN].get(BOARD_COORDINATORS, {}).pop(entry.entry_id, None)
+        if board is not None and board.feed is not None:
+            await async_release_push_feed(hass, entry.data)
+        if board is not None:
+            await _async_release_history(hass, board.client, entry.entry_id)
+        async_release_itinerary_cache(hass)
 
     return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Delete the snapshots of a removed entry."""
+    await async_remove_snapshots(hass, entry.entry_id)
@@ -0,0 +1,147 @@
+"""Coordinator for the live station boards"""
+
+from __future__ import annotations
+
+import datetime as dt
+import logging
+from typing import Any, Dict, List
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.update_coordinator import UpdateFailed
+
+from .board_diff import diff_boards
+from .boards import extrapolate_board
+from .client import NationalRailClient, NationalRailClientException
+from .const import (
+    CONF_DESTINATIONS,
+    CONF_STATION,
+    CONF_TOKEN,
+    DOMAIN,
+    EVENT_BOARD_CHANGE,
+    HIGH_FREQUENCY_REFRESH,
+    NATIONAL_RAIL_DATA_CLIENT,
+    POLLING_INTERVAL,
+    PUNCTUALITY_HALF_LIFE,
+    PUNCTUALITY_SAVE_DELAY,
+    PUSH_REFRESH,
+)
+from .freshness import StaleWhileRevalidateCoordinator
+from .punctuality import PunctualityTracker
+from .push_feed import async_get_push_feed
+from .snapshot import (
+    SNAPSHOT_BOARD,
+    SNAPSHOT_PUNCTUALITY,
+    CoordinatorSnapshot,
+    snapshot_store,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class BoardCoordinator(StaleWhileRevalidateCoordinator):
+    """Coordinator that fetches the arrival/departure boards of one station.
+
+    When the entry sets a push broker the boards are materialised from its
+    messages instead, and refreshed as soon as one changes the station.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry) -> None:
+        super().__init__(
+            hass,
+            _LOGGER,
+            entry,
+            name="National Rail Board",
+            update_interval=dt.timedelta(minutes=POLLING_INTERVAL),
+        )
+        self.station: str = entry.data.get(CONF_STATION)
+        self.destinations: List[str] = entry.data.get(CONF_DESTINATIONS) or []
+        self.snapshot = CoordinatorSnapshot(hass, self, SNAPSHOT_BOARD)
+        self.punctuality = PunctualityTracker(PUNCTUALITY_HALF_LIFE)
+        self._punctuality_store = snapshot_store(
+            hass, SNAPSHOT_PUNCTUALITY, entry.entry_id
+        )
+        self.feed = async_get_push_feed(hass, entry.data)
+        if self.feed is not None:
+            self.update_interval = dt.timedelta(minutes=PUSH_REFRESH)
+            entry.async_on_unload(
+                self.feed.async_add_listener(self.station, self._pushed)
+            )
+
+    @property
+    def client(self) -> NationalRailClient:
+        """The client shared by every entry"""
+        domain_data = self.hass.data.setdefault(DOMAIN, {})
+        if NATIONAL_RAIL_DATA_CLIENT not in domain_data:
+            domain_data[NATIONAL_RAIL_DATA_CLIENT] = NationalRailClient(self.hass)
+        return domain_data[NATIONAL_RAIL_DATA_CLIENT]
+
+    @callback
+    def _pushed(self) -> None:
+        """A message changed the station, the debouncer batches bursts"""
+        self.hass.async_create_task(self.async_request_refresh())
+
+    async def _async_fetch_data(self) -> Dict[str, Any]:
+        if self.feed is not None:
+            if not self.feed.boards and self.data is not None:
+                # Nothing received yet, the restored board is served as stale
+                raise UpdateFailed("No message received from the push feed yet")
+            data = self.feed.boards.board(self.station, self.destinations)
+            self.client.record_history(self.station, data)
+            self._observe(data)
+            return data
+
+        client = self.client
+        await client.set_header(self.entry.data[CONF_TOKEN])
+
+        try:
+            data = await client.async_get_data(self.station, self.destinations)
+        except NationalRailClientException as err:
+            raise UpdateFailed(str(err)) from err
+
+        self._observe(data)
+        self.update_interval = self._next_interval(data)
+        return data
+
+    def _extrapolate(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        return extrapolate_board(data, dt.datetime.now(dt.timezone.utc))
+
+    def _observe(self, data: Dict[str, Any]) -> None:
+        """Fire the changes of a live board and count the departed trains"""
+        # A restored board may be hours old, its changes would be replayed
+        if self.freshness.restored_at is None:
+            self._fire_deltas(data)
+        if self.punctuality.observe(data):
+            self._punctuality_store.async_delay_save(
+                self.punctuality.as_dict, PUNCTUALITY_SAVE_DELAY
+            )
+
+    async def async_restore_punctuality(self) -> None:
+        """Load the punctuality statistics saved before the restart"""
+        saved = await self._punctuality_store.async_load()
+        if saved:
+            self.punctuality.restore(saved)
+
+    def _fire_deltas(self, data: Dict[str, Any]) -> None:
+        """Fire one bus event per change since the previous board"""
+        for delta in diff_boards(self.data, data):
+            self.hass.bus.async_fire(
+                EVENT_BOARD_CHANGE,
+                {"entry_id": self.entry.entry_id, "station": self.station, **delta},
+            )
+
+    def _next_interval(self, data: Dict[str, Any]) -> dt.timedelta:
+        """Poll faster when a departure is close or a train is disrupted"""
+        now = dt.datetime.now(dt.timezone.utc)
+        horizon = dt.timedelta(minutes=HIGH_FREQUENCY_REFRESH)
+
+        for dest in data.get("dests", {}).values():
+            for train in (dest.get("Departure") or {}).get("trains", []):
+                if train["perturbation"]:
+                    return dt.timedelta(minutes=1)
+                expected = train["expected"]
+                if not isinstance(expected, dt.datetime):
+                    expected = train["scheduled"]
+                if expected is not None and expected - now < horizon:
+                    return dt.timedelta(minutes=1)
+
+        return dt.timedelta(minutes=POLLING_INTERVAL)
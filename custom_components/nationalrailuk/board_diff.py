@@ -0,0 +1,153 @@
+"""Structural diffing of successive processed boards"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+DELTA_NEW = "new"
+DELTA_REMOVED = "removed"
+DELTA_EXPECTED_CHANGED = "expected_changed"
+DELTA_PLATFORM_ASSIGNED = "platform_assigned"
+DELTA_PLATFORM_CHANGED = "platform_changed"
+DELTA_CANCELLED = "cancelled"
+DELTA_PERTURBATION = "perturbation"
+
+DIRECTIONS = ("Arrival", "Departure")
+
+
+def service_key(train: Dict[str, Any]):
+    """Identity of a train on a board.
+
+    The serviceID is stable for the lifetime of a service; older payloads
+    without it fall back to the timetable details.
+    """
+    service_id = train.get("serviceID")
+    if service_id:
+        return service_id
+    return (train.get("scheduled"), train.get("origin"), train.get("destination"))
+
+
+def _serialise(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _delta(kind, destination, direction, train, old=None, new=None) -> Dict[str, Any]:
+    key = service_key(train)
+    return {
+        "type": kind,
+        "destination": destination,
+        "direction": direction,
+        "service_id": key if isinstance(key, str) else None,
+        "scheduled": _serialise(train.get("scheduled")),
+        "origin": train.get("origin"),
+        "terminus": train.get("destination"),
+        "old": _serialise(old),
+        "new": _serialise(new),
+    }
+
+
+def _trains(board: Optional[Dict[str, Any]], destination, direction) -> List[Dict]:
+    if not board:
+        return []
+    dest = board.get("dests", {}).get(destination) or {}
+    return (dest.get(direction) or {}).get("trains", [])
+
+
+def diff_trains(
+    destination: str,
+    direction: str,
+    old_trains: List[Dict[str, Any]],
+    new_trains: List[Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    """Compare two train lists of the same board view"""
+    deltas = []
+    previous = {service_key(train): train for train in old_trains}
+    seen = set()
+
+    for train in new_trains:
+        key = service_key(train)
+        seen.add(key)
+        before = previous.get(key)
+        if before is None:
+            deltas.append(_delta(DELTA_NEW, destination, direction, train))
+            continue
+
+        if before.get("expected") != train.get("expected"):
+            deltas.append(
+                _delta(
+                    DELTA_EXPECTED_CHANGED,
+                    destination,
+                    direction,
+                    train,
+                    before.get("expected"),
+                    train.get("expected"),
+                )
+            )
+
+        old_platform = before.get("platform")
+        new_platform = train.get("platform")
+        if old_platform != new_platform and new_platform:
+            kind = DELTA_PLATFORM_CHANGED if old_platform else DELTA_PLATFORM_ASSIGNED
+            deltas.append(
+                _delta(kind, destination, direction, train, old_platform, new_platform)
+            )
+
+        if train.get("isCancelled") and not before.get("isCancelled"):
+            deltas.append(
+                _delta(
+                    DELTA_CANCELLED,
+                    destination,
+                    direction,
+                    train,
+                    False,
+                    True,
+                )
+            )
+
+        if bool(before.get("perturbation")) != bool(train.get("perturbation")):
+            deltas.append(
+                _delta(
+                    DELTA_PERTURBATION,
+                    destination,
+                    direction,
+                    train,
+                    bool(before.get("perturbation")),
+                    bool(train.get("perturbation")),
+                )
+            )
+
+    for key, train in previous.items():
+        if key not in seen:
+            deltas.append(_delta(DELTA_REMOVED, destination, direction, train))
+
+    return deltas
+
+
+def diff_boards(
+    old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """Compare two boards as returned by NationalRailClient.process_data
+
+    Every destination and direction is compared independently, keyed on the
+    service identity, so the same train showing on two boards yields a delta
+    for each of them.
+    """
+    if not old or not new:
+        return []
+
+    deltas = []
+    destinations = set(old.get("dests", {})) | set(new.get("dests", {}))
+    for destination in sorted(destinations):
+        for direction in DIRECTIONS:
+            deltas.extend(
+                diff_trains(
+                    destination,
+                    direction,
+                    _trains(old, destination, direction),
+                    _trains(new, destination, direction),
+                )
+            )
+    return deltas
@@ -0,0 +1,185 @@
+"""Station boards maintained incrementally from per-service updates
+
+Each board view (destination and direction of a station) keeps its rows in
+a list ordered on the expected time, with a dict from service to row. An
+upsert or removal finds the row by bisection instead of rebuilding and
+sorting the view, and only the rows that actually changed are reported.
+
+This module has no dependency, so script/bench_boards.py can load it alone.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+import datetime as dt
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+DIRECTIONS = ("Arrival", "Departure")
+
+# (sort time, service id) of a row
+RowKey = Tuple[float, str]
+# (destination, direction) of a view
+ViewKey = Tuple[str, str]
+
+
+class RowChange(NamedTuple):
+    """A row added, changed or removed (train is None) on a board view"""
+
+    station: str
+    destination: str
+    direction: str
+    service_id: str
+    train: Optional[Dict[str, Any]]
+
+
+def sort_time(train: Dict[str, Any]) -> float:
+    """Position of a train on its board, the expected time when known"""
+    expected = train.get("expected")
+    if not isinstance(expected, dt.datetime):
+        expected = train.get("scheduled")
+    return expected.timestamp() if isinstance(expected, dt.datetime) else float("inf")
+
+
+class BoardView:
+    """The rows of one destination and direction, ordered on sort_time"""
+
+    __slots__ = ("keys", "rows")
+
+    def __init__(self) -> None:
+        self.keys: List[RowKey] = []
+        self.rows: Dict[str, Tuple[RowKey, Dict[str, Any]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def upsert(self, service_id: str, train: Dict[str, Any]) -> bool:
+        """Add or replace the row of a service, False if it was unchanged"""
+        known = self.rows.get(service_id)
+        if known is not None:
+            if known[1] == train:
+                return False
+            self._unlink(known[0])
+        key = (sort_time(train), service_id)
+        insort(self.keys, key)
+        self.rows[service_id] = (key, train)
+        return True
+
+    def remove(self, service_id: str) -> bool:
+        """Remove the row of a service, False if there was none"""
+        known = self.rows.pop(service_id, None)
+        if known is None:
+            return False
+        self._unlink(known[0])
+        return True
+
+    def _unlink(self, key: RowKey) -> None:
+        index = bisect_left(self.keys, key)
+        del self.keys[index]
+
+    def trains(self, since: Optional[float], rows: int) -> List[Dict[str, Any]]:
+        """The first rows trains expected at or after since"""
+        start = bisect_left(self.keys, (since, "")) if since is not None else 0
+        return [
+            self.rows[service_id][1]
+            for _, service_id in self.keys[start : start + rows]
+        ]
+
+
+class StationBoard:
+    """The views of one station, one per destination and direction"""
+
+    def __init__(self, station: str) -> None:
+        self.station = station
+        self.name: Optional[str] = None
+        self.views: Dict[ViewKey, BoardView] = {}
+
+    @property
+    def destinations(self) -> Set[str]:
+        return {destination for destination, _ in self.views}
+
+    def add_destination(self, destination: str) -> None:
+        for direction in DIRECTIONS:
+            self.views.setdefault((destination, direction), BoardView())
+
+
+class BoardMaterialiser:
+    """Boards of the subscribed stations, keyed by CRS code"""
+
+    def __init__(self) -> None:
+        self.boards: Dict[str, StationBoard] = {}
+
+    def subscribe(self, station: str, destinations: Iterable[str]) -> List[str]:
+        """Maintain the views of station, return the destinations just added"""
+        board = self.boards.get(station)
+        if board is None:
+            board = self.boards[station] = StationBoard(station)
+        added = [d for d in destinations if d not in board.destinations]
+        for destination in added:
+            board.add_destination(destination)
+        return added
+
+    def apply(
+        self,
+        station: str,
+        service_id: str,
+        rows: Dict[ViewKey, Optional[Dict[str, Any]]],
+    ) -> List[RowChange]:
+        """Upsert the rows of a service on the views of a station
+
+        rows maps (destination, direction) to the train to show, or None to
+        take the service off that view. Views missing from rows are left
+        alone, the rows unchanged are not reported.
+        """
+        board = self.boards.get(station)
+        if board is None:
+            return []
+        changes = []
+        for (destination, direction), train in rows.items():
+            view = board.views.get((destination, direction))
+            if view is None:
+                continue
+            if train is None:
+                changed = view.remove(service_id)
+            else:
+                changed = view.upsert(service_id, train)
+            if changed:
+                changes.append(
+                    RowChange(station, destination, direction, service_id, train)
+                )
+        return changes
+
+    def remove(self, station: str, service_id: str) -> List[RowChange]:
+        """Take a service off every view of a station"""
+        board = self.boards.get(station)
+        if board is None:
+            return []
+        return self.apply(station, service_id, dict.fromkeys(board.views))
+
+    def board(
+        self,
+        station: str,
+        destinations: Iterable[str],
+        rows: int,
+        since: Optional[dt.datetime] = None,
+    ) -> Dict[str, Any]:
+        """The views of a station in the process_data structure
+
+        Trains expected before since are left out.
+        """
+        board = self.boards.get(station)
+        res: Dict[str, Any] = {"dests": {}, "station": board.name if board else None}
+        start = since.timestamp() if since is not None else None
+
+        for destination in destinations:
+            view: Dict[str, Any] = {"messages": ""}
+            for direction in DIRECTIONS:
+                rows_view = board.views.get((destination, direction)) if board else None
+                trains = rows_view.trains(start, rows) if rows_view else []
+                # Rows are shared with the materialiser, copy them like
+                # process_data copies the records of its services
+                trains = [dict(train) for train in trains]
+                view[direction] = {"trains": trains} if trains else {}
+                if trains and "displayName" not in view:
+                    view["displayName"] = trains[0]["otherEnd"]["locationName"]
+            res["dests"][destination] = view
+        return res
@@ -0,0 +1,161 @@
+"""Helpers to read and render the processed station boards"""
+
+from __future__ import annotations
+
+from datetime import datetime
+import heapq
+from itertools import groupby, islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from homeassistant.core import HomeAssistant
+
+from .board_diff import service_key
+from .const import BOARD_COORDINATORS, DOMAIN
+
+
+def epoch(value):
+    """Epoch seconds for a datetime, status strings are passed through"""
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    return value
+
+
+def iso(value):
+    """ISO representation for a datetime, status strings are passed through"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def board_trains(
+    data: Optional[Dict[str, Any]], destination: str, direction: str = "Departure"
+) -> List[Dict[str, Any]]:
+    """Sorted trains of one destination view of a processed board"""
+    if not data:
+        return []
+    dest = data.get("dests", {}).get(destination) or {}
+    return (dest.get(direction) or {}).get("trains", [])
+
+
+def departure_key(train: Dict[str, Any]) -> datetime:
+    """Sort key used for the boards by process_data"""
+    if isinstance(train["expected"], datetime):
+        return train["expected"]
+    return train["scheduled"]
+
+
+def extrapolate_board(data: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    """A board as it should look at now, from its last known times
+
+    Used while the source is offline: the trains due before now are taken
+    to have left, the others keep their last expected or scheduled time.
+    """
+    dests = {}
+    for destination, view in data.get("dests", {}).items():
+        view = dict(view)
+        for direction in ("Arrival", "Departure"):
+            trains = [
+                train
+                for train in (view.get(direction) or {}).get("trains", [])
+                if departure_key(train) >= now
+            ]
+            view[direction] = {"trains": trains} if trains else {}
+        dests[destination] = view
+    return {**data, "dests": dests}
+
+
+def iter_merged_trains(
+    data: Optional[Dict[str, Any]], direction: str = "Departure"
+) -> Iterator[Dict[str, Any]]:
+    """Lazily merge the sorted destination views of a board
+
+    The per-destination lists are already sorted so a k-way heap merge
+    yields the trains in order without sorting everything again. A service
+    serving several destinations shows the same time on each view, so
+    duplicates are folded within each group of equal times and reported
+    once with all their destinations.
+    """
+    if not data:
+        return
+
+    def stream(dest):
+        for train in board_trains(data, dest, direction):
+            yield departure_key(train), dest, train
+
+    streams = [stream(dest) for dest in data.get("dests", {})]
+    merged = heapq.merge(*streams, key=lambda item: item[0])
+
+    for _, group in groupby(merged, key=lambda item: item[0]):
+        services: Dict[Any, Dict[str, Any]] = {}
+        for _, dest, train in group:
+            key = service_key(train)
+            if key in services:
+                services[key]["destinations"].append(dest)
+            else:
+                services[key] = {"train": train, "destinations": [dest]}
+        yield from services.values()
+
+
+def top_departures(
+    data: Optional[Dict[str, Any]], count: int, direction: str = "Departure"
+) -> List[Dict[str, Any]]:
+    """The next `count` trains to any destination, without a full merge"""
+    return [
+        {**compact_train(item["train"]), "destinations": item["destinations"]}
+        for item in islice(iter_merged_trains(data, direction), count)
+    ]
+
+
+def find_board(hass: HomeAssistant, station: str):
+    """Board coordinator monitoring a station"""
+    coordinators = hass.data.get(DOMAIN, {}).get(BOARD_COORDINATORS, {})
+    for coordinator in coordinators.values():
+        if coordinator.station == station:
+            return coordinator
+    return None
+
+
+def compact_train(train: Dict[str, Any]) -> Dict[str, Any]:
+    """Summary of a train without its calling points"""
+    other_end = train.get("otherEnd") or {}
+    return {
+        "service_id": train.get("serviceID"),
+        "scheduled": epoch(train["scheduled"]),
+        "expected": epoch(train["expected"]),
+        "platform": train.get("platform"),
+        "perturbation": train.get("perturbation"),
+        "cancelled": train.get("isCancelled"),
+        "destination": train.get("destination"),
+        "operator": train.get("operator"),
+        "other_end": epoch(other_end.get("atet") or other_end.get("st")),
+    }
+
+
+def compact_summary(trains: Iterable[Dict[str, Any]], count: int) -> List[Dict]:
+    """Summary of the next `count` trains"""
+    summary = []
+    for train in trains:
+        if len(summary) >= count:
+            break
+        summary.append(compact_train(train))
+    return summary
+
+
+def serialise_calling_points(train: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Calling points of a train with JSON friendly times"""
+    return [
+        {key: iso(value) for key, value in point.items()}
+        for point in train.get("callingPoints", [])
+    ]
+
+
+def find_train(hass: HomeAssistant, service_id: str) -> Optional[Dict[str, Any]]:
+    """Look a service up in the in-memory boards of every entry"""
+    coordinators = hass.data.get(DOMAIN, {}).get(BOARD_COORDINATORS, {})
+    for coordinator in coordinators.values():
+        for dest in (coordinator.data or {}).get("dests", {}).values():
+            for direction in ("Departure", "Arrival"):
+                for train in (dest.get(direction) or {}).get("trains", []):
+                    if train.get("serviceID") == service_id:
+                        return train
+    return None
@@ -1,6 +1,7 @@
 """Client for the National Rail API"""
 
 import logging
+import sys
 
 import datetime
 from datetime import datetime, timedelta
@@ -15,7 +16,8 @@ from zeep.transports import AsyncTransport
 
 from homeassistant.core import HomeAssistant
 
-from .const import WSDL
+from .const import DOMAIN, WSDL
+from .history_store import HistoryStore
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -97,6 +99,13 @@ class NationalRailClient:
 
         self.header_value: xsd.Element
 
+        # Services parsed during the current refresh, see _service_record
+        self._services = {}
+
+        self.hass = hass
+        # Optional SQLite history of the observed calls, see attach_history
+        self.history_store: HistoryStore | None = None
+
         # self.apitest = apiTest
 
         # Prepackage the authorisation token
@@ -113,6 +122,23 @@ class NationalRailClient:
         # )
         # self.header_value = header(TokenValue=self.api_token)
 
+    def attach_history(self, store: HistoryStore | None) -> None:
+        """Record the boards fetched from now on into a history store
+
+        None stops the recording.
+        """
+        self.history_store = store
+
+    def record_history(self, station, data):
+        """Buffer the calls of a processed board, written in the background"""
+        store = self.history_store
+        if store is None or not data:
+            return
+        if store.add_board(data, station):
+            self.hass.async_create_background_task(
+                store.async_flush(), f"{DOMAIN} history flush"
+            )
+
     async def set_header(self, api_token):
         """Set the API header info"""
         # Prepackage the authorisation token
@@ -220,7 +246,8 @@ class NationalRailClient:
                 time_est = estimated
                 perturbation = True
             elif estimated == "No report":
-                time_est = rebuild_date(time_base, "00:00")
+                # Passed on without being reported, there is no time
+                time_est = estimated
             else:
                 time_est = rebuild_date(time_base, estimated)
                 delay = (time_est - time_shed).total_seconds() / 60
@@ -235,7 +262,7 @@ class NationalRailClient:
                 time_act = actual
                 perturbation = True
             elif actual == "No report":
-                time_act = rebuild_date(time_base, "00:00")
+                time_act = actual
             else:
                 time_act = rebuild_date(time_base, actual)
                 delay = (time_act - time_shed).total_seconds() / 60
@@ -249,6 +276,108 @@ class NationalRailClient:
             "perturbation": perturbation,
         }
 
+    def _calling_point(self, time_base, callingPoint):
+        """Convert a calling point returned by the api"""
+        cpTimes = self.timeConvert(
+            time_base,
+            callingPoint["st"],
+            callingPoint["et"],
+            callingPoint["at"],
+        )
+
+        if cpTimes["actual"] not in (None, "No report"):
+            atet = cpTimes["actual"]
+        else:
+            atet = cpTimes["estimated"]
+
+        return {
+            "locationName": sys.intern(callingPoint["locationName"]),
+            "crs": sys.intern(callingPoint["crs"]),
+            "st": cpTimes["sheduled"],
+            "et": cpTimes["estimated"],
+            "at": cpTimes["actual"],
+            "atet": atet,
+            "isCancelled": callingPoint["isCancelled"],
+            "cancelReason": callingPoint["cancelReason"],
+        }
+
+    def _service_record(self, time_base, station, location_name, service, ft):
+        """Parse a service once per refresh and register it
+
+        Returns the train without its destination specific fields and the
+        calling points indexed by crs.
+        """
+        key = (service["serviceID"], ft["keyName"])
+        if key in self._services:
+            return self._services[key]
+
+        times = self.timeConvert(
+            time_base,
+            service[ft["sheduledTag"]],
+            service[ft["estimatedTag"]],
+            None,
+        )
+
+        if times["sheduled"] is None and times["estimated"] is None:
+            times["estimated"] = rebuild_date(time_base, "23:59")
+
+        ############################################################
+        # Create full calling point list
+        ############################################################
+        callingPoints = []
+        byCrs = {}
+
+        selectedCallingPoint = {
+            "locationName": sys.intern(location_name),
+            "crs": sys.intern(station),
+            "st": times["sheduled"],
+            "et": times["estimated"],
+            "at": None,
+            "isCancelled": service["isCancelled"],
+            "cancelReason": service["cancelReason"],
+        }
+
+        # Get previous calling points
+        if service["previousCallingPoints"] is not None:
+            for callingPoint in service["previousCallingPoints"]["callingPointList"][
+                0
+            ]["callingPoint"]:
+                point = self._calling_point(time_base, callingPoint)
+                callingPoints.append(point)
+                byCrs[point["crs"]] = point
+
+        # Add out calling point
+        callingPoints.append(selectedCallingPoint)
+
+        # Get subsequent calling points
+        if service["subsequentCallingPoints"] is not None:
+            for callingPoint in service["subsequentCallingPoints"][
+                "callingPointList"
+            ][0]["callingPoint"]:
+                point = self._calling_point(time_base, callingPoint)
+                callingPoints.append(point)
+                byCrs[point["crs"]] = point
+
+        ############################################################
+        # Assign outputs
+        ############################################################
+        train = {}
+        train["serviceID"] = service["serviceID"]
+        train["scheduled"] = times["sheduled"]
+        train["expected"] = times["estimated"]
+        train["origin"] = service["origin"]["location"][0]["locationName"]
+        train["destination"] = service["destination"]["location"][0]["locationName"]
+        train["platform"] = service["platform"]
+        train["perturbation"] = times["perturbation"]
+        train["isCancelled"] = service["isCancelled"]
+        train["operator"] = service["operator"]
+        train["length"] = service["length"]
+        train["callingPoints"] = callingPoints
+
+        record = {"train": train, "byCrs": byCrs}
+        self._services[key] = record
+        return record
+
     def process_data(self, station, destinations, json_message_in):
         """Unpack the data return by the api in a usable format for hass"""
 
@@ -257,6 +386,10 @@ class NationalRailClient:
         res = {}
         res["dests"] = {}
 
+        # Services are parsed once per refresh, whatever the number of
+        # destination boards they show on
+        self._services = {}
+
         # for each in self.destinations:
         for each in destinations:
             res["dests"][each] = {}
@@ -276,143 +409,19 @@ class NationalRailClient:
                     continue
 
                 for service in services_list:
-                    train = {}
-                    # perturbation = False
-
-                    times = self.timeConvert(
+                    record = self._service_record(
                         time_base,
-                        service[ft["sheduledTag"]],
-                        service[ft["estimatedTag"]],
-                        None,
+                        station,
+                        json_message_in[each]["locationName"],
+                        service,
+                        ft,
                     )
 
-                    if times["sheduled"] is None and times["estimated"] is None:
-                        times["estimated"] = rebuild_date(time_base, "23:59")
-
-                    # time = rebuild_date(time_base, service[ft["sheduledTag"]])
-
-                    # if service[ft["estimatedTag"]] == "On time":
-                    #     expected = time
-                    # elif (
-                    #     service[ft["estimatedTag"]] == "Delayed"
-                    #     or service[ft["estimatedTag"]] == "Cancelled"
-                    # ):
-                    #     expected = service[ft["estimatedTag"]]
-                    #     perturbation = True
-                    # else:
-                    #     expected = rebuild_date(time_base, service[ft["estimatedTag"]])
-                    #     delay = (expected - time).total_seconds() / 60
-                    #     if delay > 9:
-                    #         perturbation = True
-
-                    ############################################################
-                    # Create full calling point list
-                    ############################################################
-                    callingPoints = []
-                    otherEnd = {}
-
-                    selectedCallingPoint = [
-                        {
-                            "locationName": json_message_in[each]["locationName"],
-                            "crs": station,
-                            "st": times["sheduled"],
-                            "et": times["estimated"],
-                            "at": None,
-                            "isCancelled": service["isCancelled"],
-                            "cancelReason": service["cancelReason"],
-                        }
-                    ]
-
-                    # Get previous calling points
-                    if service["previousCallingPoints"] is not None:
-                        for callingPoint in service["previousCallingPoints"][
-                            "callingPointList"
-                        ][0]["callingPoint"]:
-                            cpTimes = self.timeConvert(
-                                time_base,
-                                callingPoint["st"],
-                                callingPoint["et"],
-                                callingPoint["at"],
-                            )
-
-                            if cpTimes["actual"] is not None:
-                                atet = cpTimes["actual"]
-                            else:
-                                atet = cpTimes["estimated"]
-
-                            point = [
-                                {
-                                    "locationName": callingPoint["locationName"],
-                                    "crs": callingPoint["crs"],
-                                    "st": cpTimes["sheduled"],
-                                    "et": cpTimes["estimated"],
-                                    "at": cpTimes["actual"],
-                                    "atet": atet,
-                                    "isCancelled": callingPoint["isCancelled"],
-                                    "cancelReason": callingPoint["cancelReason"],
-                                }
-                            ]
-                            callingPoints = callingPoints + point
-
-                            if callingPoint["crs"] == each:
-                                otherEnd = point[0]
-
-                    # Add out calling point
-                    callingPoints = callingPoints + selectedCallingPoint
-
-                    # Get subsequent calling points
-                    if service["subsequentCallingPoints"] is not None:
-                        for callingPoint in service["subsequentCallingPoints"][
-                            "callingPointList"
-                        ][0]["callingPoint"]:
-                            cpTimes = self.timeConvert(
-                                time_base,
-                                callingPoint["st"],
-                                callingPoint["et"],
-                                callingPoint["at"],
-                            )
-
-                            if cpTimes["actual"] is not None:
-                                atet = cpTimes["actual"]
-                            else:
-                                atet = cpTimes["estimated"]
-
-                            point = [
-                                {
-                                    "locationName": callingPoint["locationName"],
-                                    "crs": callingPoint["crs"],
-                                    "st": cpTimes["sheduled"],
-                                    "et": cpTimes["estimated"],
-                                    "at": cpTimes["actual"],
-                                    "atet": atet,
-                                    "isCancelled": callingPoint["isCancelled"],
-                                    "cancelReason": callingPoint["cancelReason"],
-                                }
-                            ]
-                            callingPoints = callingPoints + point
-
-                            if callingPoint["crs"] == each:
-                                otherEnd = point[0]
-
-                    # with open("output.json", "w") as convert_file:
-                    #     convert_file.write(str(otherEnd))
-
-                    ############################################################
-                    # Assign outputs
-                    ############################################################
-                    train["scheduled"] = times["sheduled"]
-                    train["expected"] = times["estimated"]
-                    train["origin"] = service["origin"]["location"][0]["locationName"]
-                    train["destination"] = service["destination"]["location"][0][
-                        "locationName"
-                    ]
-                    train["platform"] = service["platform"]
-                    train["perturbation"] = times["perturbation"]
-                    train["operator"] = service["operator"]
-                    train["length"] = service["length"]
-                    train["callingPoints"] = callingPoints
-
+                    # The base record is shared by every destination view, only
+                    # the far end of the journey is specific to this one
+                    otherEnd = record["byCrs"].get(each)
                     if otherEnd:
+                        train = dict(record["train"])
                         train["otherEnd"] = otherEnd
                         status["trains"].append(train)
 
@@ -438,6 +447,17 @@ class NationalRailClient:
         #     convert_file.write(str(res))
         return res
 
+    async def async_check_token(self):
+        """Check the token with the cheapest call the api offers"""
+        try:
+            await self.client.service.GetDepartureBoard(
+                numRows=1, crs="STP", _soapheaders=[self.header_value]
+            )
+        except Fault as err:
+            if err.message == "Unknown fault occured":
+                raise NationalRailClientInvalidToken("Invalid API token") from err
+            raise NationalRailClientException("Unknown Error") from err
+
     async def async_get_data(self, station, destinations, apitest=False):
         """Data refresh function called by the coordinator"""
         try:
@@ -473,6 +493,8 @@ class NationalRailClient:
             except Exception as err:
                 _LOGGER.exception("Exception whilst processing data: ")
                 raise NationalRailClientException("unexpected data from api") from err
+            # Outside the try, a history failure is no api error
+            self.record_history(station, data)
             return data
 
         return {}
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import hashlib
 import logging
 from typing import Any
 
@@ -15,18 +16,46 @@ from homeassistant.helpers.selector import selector
 
 from .client import (
     NationalRailClient,
-    NationalRailClientInvalidInput,
+    NationalRailClientException,
     NationalRailClientInvalidToken,
 )
 from .const import (
+    ATTRIBUTE_MODE_COMPACT,
+    ATTRIBUTE_MODE_FULL,
+    CONF_ATTRIBUTE_MODE,
     CONF_DESTINATIONS,
+    CONF_HISTORY_DAYS,
+    CONF_ITINERARY_RANK,
+    CONF_OFFLINE_AFTER,
+    CONF_OJP_TOKEN,
+    CONF_OJP_URL,
+    CONF_PUSH_HOST,
+    CONF_PUSH_PASSWORD,
+    CONF_PUSH_PORT,
+    CONF_PUSH_TOPIC,
+    CONF_PUSH_USERNAME,
+    CONF_SUMMARY_TRAINS,
     CONF_STATION,
     CONF_TOKEN,
+    CONF_VERIFY_BOARDS,
+    DEFAULT_HISTORY_DAYS,
+    DEFAULT_OFFLINE_AFTER,
+    DEFAULT_PUSH_PORT,
+    DEFAULT_PUSH_TOPIC,
+    DEFAULT_SUMMARY_TRAINS,
     DOMAIN,
     NATIONAL_RAIL_DATA_CLIENT,
+    PLANNER_LOCAL,
+    PLANNER_OJP,
+    PLANNER_RACE,
+    PLANNER_TRANSPORTAPI,
+    VALIDATED_TOKENS,
 )
 
-from .crs import CRS
+from .planner.ranking import RANK_ARRIVAL, RANKS
+from .station_geo import get_geo_index
+from .station_search import get_search_engine
+from .stations import get_registry
 
 # Journey planner additions (local keys for now)
 CONF_VIA = "via"
@@ -39,90 +68,140 @@ CONF_TRANSPORTAPI_APP_KEY = "transportapi_app_key"
 
 _LOGGER = logging.getLogger(__name__)
 
+# Stations are typed as text and matched against the local station index,
+# only the few candidates of an ambiguous query are sent back to the form
+STATION_FIELDS = (CONF_STATION, CONF_DESTINATIONS, CONF_VIA, CONF_AVOID)
+STATION_CANDIDATES = 10
+
+# Stations further than this from home or a zone are not suggested
+NEARBY_STATION_KM = 5
+
 STEP_USER_DATA_SCHEMA = vol.Schema(
     {
         vol.Required(CONF_TOKEN): str,
-        vol.Required(CONF_STATION): selector(
-            {"select": {"options": CRS, "custom_value": True}}
-        ),
-        vol.Optional(CONF_DESTINATIONS): selector(
-            {"select": {"options": CRS, "multiple": True, "custom_value": True}}
-        ),
+        vol.Required(CONF_STATION): str,
+        # Comma separated codes or names
+        vol.Optional(CONF_DESTINATIONS): str,
         # Journey planner options
-        vol.Optional(CONF_VIA): selector(
-            {"select": {"options": CRS, "custom_value": True}}
-        ),
-        vol.Optional(CONF_AVOID): selector(
-            {"select": {"options": CRS, "custom_value": True}}
-        ),
+        vol.Optional(CONF_VIA): str,
+        vol.Optional(CONF_AVOID): str,
         vol.Optional(CONF_MAX_CHANGES, default=2): int,
         vol.Optional(CONF_MIN_INTERCHANGE_MINS, default=5): int,
-        vol.Optional(CONF_PLANNER_PROVIDER, default="transportapi"): selector(
-            {"select": {"options": ["transportapi", "ojp"], "custom_value": False}}
+        vol.Optional(CONF_ITINERARY_RANK, default=RANK_ARRIVAL): selector(
+            {"select": {"options": list(RANKS), "custom_value": False}}
+        ),
+        vol.Optional(CONF_PLANNER_PROVIDER, default=PLANNER_TRANSPORTAPI): selector(
+            {
+                "select": {
+                    "options": [
+                        PLANNER_TRANSPORTAPI,
+                        PLANNER_OJP,
+                        PLANNER_LOCAL,
+                        PLANNER_RACE,
+                    ],
+                    "custom_value": False,
+                }
+            }
         ),
         vol.Optional(CONF_TRANSPORTAPI_APP_ID): str,
         vol.Optional(CONF_TRANSPORTAPI_APP_KEY): str,
+        vol.Optional(CONF_OJP_URL): str,
+        vol.Optional(CONF_OJP_TOKEN): str,
+        # Board sensor attributes
+        vol.Optional(CONF_ATTRIBUTE_MODE, default=ATTRIBUTE_MODE_COMPACT): selector(
+            {
+                "select": {
+                    "options": [ATTRIBUTE_MODE_COMPACT, ATTRIBUTE_MODE_FULL],
+                    "custom_value": False,
+                }
+            }
+        ),
+        vol.Optional(CONF_SUMMARY_TRAINS, default=DEFAULT_SUMMARY_TRAINS): int,
+        vol.Optional(CONF_VERIFY_BOARDS, default=False): bool,
+        vol.Optional(CONF_OFFLINE_AFTER, default=DEFAULT_OFFLINE_AFTER): vol.All(
+            int, vol.Range(min=1)
+        ),
+        vol.Optional(CONF_HISTORY_DAYS, default=DEFAULT_HISTORY_DAYS): vol.All(
+            int, vol.Range(min=0)
+        ),
+        # Darwin Push Port broker, boards are polled when no host is set
+        vol.Optional(CONF_PUSH_HOST): str,
+        vol.Optional(CONF_PUSH_PORT, default=DEFAULT_PUSH_PORT): int,
+        vol.Optional(CONF_PUSH_USERNAME): str,
+        vol.Optional(CONF_PUSH_PASSWORD): str,
+        vol.Optional(CONF_PUSH_TOPIC, default=DEFAULT_PUSH_TOPIC): str,
     }
 )
 
 
-async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str, Any]:
-    """Validate the user input allows us to connect.
+def _station_options(query: str) -> list[dict[str, str]]:
+    """Select options for the best matches of a query"""
+    return [
+        {"label": f"{result.name} ({result.crs})", "value": result.crs}
+        for result in get_search_engine().search(query, STATION_CANDIDATES)
+    ]
+
+
+def _match_crs(value: Any) -> str | None:
+    """CRS code for a typed code or name, when it matches a single station"""
+    value = str(value).strip()
+    return get_registry().resolve(value) or get_search_engine().best_match(value)
+
+
+def _resolve_crs(value: Any) -> str:
+    """CRS code for a selected station, or for a name typed as a custom value"""
+    return _match_crs(value) or str(value).strip().upper()
 
-    Data has the keys from STEP_USER_DATA_SCHEMA with values provided by the user.
-    """
-    # TODO validate the data can be used to set up a connection.
 
-    # validate the token by calling a known line
+def _client(hass: HomeAssistant) -> NationalRailClient:
     if DOMAIN not in hass.data:
         hass.data.setdefault(DOMAIN, {})
 
     if NATIONAL_RAIL_DATA_CLIENT not in hass.data[DOMAIN]:
         hass.data[DOMAIN][NATIONAL_RAIL_DATA_CLIENT] = NationalRailClient(hass)
 
-    my_api: NationalRailClient = hass.data[DOMAIN][NATIONAL_RAIL_DATA_CLIENT]
-    await my_api.set_header(data[CONF_TOKEN])
+    return hass.data[DOMAIN][NATIONAL_RAIL_DATA_CLIENT]
 
-    try:
-        # my_api = NationalRailClient(data[CONF_TOKEN], "STP", ["ZFD"], apiTest=True)
 
-        res = await my_api.async_get_data("STP", ["ZFD"], apitest=True)
-    except NationalRailClientInvalidToken as err:
-        _LOGGER.exception(err)
-        raise InvalidToken() from err
+async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str, Any]:
+    """Validate the user input allows us to connect.
 
+    Data has the keys from STEP_USER_DATA_SCHEMA with values provided by the user.
+    Stations are checked against the local station index and the token with a
+    single call, remembered per token, so no board is fetched here.
+    """
     # validate station input
-    station = str(data[CONF_STATION]).strip().upper()
+    station = _resolve_crs(data[CONF_STATION])
     dests_raw = data.get(CONF_DESTINATIONS) or []
-    destinations = [str(d).strip().upper() for d in dests_raw]
+    destinations = [_resolve_crs(d) for d in dests_raw]
 
     data[CONF_STATION] = station
     data[CONF_DESTINATIONS] = destinations
 
     if data.get(CONF_VIA):
-        data[CONF_VIA] = str(data[CONF_VIA]).strip().upper()
+        data[CONF_VIA] = _resolve_crs(data[CONF_VIA])
     if data.get(CONF_AVOID):
-        data[CONF_AVOID] = str(data[CONF_AVOID]).strip().upper()
-
-    try:
-        # my_api = NationalRailClient(
-        #     data[CONF_TOKEN],
-        #     data[CONF_STATION],
-        #     data[CONF_DESTINATIONS].split(","),
-        #     apiTest=False,
-        # )
-        res = await my_api.async_get_data(
-            data[CONF_STATION], data[CONF_DESTINATIONS], apitest=False
-        )
-        # print(res)
-    except NationalRailClientInvalidInput as err:
-        _LOGGER.exception(err)
-        raise InvalidInput() from err
-
-    # If you cannot connect:
-    # throw CannotConnect
-    # If the authentication is wrong:
-    # InvalidAuth
+        data[CONF_AVOID] = _resolve_crs(data[CONF_AVOID])
+
+    registry = get_registry()
+    codes = [station, *destinations, data.get(CONF_VIA), data.get(CONF_AVOID)]
+    unknown = [code for code in codes if code and code not in registry]
+    if unknown:
+        _LOGGER.error("Unknown station codes: %s", ", ".join(unknown))
+        raise InvalidInput()
+
+    # validate the token
+    digest = hashlib.sha256(data[CONF_TOKEN].encode()).hexdigest()
+    validated = hass.data.setdefault(DOMAIN, {}).setdefault(VALIDATED_TOKENS, set())
+    if digest not in validated:
+        my_api = _client(hass)
+        await my_api.set_header(data[CONF_TOKEN])
+        try:
+            await my_api.async_check_token()
+        except NationalRailClientInvalidToken as err:
+            _LOGGER.exception(err)
+            raise InvalidToken() from err
+        validated.add(digest)
 
     # Return info that you want to store in the config entry.
     via_suffix = f" via {data[CONF_VIA]}" if data.get(CONF_VIA) else ""
@@ -130,35 +209,174 @@ async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str,
     return {"title": f"Train Schedule {data[CONF_STATION]} -> {dest_str}{via_suffix}"}
 
 
+async def async_verify_boards(hass: HomeAssistant, data: dict[str, Any]) -> None:
+    """Fetch the boards of a new entry once and report the failing ones"""
+    my_api = _client(hass)
+    await my_api.set_header(data[CONF_TOKEN])
+    for destination in data[CONF_DESTINATIONS]:
+        try:
+            await my_api.async_get_data(data[CONF_STATION], [destination])
+        except NationalRailClientException as err:
+            _LOGGER.warning(
+                "No board available from %s to %s: %s",
+                data[CONF_STATION],
+                destination,
+                err,
+            )
+
+
 class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for National Rail UK."""
 
     VERSION = 1
 
+    def __init__(self) -> None:
+        """Initialise the flow."""
+        self._data: dict[str, Any] = {}
+        self._pending: dict[str, list[dict[str, str]]] = {}
+
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
         """Handle the initial step."""
         if user_input is None:
             return self.async_show_form(
-                step_id="user", data_schema=STEP_USER_DATA_SCHEMA
+                step_id="user",
+                data_schema=self.add_suggested_values_to_schema(
+                    STEP_USER_DATA_SCHEMA, await self._async_suggested_stations()
+                ),
+            )
+
+        # Build the station index off the event loop
+        await self.hass.async_add_executor_job(get_search_engine)
+
+        self._data = dict(user_input)
+        self._data[CONF_DESTINATIONS] = [
+            d.strip() for d in (user_input.get(CONF_DESTINATIONS) or "").split(",")
+        ]
+        self._pending = {}
+
+        for field in STATION_FIELDS:
+            if not self._data.get(field):
+                continue
+            if field == CONF_DESTINATIONS:
+                resolved, options, unmatched = [], [], []
+                for query in self._data[field]:
+                    if not query:
+                        continue
+                    if crs := _match_crs(query):
+                        resolved.append(crs)
+                    elif matches := _station_options(query):
+                        options.extend(matches)
+                    else:
+                        unmatched.append(query)
+                if unmatched or not (resolved or options):
+                    _LOGGER.debug("No station matches %s", unmatched)
+                    return self.async_show_form(
+                        step_id="user",
+                        data_schema=self.add_suggested_values_to_schema(
+                            STEP_USER_DATA_SCHEMA, user_input
+                        ),
+                        errors={field: "unknown_station"},
+                    )
+                self._data[field] = resolved
+                if options:
+                    # Keep the resolved destinations selected in the picker
+                    options.extend(
+                        {"label": get_registry().name(crs) or crs, "value": crs}
+                        for crs in resolved
+                    )
+                    unique = {option["value"]: option for option in options}
+                    self._pending[field] = list(unique.values())
+                continue
+
+            query = str(self._data[field])
+            if crs := _match_crs(query):
+                self._data[field] = crs
+            elif options := _station_options(query):
+                self._pending[field] = options
+            else:
+                return self.async_show_form(
+                    step_id="user",
+                    data_schema=self.add_suggested_values_to_schema(
+                        STEP_USER_DATA_SCHEMA, user_input
+                    ),
+                    errors={field: "unknown_station"},
+                )
+
+        if self._pending:
+            return await self.async_step_stations()
+
+        return await self._async_create("user")
+
+    async def _async_suggested_stations(self) -> dict[str, Any]:
+        """Stations nearest to home and to the other zones"""
+        index = await self.hass.async_add_executor_job(get_geo_index)
+        if not len(index):
+            return {}
+
+        suggested: dict[str, Any] = {}
+        home = index.nearest(
+            self.hass.config.latitude,
+            self.hass.config.longitude,
+            max_distance_km=NEARBY_STATION_KM,
+        )
+        if home:
+            suggested[CONF_STATION] = home[0].station.crs
+
+        destinations: list[str] = []
+        for zone in self.hass.states.async_all("zone"):
+            if zone.entity_id == "zone.home":
+                continue
+            latitude = zone.attributes.get("latitude")
+            longitude = zone.attributes.get("longitude")
+            if latitude is None or longitude is None:
+                continue
+            nearby = index.nearest(
+                latitude, longitude, max_distance_km=NEARBY_STATION_KM
             )
+            if nearby:
+                crs = nearby[0].station.crs
+                if crs != suggested.get(CONF_STATION) and crs not in destinations:
+                    destinations.append(crs)
+        if destinations:
+            suggested[CONF_DESTINATIONS] = ",".join(destinations)
+
+        return suggested
 
-        if user_input.get(CONF_STATION):
-            user_input[CONF_STATION] = str(user_input[CONF_STATION]).strip().upper()
-        if user_input.get(CONF_DESTINATIONS):
-            user_input[CONF_DESTINATIONS] = [
-                str(d).strip().upper() for d in user_input[CONF_DESTINATIONS]
-            ]
-        if user_input.get(CONF_VIA):
-            user_input[CONF_VIA] = str(user_input[CONF_VIA]).strip().upper()
-        if user_input.get(CONF_AVOID):
-            user_input[CONF_AVOID] = str(user_input[CONF_AVOID]).strip().upper()
+    async def async_step_stations(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Pick the stations among the matches of ambiguous queries."""
+        if user_input is not None:
+            self._data.update(user_input)
+            return await self._async_create("stations")
+
+        return self.async_show_form(
+            step_id="stations", data_schema=self._stations_schema()
+        )
+
+    def _stations_schema(self) -> vol.Schema:
+        schema = {}
+        for field, options in self._pending.items():
+            multiple = field == CONF_DESTINATIONS
+            default = self._data[field] if multiple else options[0]["value"]
+            schema[vol.Required(field, default=default)] = selector(
+                {
+                    "select": {
+                        "options": options,
+                        "multiple": multiple,
+                        "custom_value": True,
+                    }
+                }
+            )
+        return vol.Schema(schema)
 
+    async def _async_create(self, step_id: str) -> FlowResult:
         errors = {}
 
         try:
-            info = await validate_input(self.hass, user_input)
+            info = await validate_input(self.hass, self._data)
         except InvalidToken:
             errors["base"] = "invalid_token"
         except InvalidInput:
@@ -167,11 +385,24 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             _LOGGER.exception("Unexpected exception")
             errors["base"] = "unknown"
         else:
-            return self.async_create_entry(title=info["title"], data=user_input)
-
-        return self.async_show_form(
-            step_id="user", data_schema=STEP_USER_DATA_SCHEMA, errors=errors
-        )
+            if self._data.get(CONF_VERIFY_BOARDS, False):
+                self.hass.async_create_background_task(
+                    async_verify_boards(self.hass, dict(self._data)),
+                    name=f"{DOMAIN} verify boards {self._data[CONF_STATION]}",
+                )
+            return self.async_create_entry(title=info["title"], data=self._data)
+
+        if step_id == "stations":
+            schema = self._stations_schema()
+        else:
+            schema = self.add_suggested_values_to_schema(
+                STEP_USER_DATA_SCHEMA,
+                {
+                    **self._data,
+                    CONF_DESTINATIONS: ",".join(self._data.get(CONF_DESTINATIONS, [])),
+                },
+            )
+        return self.async_show_form(step_id=step_id, data_schema=schema, errors=errors)
 
 
 class InvalidToken(HomeAssistantError):
@@ -1,8 +1,22 @@
 """Constants for the National Rail UK integration."""
 
+from zoneinfo import ZoneInfo
+
 DOMAIN = "nationalrailuk"
 DOMAIN_DATA = f"{DOMAIN}_data"
 NATIONAL_RAIL_DATA_CLIENT = "data_client"
+BOARD_COORDINATORS = "board_coordinators"
+VALIDATED_TOKENS = "validated_tokens"
+ITINERARY_CACHE = "itinerary_cache"
+ITINERARY_CACHE_LISTENER = "itinerary_cache_listener"
+PLANNER_STATE = "planner_state"
+PUSH_FEEDS = "push_feeds"
+
+# The boards and the journey planners give clock times in UK time, whatever
+# the zone of the host
+UK_TIMEZONE = ZoneInfo("Europe/London")
+HISTORY_ENTRIES = "history_entries"
+HISTORY_UNSUB_STOP = "history_unsub_stop"
 
 # Platforms
 SENSOR = "sensor"
@@ -14,6 +28,16 @@ WSDL = "https://lite.realtime.nationalrail.co.uk/OpenLDBWS/wsdl.aspx?ver=2021-11
 CONF_TOKEN = "api_token"
 CONF_STATION = "station"
 CONF_DESTINATIONS = "destinations"
+CONF_VERIFY_BOARDS = "verify_boards"
+
+# Darwin Push Port broker, the boards are built from its messages when set
+CONF_PUSH_HOST = "push_host"
+CONF_PUSH_PORT = "push_port"
+CONF_PUSH_USERNAME = "push_username"
+CONF_PUSH_PASSWORD = "push_password"
+CONF_PUSH_TOPIC = "push_topic"
+DEFAULT_PUSH_PORT = 61613
+DEFAULT_PUSH_TOPIC = "/topic/darwin.pushport-v16"
 
 # Journey planner (additional options)
 CONF_VIA = "via"
@@ -21,8 +45,37 @@ CONF_AVOID = "avoid"
 CONF_MAX_CHANGES = "max_changes"
 CONF_MIN_INTERCHANGE_MINS = "min_interchange_mins"
 CONF_PLANNER_PROVIDER = "planner_provider"
+PLANNER_TRANSPORTAPI = "transportapi"
+PLANNER_OJP = "ojp"
+# Offline planner over the calling points of the monitored boards
+PLANNER_LOCAL = "local"
+# Every usable provider at once, the first good answer wins
+PLANNER_RACE = "race"
 CONF_TRANSPORTAPI_APP_ID = "transportapi_app_id"
 CONF_TRANSPORTAPI_APP_KEY = "transportapi_app_key"
+# Open Journey Planner endpoint, its stop references must be CRS codes
+CONF_OJP_URL = "ojp_url"
+CONF_OJP_TOKEN = "ojp_token"
+# Ranking of the itineraries, one of planner.ranking.RANKS
+CONF_ITINERARY_RANK = "itinerary_rank"
+ITINERARY_COUNT = 3
+
+# Board sensor attributes
+CONF_ATTRIBUTE_MODE = "attribute_mode"
+ATTRIBUTE_MODE_COMPACT = "compact"
+ATTRIBUTE_MODE_FULL = "full"
+CONF_SUMMARY_TRAINS = "summary_trains"
+DEFAULT_SUMMARY_TRAINS = 3
+
+# Services
+SERVICE_GET_CALLING_POINTS = "get_calling_points"
+SERVICE_GET_NEXT_DEPARTURES = "get_next_departures"
+ATTR_SERVICE_ID = "service_id"
+ATTR_STATION = "station"
+ATTR_COUNT = "count"
+
+# Fired for every change between two successive boards
+EVENT_BOARD_CHANGE = f"{DOMAIN}_board_change"
 
 # Refresh frequency for the sensor (seconds)
 REFRESH = 1
@@ -32,8 +85,38 @@ POLLING_INTERVAL = 10
 # Backwards-compat alias (old misspelling used in earlier code)
 POLLING_INTERVALE = POLLING_INTERVAL
 
+# Safety refresh of the boards fed by the push feed (minutes), so departed
+# trains roll off even when no message arrives
+PUSH_REFRESH = 1
+
 # Increase polling frequency if within X minutes of next departure or if train is late
 HIGH_FREQUENCY_REFRESH = 7
 
-# Suggested default update interval for journey planner coordinator (seconds)
-DEFAULT_JOURNEY_UPDATE_INTERVAL = 90
+# Safety refresh of the journey planner (minutes), it otherwise re-plans on
+# board changes and when the first train of the next journey leaves
+JOURNEY_SAFETY_INTERVAL = 15
+
+# Snapshots of the last data of each coordinator, restored at startup
+SNAPSHOT_VERSION = 1
+# Seconds a snapshot write is held back, so bursts of refreshes write once
+SNAPSHOT_SAVE_DELAY = 30
+# Snapshots older than this (minutes) are not restored
+SNAPSHOT_MAX_AGE = 60
+
+# Failed refreshes in a row after which a coordinator goes offline and
+# extrapolates its last data
+CONF_OFFLINE_AFTER = "offline_after_failures"
+DEFAULT_OFFLINE_AFTER = 3
+# Retry interval while offline (minutes), doubled after each failure
+OFFLINE_RETRY = 1
+OFFLINE_MAX_RETRY = 30
+
+# Days of observed calls kept in the SQLite history, 0 keeps none
+CONF_HISTORY_DAYS = "history_days"
+DEFAULT_HISTORY_DAYS = 0
+HISTORY_DATABASE = "nationalrailuk_history.db"
+
+# Half-life of the punctuality statistics (days), older trains weigh less
+PUNCTUALITY_HALF_LIFE = 7
+# Seconds a write of the punctuality statistics is held back
+PUNCTUALITY_SAVE_DELAY = 300
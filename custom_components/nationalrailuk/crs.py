@@ -463,7 +463,7 @@ CRS = [
     {"label": "Carrbridge", "value": "CAG"},
     {"label": "Carshalton", "value": "CSH"},
     {"label": "Carshalton Beeches", "value": "CSB"},
-    {"label": "Carstairs", "value": "value"},
+    {"label": "Carstairs", "value": "CRS"},
     {"label": "Cartsdyke", "value": "CDY"},
     {"label": "Castle Bar Park", "value": "CBP"},
     {"label": "Castle Cary", "value": "CLC"},
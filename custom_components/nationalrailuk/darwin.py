@@ -0,0 +1,447 @@
+"""Darwin Push Port messages and the boards they materialise
+
+Push Port messages carry schedules (the calling points of a service),
+train status updates (forecasts, actual times and platforms at some of
+those points) and deactivations. The services they describe are kept in
+memory and the boards of a station are built from them in the structure
+NationalRailClient.process_data returns, so the sensors cannot tell a
+pushed board from a polled one.
+
+Locations are identified by TIPLOC. They are mapped to CRS codes with the
+TIPLOCs of the station dataset, a TIPLOC that is itself a CRS code of the
+dataset is accepted as is.
+
+This module has no Home Assistant dependency.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import gzip
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+from xml.etree import ElementTree
+
+from .board_materialiser import (
+    DIRECTIONS,
+    BoardMaterialiser,
+    RowChange,
+    ViewKey,
+)
+from .const import UK_TIMEZONE
+from .stations import get_registry
+
+# Rows of each board view, as many as the polled boards request
+BOARD_ROWS = 10
+# A delay longer than this marks the train as perturbed, like timeConvert
+PERTURBATION_MINUTES = 9
+# Trains still unreported this long after their expected time are dropped
+STALE_MINUTES = 15
+
+_LOCATION_TAGS = {"OR", "OPOR", "IP", "OPIP", "PP", "DT", "OPDT"}
+_PUBLIC_TAGS = {"OR", "IP", "DT"}
+
+
+def _local(tag: str) -> str:
+    """Tag without its namespace, Push Port schemas are versioned"""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _is_true(value: Optional[str]) -> bool:
+    return value == "true"
+
+
+def _clock(value: Optional[str]) -> Optional[dt.time]:
+    if not value:
+        return None
+    parts = value.split(":")
+    try:
+        return dt.time(int(parts[0]), int(parts[1]))
+    except (ValueError, IndexError):
+        return None
+
+
+def _near(
+    day: dt.date, clock: Optional[dt.time], reference: Optional[dt.datetime]
+) -> Optional[dt.datetime]:
+    """The datetime at clock on day, moved by a day to be closest to reference"""
+    if clock is None:
+        return None
+    value = dt.datetime.combine(day, clock, tzinfo=UK_TIMEZONE)
+    if reference is None:
+        return value
+    if value < reference - dt.timedelta(hours=6):
+        value += dt.timedelta(days=1)
+    elif value > reference + dt.timedelta(hours=18):
+        value -= dt.timedelta(days=1)
+    return value
+
+
+class Location:
+    """A calling point of a service"""
+
+    __slots__ = (
+        "tpl",
+        "crs",
+        "name",
+        "public",
+        "key",
+        "pta",
+        "ptd",
+        "eta",
+        "etd",
+        "ata",
+        "atd",
+        "delayed",
+        "plat",
+        "cancelled",
+    )
+
+    def __init__(self, tpl: str, public: bool, key: str) -> None:
+        self.tpl = sys.intern(tpl)
+        station = get_registry().by_tiploc(tpl) or get_registry().get(tpl)
+        self.crs = sys.intern(station.crs) if station else None
+        self.name = sys.intern(station.name) if station else tpl
+        self.public = public
+        # Working time identifying the location when a TIPLOC is called twice
+        self.key = key
+        self.pta: Optional[dt.datetime] = None
+        self.ptd: Optional[dt.datetime] = None
+        self.eta: Optional[dt.datetime] = None
+        self.etd: Optional[dt.datetime] = None
+        self.ata: Optional[dt.datetime] = None
+        self.atd: Optional[dt.datetime] = None
+        self.delayed = False
+        self.plat: Optional[str] = None
+        self.cancelled = False
+
+    @property
+    def scheduled(self) -> Optional[dt.datetime]:
+        return self.ptd or self.pta
+
+
+class Service:
+    """A train service and its calling points, in order"""
+
+    __slots__ = ("rid", "uid", "toc", "ssd", "cancel_reason", "locations")
+
+    def __init__(self, rid: str, uid: str, toc: str, ssd: dt.date) -> None:
+        self.rid = rid
+        self.uid = uid
+        self.toc = toc
+        self.ssd = ssd
+        self.cancel_reason: Optional[str] = None
+        self.locations: List[Location] = []
+
+    def find(self, tpl: str, key: Optional[str]) -> Optional[Location]:
+        """Location of a TIPLOC, matched on its working time when given"""
+        fallback = None
+        for location in self.locations:
+            if location.tpl == tpl:
+                if key is None or location.key == key:
+                    return location
+                fallback = fallback or location
+        return fallback
+
+    def stations(self) -> Set[str]:
+        """CRS codes of the public calling points"""
+        return {loc.crs for loc in self.locations if loc.crs and loc.public}
+
+
+def _working_key(element: ElementTree.Element) -> str:
+    return (
+        element.get("wtd")
+        or element.get("wta")
+        or element.get("wtp")
+        or element.get("ptd")
+        or element.get("pta")
+        or ""
+    )
+
+
+def parse_schedule(element: ElementTree.Element) -> Service:
+    """Service of a schedule element"""
+    ssd = dt.date.fromisoformat(element.get("ssd"))
+    service = Service(element.get("rid"), element.get("uid"), element.get("toc"), ssd)
+    previous = None
+
+    for child in element:
+        tag = _local(child.tag)
+        if tag == "cancelReason":
+            service.cancel_reason = (child.text or "").strip() or None
+            continue
+        if tag not in _LOCATION_TAGS:
+            continue
+        location = Location(
+            child.get("tpl"),
+            tag in _PUBLIC_TAGS and bool(child.get("pta") or child.get("ptd")),
+            _working_key(child),
+        )
+        # Times roll over midnight along the schedule
+        location.pta = _near(ssd, _clock(child.get("pta")), previous)
+        location.ptd = _near(ssd, _clock(child.get("ptd")), previous)
+        location.cancelled = _is_true(child.get("can"))
+        previous = location.scheduled or previous
+        service.locations.append(location)
+    return service
+
+
+def apply_status(service: Service, element: ElementTree.Element) -> None:
+    """Apply the forecasts of a train status (TS) element to its service"""
+    for child in element:
+        if _local(child.tag) != "Location":
+            continue
+        location = service.find(child.get("tpl"), _working_key(child) or None)
+        if location is None:
+            continue
+        reference = location.scheduled
+        if reference is None:
+            # Passing points are not shown on the boards
+            continue
+        for part in child:
+            tag = _local(part.tag)
+            if tag == "plat":
+                location.plat = (part.text or "").strip() or None
+            elif tag in ("arr", "dep"):
+                estimated = _near(
+                    reference.date(),
+                    _clock(part.get("et") or part.get("wet")),
+                    reference,
+                )
+                actual = _near(reference.date(), _clock(part.get("at")), reference)
+                if tag == "arr":
+                    location.eta = estimated or location.eta
+                    location.ata = actual or location.ata
+                else:
+                    location.etd = estimated or location.etd
+                    location.atd = actual or location.atd
+                if part.get("delayed") is not None:
+                    location.delayed = _is_true(part.get("delayed"))
+
+
+class PushMessage:
+    """The schedules, train statuses and deactivations of a message"""
+
+    __slots__ = ("schedules", "statuses", "deactivated")
+
+    def __init__(self) -> None:
+        self.schedules: List[ElementTree.Element] = []
+        self.statuses: List[ElementTree.Element] = []
+        self.deactivated: List[str] = []
+
+
+def parse_message(body: bytes) -> PushMessage:
+    """Split a Push Port message, gzip compressed or not"""
+    if body[:2] == b"\x1f\x8b":
+        body = gzip.decompress(body)
+    message = PushMessage()
+    root = ElementTree.fromstring(body)
+    for element in root.iter():
+        tag = _local(element.tag)
+        if tag == "schedule":
+            message.schedules.append(element)
+        elif tag == "TS":
+            message.statuses.append(element)
+        elif tag == "deactivated":
+            message.deactivated.append(element.get("rid"))
+    return message
+
+
+def _expected(scheduled, estimated, actual, cancelled, delayed):
+    """Expected time and perturbation, in the forms timeConvert returns"""
+    if cancelled:
+        return "Cancelled", True
+    if delayed:
+        return "Delayed", True
+    value = actual or estimated or scheduled
+    if value is not None and scheduled is not None:
+        late = (value - scheduled).total_seconds() / 60
+        return value, late > PERTURBATION_MINUTES
+    return value, False
+
+
+def _calling_point(location: Location, reason: Optional[str]) -> Dict[str, Any]:
+    scheduled = location.scheduled
+    estimated = location.etd or location.eta or scheduled
+    actual = location.atd or location.ata
+    return {
+        "locationName": location.name,
+        "crs": location.crs,
+        "st": scheduled,
+        "et": "Cancelled" if location.cancelled else estimated,
+        "at": actual,
+        "atet": actual or ("Cancelled" if location.cancelled else estimated),
+        "isCancelled": location.cancelled,
+        "cancelReason": reason if location.cancelled else None,
+    }
+
+
+def service_train(
+    service: Service, station: str, destination: str, direction: str
+) -> Optional[Dict[str, Any]]:
+    """The train of a service on a board view, None if it does not show
+
+    A departure shows until it has left the station, an arrival until it
+    has arrived, like on the polled boards.
+    """
+    points = [loc for loc in service.locations if loc.public and loc.crs]
+    here = next((i for i, loc in enumerate(points) if loc.crs == station), None)
+    there = next((i for i, loc in enumerate(points) if loc.crs == destination), None)
+    if here is None or there is None:
+        return None
+
+    location = points[here]
+    if direction == "Departure":
+        if there < here or location.ptd is None or location.atd is not None:
+            return None
+        scheduled, estimated, actual = location.ptd, location.etd, location.atd
+    else:
+        if there > here or location.pta is None or location.ata is not None:
+            return None
+        scheduled, estimated, actual = location.pta, location.eta, location.ata
+
+    expected, perturbation = _expected(
+        scheduled, estimated, actual, location.cancelled, location.delayed
+    )
+    calling_points = [_calling_point(loc, service.cancel_reason) for loc in points]
+    # The point of the board station carries no atet on the polled boards
+    selected = dict(calling_points[here], st=scheduled, et=expected, at=None)
+    selected.pop("atet")
+    calling_points[here] = selected
+
+    return {
+        "serviceID": service.rid,
+        "scheduled": scheduled,
+        "expected": expected,
+        "origin": points[0].name,
+        "destination": points[-1].name,
+        "platform": location.plat,
+        "perturbation": perturbation,
+        "isCancelled": location.cancelled,
+        "operator": service.toc,
+        "length": None,
+        "callingPoints": calling_points,
+        "otherEnd": calling_points[there],
+    }
+
+
+class PushBoards:
+    """Services received from the feed, indexed by the stations they call at
+
+    The boards of the stations asked for are materialised incrementally:
+    each message only recomputes the rows of the services it touches.
+    """
+
+    def __init__(self) -> None:
+        self.services: Dict[str, Service] = {}
+        self.materialiser = BoardMaterialiser()
+        self._by_station: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.services)
+
+    def _index(self, service: Service, add: bool) -> None:
+        for crs in service.stations():
+            rids = self._by_station.setdefault(crs, set())
+            if add:
+                rids.add(service.rid)
+            else:
+                rids.discard(service.rid)
+
+    def _rows(
+        self, service: Service, station: str, views: Iterable[ViewKey]
+    ) -> Dict[ViewKey, Optional[Dict[str, Any]]]:
+        return {
+            (destination, direction): service_train(
+                service, station, destination, direction
+            )
+            for destination, direction in views
+        }
+
+    def _update(self, service: Service) -> List[RowChange]:
+        changes = []
+        for crs in service.stations():
+            board = self.materialiser.boards.get(crs)
+            if board is not None:
+                changes += self.materialiser.apply(
+                    crs, service.rid, self._rows(service, crs, board.views)
+                )
+        return changes
+
+    def _remove(self, rid: str, stations: Iterable[str]) -> List[RowChange]:
+        changes = []
+        for crs in stations:
+            changes += self.materialiser.remove(crs, rid)
+        return changes
+
+    def apply(self, message: PushMessage) -> List[RowChange]:
+        """Apply a message, return the board rows it changed"""
+        changes: List[RowChange] = []
+        for element in message.schedules:
+            service = parse_schedule(element)
+            old = self.services.get(service.rid)
+            if old is not None:
+                self._index(old, False)
+                changes += self._remove(
+                    service.rid, old.stations() - service.stations()
+                )
+                # A new schedule keeps the live data already received
+                for location in service.locations:
+                    known = old.find(location.tpl, location.key)
+                    if known is not None:
+                        for field in ("eta", "etd", "ata", "atd", "plat", "delayed"):
+                            setattr(location, field, getattr(known, field))
+            self.services[service.rid] = service
+            self._index(service, True)
+            changes += self._update(service)
+
+        for element in message.statuses:
+            service = self.services.get(element.get("rid"))
+            if service is None:
+                continue
+            apply_status(service, element)
+            changes += self._update(service)
+
+        for rid in message.deactivated:
+            service = self.services.pop(rid, None)
+            if service is not None:
+                self._index(service, False)
+                changes += self._remove(rid, service.stations())
+        return changes
+
+    def board(
+        self,
+        station: str,
+        destinations: Iterable[str],
+        rows: int = BOARD_ROWS,
+        now: Optional[dt.datetime] = None,
+    ) -> Dict[str, Any]:
+        """The boards of a station in the process_data structure
+
+        The first call for a destination materialises its views from the
+        services already received, later messages keep them up to date.
+        """
+        destinations = list(destinations)
+        added = self.materialiser.subscribe(station, destinations)
+        if added:
+            self.materialiser.boards[station].name = get_registry().name(station)
+            views = [(d, direction) for d in added for direction in DIRECTIONS]
+            for rid in self._by_station.get(station, ()):
+                self.materialiser.apply(
+                    station, rid, self._rows(self.services[rid], station, views)
+                )
+
+        stale = (now or dt.datetime.now(UK_TIMEZONE)) - dt.timedelta(
+            minutes=STALE_MINUTES
+        )
+        return self.materialiser.board(station, destinations, rows, since=stale)
+
+
+def iter_messages(path: str) -> Iterator[bytes]:
+    """Messages of a replay file, one XML document per line"""
+    with open(path, "rb") as file:
+        for line in file:
+            line = line.strip()
+            if line:
+                yield line
+
@@ -0,0 +1,136 @@
+"""Serving the last good data of a coordinator while its source is down"""
+
+from __future__ import annotations
+
+import datetime as dt
+import logging
+from typing import Any, Dict, Optional
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+
+from .const import (
+    CONF_OFFLINE_AFTER,
+    DEFAULT_OFFLINE_AFTER,
+    OFFLINE_MAX_RETRY,
+    OFFLINE_RETRY,
+)
+
+
+class Freshness:
+    """When the data of a coordinator was fetched and the refreshes failed since
+
+    The data is stale when it was restored from a snapshot or the last
+    refreshes failed, and offline once offline_after refreshes in a row did.
+    """
+
+    def __init__(self, offline_after: int) -> None:
+        self.offline_after = offline_after
+        self.fetched_at: Optional[dt.datetime] = None
+        self.restored_at: Optional[dt.datetime] = None
+        self.failures = 0
+        self.error: Optional[str] = None
+        # Update interval of the coordinator before it went offline
+        self.online_interval: Optional[dt.timedelta] = None
+
+    @property
+    def stale(self) -> bool:
+        return self.failures > 0 or self.restored_at is not None
+
+    @property
+    def offline(self) -> bool:
+        return self.failures >= self.offline_after
+
+    def restored(self, saved_at: dt.datetime) -> None:
+        self.fetched_at = self.restored_at = saved_at
+
+    def succeeded(self) -> None:
+        self.fetched_at = dt.datetime.now(dt.timezone.utc)
+        self.restored_at = None
+        self.failures = 0
+        self.error = None
+        self.online_interval = None
+
+    def failed(self, error: str) -> None:
+        self.failures += 1
+        self.error = error
+
+    def retry_interval(self) -> dt.timedelta:
+        """Delay before the next attempt while offline, doubled each failure"""
+        exponent = max(self.failures - self.offline_after, 0)
+        minutes = min(OFFLINE_RETRY * 2**exponent, OFFLINE_MAX_RETRY)
+        return dt.timedelta(minutes=minutes)
+
+    def attributes(self) -> Dict[str, Any]:
+        """The state attributes of stale data, none while it is fresh"""
+        if not self.stale:
+            return {}
+        attributes: Dict[str, Any] = {"stale": True, "offline": self.offline}
+        if self.fetched_at is not None:
+            age = dt.datetime.now(dt.timezone.utc) - self.fetched_at
+            attributes["age"] = int(age.total_seconds())
+        if self.restored_at is not None:
+            attributes["restored_at"] = self.restored_at.isoformat()
+        if self.error:
+            attributes["error"] = self.error
+        return attributes
+
+
+class StaleWhileRevalidateCoordinator(DataUpdateCoordinator):
+    """Coordinator keeping its last good data when a refresh fails
+
+    Subclasses fetch in _async_fetch_data, raising UpdateFailed. A failed
+    refresh serves the previous data, marked stale, and the entities stay
+    available. Once the entry's number of failures in a row is reached the
+    coordinator goes offline: the data is extrapolated by _extrapolate and
+    the refreshes back off until the source answers again.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, logger: logging.Logger, entry, **kwargs
+    ) -> None:
+        super().__init__(hass, logger, **kwargs)
+        self.entry = entry
+        self.freshness = Freshness(
+            int(entry.data.get(CONF_OFFLINE_AFTER, DEFAULT_OFFLINE_AFTER))
+        )
+
+    async def _async_fetch_data(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def _extrapolate(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """The data as it may be now, without news from the source"""
+        return data
+
+    async def _async_update_data(self) -> Dict[str, Any]:
+        freshness = self.freshness
+        if freshness.online_interval is not None:
+            # A successful fetch may set its own interval, a failure backs
+            # off again below
+            self.update_interval = freshness.online_interval
+        try:
+            data = await self._async_fetch_data()
+        except UpdateFailed as err:
+            if self.data is None:
+                raise
+            was_offline = freshness.offline
+            freshness.failed(str(err))
+            if not freshness.offline:
+                self.logger.debug("%s serving stale data: %s", self.name, err)
+                return self.data
+            if not was_offline:
+                self.logger.warning(
+                    "%s offline after %d failed refreshes: %s",
+                    self.name,
+                    freshness.failures,
+                    err,
+                )
+            if freshness.online_interval is None:
+                freshness.online_interval = self.update_interval
+            self.update_interval = freshness.retry_interval()
+            return self._extrapolate(self.data)
+
+        if freshness.offline:
+            self.logger.info("%s back online", self.name)
+        freshness.succeeded()
+        return data
@@ -0,0 +1,306 @@
+"""SQLite history of the times observed on the boards
+
+Every refresh records the scheduled, estimated and actual times of each
+service at the board station and its calling points. A row is keyed by
+station, scheduled time, service and event (arrival or departure), so the
+successive observations of a call collapse to its latest state.
+
+The boards never give an actual time at their own station, a train leaves
+the board when it arrives or departs. A call of the board station that
+is gone from the board once its expected time has passed is recorded with
+that time as its actual one, flagged as inferred. An actual time observed
+on another board replaces an inferred one, never the reverse.
+
+Rows are buffered on the event loop and written in batches by a single
+worker thread, in WAL mode so readers never wait for the writer. Stations
+are stored as integers (base 36 CRS codes) and times as epoch seconds.
+Rows scheduled more than retention_days ago are pruned.
+
+This module has no Home Assistant dependency, so script/load_history.py
+can load it alone.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import datetime as dt
+import logging
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+_LOGGER = logging.getLogger(__name__)
+
+# Rows buffered before a write, and the longest a row waits (seconds)
+HISTORY_BATCH = 500
+HISTORY_FLUSH_INTERVAL = 30
+# Seconds between two prunings of the expired rows
+PRUNE_INTERVAL = 3600
+
+# Seconds a call may leave the board ahead of its time and still be
+# counted as made
+DEPARTED_MARGIN = 120
+# Stored as the user_version of the database, bumped when the table changes
+SCHEMA_VERSION = 1
+
+ARRIVAL = "a"
+DEPARTURE = "d"
+
+# (crs, scheduled, service_id, event, estimated, actual, cancelled, observed,
+#  inferred)
+Row = Tuple[int, int, str, str, Optional[int], Optional[int], int, int, int]
+Key = Tuple[int, int, str, str]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    crs INTEGER NOT NULL,
+    scheduled INTEGER NOT NULL,
+    service_id TEXT NOT NULL,
+    event TEXT NOT NULL,
+    estimated INTEGER,
+    actual INTEGER,
+    cancelled INTEGER NOT NULL DEFAULT 0,
+    observed INTEGER NOT NULL,
+    inferred INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (crs, scheduled, service_id, event)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS calls_service ON calls (service_id, scheduled);
+"""
+
+# A new actual time replaces the known one unless it is inferred and the
+# known one was observed
+_KEEP_ACTUAL = (
+    "excluded.actual IS NULL"
+    " OR (excluded.inferred AND actual IS NOT NULL AND NOT inferred)"
+)
+
+UPSERT = f"""
+INSERT INTO calls (
+    crs, scheduled, service_id, event, estimated, actual, cancelled, observed,
+    inferred
+)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (crs, scheduled, service_id, event) DO UPDATE SET
+    estimated = coalesce(excluded.estimated, estimated),
+    actual = CASE WHEN {_KEEP_ACTUAL} THEN actual ELSE excluded.actual END,
+    inferred = CASE WHEN {_KEEP_ACTUAL} THEN inferred ELSE excluded.inferred END,
+    cancelled = excluded.cancelled,
+    observed = excluded.observed
+"""
+
+_DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def crs_to_int(crs: str) -> int:
+    """A CRS code as an integer, base 36"""
+    return int(crs, 36)
+
+
+def int_to_crs(value: int) -> str:
+    """The CRS code of crs_to_int"""
+    digits = ""
+    while value:
+        value, digit = divmod(value, 36)
+        digits = _DIGITS[digit] + digits
+    return digits.rjust(3, "0")
+
+
+def _epoch(value: Any) -> Optional[int]:
+    if isinstance(value, dt.datetime):
+        return int(value.timestamp())
+    return None
+
+
+def board_rows(data: Dict[str, Any], station: str) -> Iterator[Row]:
+    """The rows of a processed board, a call seen on several views once
+
+    The calling points before the board station are departures and the
+    ones after it arrivals, the board station row takes the board's event.
+    """
+    observed = int(time.time())
+    rows: Dict[Key, Row] = {}
+
+    def add(crs, scheduled, service_id, event, estimated, actual, cancelled):
+        scheduled = _epoch(scheduled)
+        if not crs or not crs.isalnum() or scheduled is None or not service_id:
+            return
+        key = (crs_to_int(crs), scheduled, service_id, event)
+        known = rows.get(key)
+        actual = _epoch(actual)
+        if known is not None and actual is None:
+            actual = known[5]
+        rows[key] = (
+            *key,
+            _epoch(estimated),
+            actual,
+            int(bool(cancelled)),
+            observed,
+            0,
+        )
+
+    for view in (data.get("dests") or {}).values():
+        for direction in ("Arrival", "Departure"):
+            here = ARRIVAL if direction == "Arrival" else DEPARTURE
+            for train in (view.get(direction) or {}).get("trains", []):
+                service_id = train.get("serviceID")
+                add(
+                    station,
+                    train.get("scheduled"),
+                    service_id,
+                    here,
+                    train.get("expected"),
+                    None,
+                    train.get("isCancelled"),
+                )
+                event = DEPARTURE
+                for point in train.get("callingPoints") or []:
+                    if point.get("crs") == station:
+                        event = ARRIVAL
+                        continue
+                    add(
+                        point.get("crs"),
+                        point.get("st"),
+                        service_id,
+                        event,
+                        point.get("et"),
+                        point.get("at"),
+                        point.get("isCancelled"),
+                    )
+    return iter(rows.values())
+
+
+def made_calls(
+    previous: Dict[Key, Row], current: Dict[Key, Row], now: int
+) -> Iterator[Row]:
+    """The board station calls of previous gone from current once due
+
+    Their last estimate becomes their actual time, flagged as inferred. A
+    call without one, being cancelled or delayed, or dropped well before its
+    time is left out.
+    """
+    for key, row in previous.items():
+        made = row[4]
+        if key in current or row[6] or made is None or made > now + DEPARTED_MARGIN:
+            continue
+        yield (*key, made, made, 0, now, 1)
+
+
+class HistoryStore:
+    """Batched writer of the observed calls"""
+
+    def __init__(
+        self,
+        path: str,
+        retention_days: int,
+        batch: int = HISTORY_BATCH,
+        flush_interval: float = HISTORY_FLUSH_INTERVAL,
+    ) -> None:
+        self.path = path
+        self.retention_days = retention_days
+        self.written = 0
+        self._batch = batch
+        self._flush_interval = flush_interval
+        self._buffer: List[Row] = []
+        self._buffered_at: Optional[float] = None
+        self._pruned_at = 0.0
+        # Calls of each board station on its last board, see made_calls
+        self._board_calls: Dict[str, Dict[Key, Row]] = {}
+        self._connection: Optional[sqlite3.Connection] = None
+        # Set when a newer version of the integration wrote the database
+        self._refused = False
+        # One thread owns the connection, writes are applied in order
+        self._executor = ThreadPoolExecutor(
+            1, thread_name_prefix="nationalrailuk_history"
+        )
+
+    def add(self, rows: Iterable[Row]) -> bool:
+        """Buffer rows, return True when a flush is due"""
+        self._buffer.extend(rows)
+        now = time.monotonic()
+        if self._buffered_at is None:
+            self._buffered_at = now
+        return (
+            len(self._buffer) >= self._batch
+            or now - self._buffered_at >= self._flush_interval
+        )
+
+    def add_board(self, data: Dict[str, Any], station: str) -> bool:
+        """Buffer the rows of a processed board, return True when a flush is due"""
+        rows = list(board_rows(data, station))
+        here = crs_to_int(station) if station.isalnum() else None
+        calls = {row[:4]: row for row in rows if row[0] == here}
+        previous = self._board_calls.get(station, {})
+        rows.extend(made_calls(previous, calls, int(time.time())))
+        self._board_calls[station] = calls
+        return self.add(rows)
+
+    async def async_flush(self) -> None:
+        """Write the buffered rows in the worker thread"""
+        rows, self._buffer, self._buffered_at = self._buffer, [], None
+        if rows:
+            await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._write, rows
+            )
+
+    async def async_close(self) -> None:
+        """Write the buffered rows and close the database"""
+        await self.async_flush()
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._close)
+        self._executor.shutdown(wait=False)
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """The open database, None when its schema is newer than this one"""
+        if self._connection is None and not self._refused:
+            connection = sqlite3.connect(self.path)
+            version = connection.execute("PRAGMA user_version").fetchone()[0]
+            if version > SCHEMA_VERSION:
+                # Written after an upgrade, a downgrade must not lose it
+                connection.close()
+                self._refused = True
+                _LOGGER.error(
+                    "%s has the history schema %d, newer than %d: not recording",
+                    self.path,
+                    version,
+                    SCHEMA_VERSION,
+                )
+                return None
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(calls)")}
+            if version == 0 and columns and "event" not in columns:
+                # Written before the schema was versioned, when the key did
+                # not tell arrivals from departures
+                connection.execute("DROP TABLE calls")
+            connection.executescript(SCHEMA)
+            connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            self._connection = connection
+        return self._connection
+
+    def _write(self, rows: List[Row]) -> None:
+        try:
+            connection = self._connect()
+            if connection is None:
+                return
+            with connection:
+                connection.executemany(UPSERT, rows)
+            self.written += len(rows)
+            if time.monotonic() - self._pruned_at >= PRUNE_INTERVAL:
+                self._prune(connection)
+        except sqlite3.Error as err:
+            _LOGGER.warning("Could not write %d history rows: %s", len(rows), err)
+
+    def _prune(self, connection: sqlite3.Connection) -> None:
+        self._pruned_at = time.monotonic()
+        horizon = int(time.time()) - self.retention_days * 86400
+        with connection:
+            deleted = connection.execute(
+                "DELETE FROM calls WHERE scheduled < ?", (horizon,)
+            ).rowcount
+        if deleted:
+            _LOGGER.debug("Pruned %d history rows", deleted)
+
+    def _close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
@@ -6,87 +6,278 @@ import datetime as dt
 import logging
 from typing import Any, Dict, List, Optional
 
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_point_in_utc_time
+from homeassistant.helpers.httpx_client import get_async_client
+from homeassistant.helpers.update_coordinator import UpdateFailed
+from homeassistant.util import dt as dt_util
 
-from .config_flow import (
+from .const import (
+    BOARD_COORDINATORS,
     CONF_AVOID,
     CONF_DESTINATIONS,
+    CONF_ITINERARY_RANK,
     CONF_MAX_CHANGES,
     CONF_MIN_INTERCHANGE_MINS,
     CONF_PLANNER_PROVIDER,
     CONF_STATION,
-    CONF_TRANSPORTAPI_APP_ID,
-    CONF_TRANSPORTAPI_APP_KEY,
     CONF_VIA,
+    DOMAIN,
+    EVENT_BOARD_CHANGE,
+    ITINERARY_CACHE,
+    ITINERARY_CACHE_LISTENER,
+    ITINERARY_COUNT,
+    JOURNEY_SAFETY_INTERVAL,
+    PLANNER_STATE,
+    PLANNER_TRANSPORTAPI,
+    UK_TIMEZONE,
 )
-from .planner.transportapi_client import TransportApiClient
+from .board_diff import (
+    DELTA_CANCELLED,
+    DELTA_EXPECTED_CHANGED,
+    DELTA_PERTURBATION,
+    DELTA_REMOVED,
+)
+from .freshness import StaleWhileRevalidateCoordinator
+from .live_overlay import LiveIndex
+from .planner import (
+    PlannerError,
+    PlannerProvider,
+    PlannerState,
+    PlanRequest,
+    create_provider,
+)
+from .planner.cache import ItineraryCache
+from .planner.ranking import RANK_ARRIVAL
+from .snapshot import SNAPSHOT_JOURNEY, CoordinatorSnapshot
 
 _LOGGER = logging.getLogger(__name__)
 
+# Board changes that may break a planned leg, a removed train has left
+DISRUPTIONS = (
+    DELTA_CANCELLED,
+    DELTA_EXPECTED_CHANGED,
+    DELTA_PERTURBATION,
+    DELTA_REMOVED,
+)
+
+
+def _departure_at(when: dt.datetime, clock: Optional[str]) -> Optional[dt.datetime]:
+    """The first datetime after when, within a day, at an HH:MM time of its zone"""
+    if not clock:
+        return None
+    try:
+        hours, minutes = (int(part) for part in clock.split(":")[:2])
+    except ValueError:
+        return None
+    departure = when.replace(hour=hours, minute=minutes, second=0, microsecond=0)
+    if departure < when - dt.timedelta(hours=12):
+        departure += dt.timedelta(days=1)
+    return departure
+
+
+def itinerary_cache(hass: HomeAssistant) -> ItineraryCache:
+    """The itinerary cache shared by every entry
+
+    It is created on first use along with the board change listener that
+    drops the itineraries relying on a disrupted train.
+    """
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    cache = domain_data.get(ITINERARY_CACHE)
+    if cache is not None:
+        return cache
+
+    cache = domain_data[ITINERARY_CACHE] = ItineraryCache()
+
+    @callback
+    def _board_changed(event: Event) -> None:
+        delta = event.data
+        if delta.get("type") not in DISRUPTIONS:
+            return
+        points = []
+        # Only a departure board gives the scheduled departure of the station
+        if delta.get("direction") == "Departure" and delta.get("scheduled"):
+            scheduled = dt.datetime.fromisoformat(delta["scheduled"])
+            points.append((delta.get("station"), scheduled.strftime("%H:%M")))
+        services = [delta["service_id"]] if delta.get("service_id") else []
+        if dropped := cache.invalidate(points, services):
+            _LOGGER.debug("Dropped %d cached itineraries after %s", dropped, delta)
+
+    domain_data[ITINERARY_CACHE_LISTENER] = hass.bus.async_listen(
+        EVENT_BOARD_CHANGE, _board_changed
+    )
+    return cache
+
+
+def async_release_itinerary_cache(hass: HomeAssistant) -> None:
+    """Drop the itinerary cache and its listener once no journey is planned"""
+    domain_data = hass.data.get(DOMAIN, {})
+    if any(
+        isinstance(value, JourneyPlannerCoordinator) for value in domain_data.values()
+    ):
+        return
+    domain_data.pop(ITINERARY_CACHE, None)
+    if (unsub := domain_data.pop(ITINERARY_CACHE_LISTENER, None)) is not None:
+        unsub()
+
+
+def planner_state(hass: HomeAssistant) -> PlannerState:
+    """The rate limiters and metrics of the providers, shared by every entry"""
+    return hass.data.setdefault(DOMAIN, {}).setdefault(PLANNER_STATE, PlannerState())
+
+
+class JourneyPlannerCoordinator(StaleWhileRevalidateCoordinator):
+    """Coordinator that fetches planned itineraries from the configured provider.
 
-class JourneyPlannerCoordinator(DataUpdateCoordinator):
-    """Coordinator that fetches planned itineraries (TransportAPI for now)."""
+    It re-plans when a board of the journey stations shows a disruption or a
+    departed train, and when the first train of the next journey leaves. The
+    update interval is only a safety net.
+    """
 
     def __init__(self, hass: HomeAssistant, entry) -> None:
         super().__init__(
             hass,
             _LOGGER,
+            entry,
             name="National Rail Journey Planner",
-            update_interval=dt.timedelta(seconds=90),
+            update_interval=dt.timedelta(minutes=JOURNEY_SAFETY_INTERVAL),
         )
-        self.entry = entry
-
-        data = entry.data
-        provider = data.get(CONF_PLANNER_PROVIDER, "transportapi")
-        if provider != "transportapi":
-            _LOGGER.warning(
-                "Only 'transportapi' is implemented in this fork so far; got %s",
-                provider,
-            )
-        app_id = data.get(CONF_TRANSPORTAPI_APP_ID)
-        app_key = data.get(CONF_TRANSPORTAPI_APP_KEY)
-        if not app_id or not app_key:
-            _LOGGER.warning(
-                "TransportAPI credentials are missing; planner will be disabled"
+        self._cache = itinerary_cache(hass)
+        self.snapshot = CoordinatorSnapshot(hass, self, SNAPSHOT_JOURNEY)
+        self._departure_timer: Optional[CALLBACK_TYPE] = None
+        entry.async_on_unload(
+            hass.bus.async_listen(EVENT_BOARD_CHANGE, self._board_changed)
+        )
+        entry.async_on_unload(self._cancel_departure_timer)
+
+        name = entry.data.get(CONF_PLANNER_PROVIDER, PLANNER_TRANSPORTAPI)
+        self._provider: Optional[PlannerProvider] = None
+        self._provider_error: Optional[str] = None
+        try:
+            self._provider = create_provider(
+                name,
+                entry.data,
+                client=get_async_client(hass),
+                cache=self._cache,
+                boards=self._boards,
+                state=planner_state(hass),
             )
-        self._transport = (
-            TransportApiClient(app_id, app_key) if app_id and app_key else None
+        except PlannerError as err:
+            _LOGGER.warning("Journey planner disabled: %s", err)
+            self._provider_error = str(err)
+
+    def _boards(self) -> List[Optional[Dict[str, Any]]]:
+        boards = self.hass.data.get(DOMAIN, {}).get(BOARD_COORDINATORS, {})
+        return [board.data for board in boards.values()]
+
+    @property
+    def stations(self) -> set:
+        """CRS codes of the origin, via and destination of the journey"""
+        data = self.entry.data
+        dests = data.get(CONF_DESTINATIONS) or []
+        stations = {data.get(CONF_STATION), data.get(CONF_VIA)}
+        if dests:
+            stations.add(dests[0])
+        stations.discard(None)
+        return stations
+
+    @callback
+    def _board_changed(self, event: Event) -> None:
+        """Re-plan when a board of the journey stations is disrupted"""
+        delta = event.data
+        if delta.get("type") not in DISRUPTIONS:
+            return
+        if delta.get("station") in self.stations:
+            self.hass.async_create_task(self.async_request_refresh())
+
+    @callback
+    def _cancel_departure_timer(self) -> None:
+        if self._departure_timer is not None:
+            self._departure_timer()
+            self._departure_timer = None
+
+    @callback
+    def _schedule_departure(self, when: dt.datetime, itineraries: List[Dict]) -> None:
+        """Re-plan once the first train of the next journey has left"""
+        self._cancel_departure_timer()
+        legs = itineraries[0].get("legs") if itineraries else None
+        if not legs:
+            return
+        departure = _departure_at(when, legs[0].get("departure_time"))
+        if departure is None:
+            return
+        point = (legs[0].get("from_crs"), legs[0].get("departure_time"))
+
+        @callback
+        def _departed(_now: dt.datetime) -> None:
+            self._departure_timer = None
+            self._cache.invalidate([point])
+            self.hass.async_create_task(self.async_request_refresh())
+
+        self._departure_timer = async_track_point_in_utc_time(
+            self.hass,
+            _departed,
+            (departure + dt.timedelta(minutes=1)).astimezone(dt.timezone.utc),
         )
 
-    async def _async_update_data(self) -> Dict[str, Any]:
+    async def _async_fetch_data(self) -> Dict[str, Any]:
         data = self.entry.data
         origin: str = data.get(CONF_STATION)
         dests: List[str] = data.get(CONF_DESTINATIONS) or []
         destination: Optional[str] = dests[0] if dests else None
         if not origin or not destination:
             return {"itineraries": [], "error": "origin_or_destination_missing"}
-        if not self._transport:
-            return {"itineraries": [], "error": "transportapi_credentials_missing"}
+        # The planners read and give clock times in UK time
+        when = dt_util.now(UK_TIMEZONE)
 
-        tz = self.hass.config.time_zone
-        when = dt.datetime.now(dt.timezone.utc).astimezone() if tz else dt.datetime.now()
+        if self._provider is None:
+            return {"itineraries": [], "error": self._provider_error}
 
-        payload = await self._transport.plan(
-            origin=origin,
-            destination=destination,
-            when=when,
+        min_interchange = int(data.get(CONF_MIN_INTERCHANGE_MINS, 5))
+        request = PlanRequest(
+            origin,
+            destination,
+            when,
             via=data.get(CONF_VIA),
             avoid=data.get(CONF_AVOID),
             max_changes=int(data.get(CONF_MAX_CHANGES, 2)),
-            min_interchange=int(data.get(CONF_MIN_INTERCHANGE_MINS, 5)),
+            min_interchange=min_interchange,
+            count=ITINERARY_COUNT,
+            rank=data.get(CONF_ITINERARY_RANK, RANK_ARRIVAL),
         )
-        itineraries = TransportApiClient.to_simple_itineraries(payload)
-
-        # Keep only top 3 to avoid huge attributes
-        itineraries = itineraries[:3]
-
+        try:
+            itineraries = await self._provider.plan(request)
+        except PlannerError as err:
+            raise UpdateFailed(str(err)) from err
+        self._schedule_departure(when, itineraries)
+        # Cached itineraries are left untouched, the overlay copies them
+        itineraries = self._live_index().annotate(itineraries, min_interchange)
         return {
             "origin": origin,
             "destination": destination,
-            "via": data.get(CONF_VIA),
+            "via": request.via,
+            "provider": self._provider.name,
             "when": when.isoformat(),
             "itineraries": itineraries,
-            # Toggle this by setting hass.data["_nr_debug_raw"] = True somewhere (dev use only)
-            "raw": payload if self.hass.data.get("_nr_debug_raw") else None,
-        }
\ No newline at end of file
+        }
+
+    def _extrapolate(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """The planned itineraries that have not left yet"""
+        if not data.get("when"):
+            return data
+        # The departure times are UK clock times, like the planning time
+        when = dt.datetime.fromisoformat(data["when"]).astimezone(UK_TIMEZONE)
+        now = dt_util.now(UK_TIMEZONE)
+        itineraries = []
+        for itinerary in data.get("itineraries") or []:
+            departure = _departure_at(when, itinerary.get("departure_time"))
+            if departure is None or departure >= now:
+                itineraries.append(itinerary)
+        return {**data, "itineraries": itineraries}
+
+    def _live_index(self) -> LiveIndex:
+        """Index of the trains of every monitored board"""
+        boards = self.hass.data.get(DOMAIN, {}).get(BOARD_COORDINATORS, {})
+        return LiveIndex.from_boards(
+            {board.station: board.data for board in boards.values()}
+        )
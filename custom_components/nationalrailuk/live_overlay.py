@@ -0,0 +1,266 @@
+"""Live times of the monitored boards overlaid on planned itineraries
+
+Planned legs only carry timetable times. The trains of the processed boards
+are indexed once per overlay by serviceID and by (CRS, scheduled departure
+time, operator) so each leg is matched with its live calling points in
+constant time, without calling the planner again.
+
+The polled boards name the operators, the push feed and the planners give
+their two letter ATOC code, or a reference ending with it. Both are brought
+to the code before indexing and matching.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .stations import normalise
+
+MINUTES_PER_DAY = 24 * 60
+
+# ATOC codes of the train operators, by normalised name and common short name
+OPERATOR_CODES = {
+    "avanti west coast": "VT",
+    "c2c": "CC",
+    "caledonian sleeper": "CS",
+    "chiltern railways": "CH",
+    "crosscountry": "XC",
+    "east midlands railway": "EM",
+    "emr": "EM",
+    "elizabeth line": "XR",
+    "eurostar": "ES",
+    "gatwick express": "GX",
+    "grand central": "GC",
+    "great northern": "GN",
+    "great western railway": "GW",
+    "gwr": "GW",
+    "greater anglia": "LE",
+    "heathrow express": "HX",
+    "hull trains": "HT",
+    "island line": "IL",
+    "london north eastern railway": "GR",
+    "lner": "GR",
+    "london northwestern railway": "LM",
+    "london overground": "LO",
+    "lumo": "LD",
+    "merseyrail": "ME",
+    "northern": "NT",
+    "scotrail": "SR",
+    "south western railway": "SW",
+    "swr": "SW",
+    "southeastern": "SE",
+    "southern": "SN",
+    "thameslink": "TL",
+    "transport for wales": "AW",
+    "tfw rail": "AW",
+    "transpennine express": "TP",
+    "west midlands railway": "LM",
+}
+
+# (crs, "HH:MM") or (crs, "HH:MM", operator)
+LegKey = Tuple[str, ...]
+
+# Marks a key shared by several trains, which cannot be matched on it
+_AMBIGUOUS = object()
+
+
+def _clock(value: Any) -> Optional[str]:
+    if isinstance(value, dt.datetime):
+        return value.strftime("%H:%M")
+    return None
+
+
+def operator_code(value: Any) -> Optional[str]:
+    """ATOC code of an operator name, code or reference like "ntrod:SW"
+
+    An unknown name is returned normalised, so it still matches itself.
+    """
+    if not value:
+        return None
+    text = str(value).strip()
+    code = text.rsplit(":", 1)[-1]
+    if len(code) == 2 and code.isalnum() and code.isupper():
+        return code
+    name = normalise(text)
+    return OPERATOR_CODES.get(name, name) or None
+
+
+def _minutes(clock: Optional[str]) -> Optional[int]:
+    """Minutes of the day of an HH:MM clock time"""
+    if not clock:
+        return None
+    try:
+        hours, minutes = (int(part) for part in clock.split(":")[:2])
+    except ValueError:
+        return None
+    return hours * 60 + minutes
+
+
+def _difference(later: Optional[str], earlier: Optional[str]) -> Optional[int]:
+    """Minutes from earlier to later, across midnight if closer"""
+    later_minutes = _minutes(later)
+    earlier_minutes = _minutes(earlier)
+    if later_minutes is None or earlier_minutes is None:
+        return None
+    delta = (later_minutes - earlier_minutes) % MINUTES_PER_DAY
+    return delta - MINUTES_PER_DAY if delta >= MINUTES_PER_DAY // 2 else delta
+
+
+class LiveCall:
+    """Live state of a train at one of its calling points"""
+
+    __slots__ = ("scheduled", "expected", "platform", "cancelled")
+
+    def __init__(
+        self,
+        scheduled: Optional[str],
+        expected: Optional[str],
+        platform: Optional[str],
+        cancelled: bool,
+    ) -> None:
+        self.scheduled = scheduled
+        self.expected = expected
+        self.platform = platform
+        self.cancelled = cancelled
+
+    @property
+    def delay(self) -> Optional[int]:
+        """Minutes late, None when unknown"""
+        return _difference(self.expected, self.scheduled)
+
+
+class LiveIndex:
+    """Board trains indexed by serviceID and by departure point"""
+
+    def __init__(self) -> None:
+        self._services: Dict[str, Dict[str, LiveCall]] = {}
+        self._points: Dict[LegKey, Any] = {}
+
+    @classmethod
+    def from_boards(cls, boards: Dict[str, Optional[Dict[str, Any]]]) -> "LiveIndex":
+        """Index the trains of the processed boards keyed by station CRS"""
+        index = cls()
+        for crs, board in boards.items():
+            for dest in (board or {}).get("dests", {}).values():
+                for direction in ("Departure", "Arrival"):
+                    for train in (dest.get(direction) or {}).get("trains", []):
+                        index.add_train(crs, train, direction)
+        return index
+
+    def _add_key(self, key: LegKey, calls: Dict[str, LiveCall]) -> None:
+        known = self._points.get(key)
+        if known is None:
+            self._points[key] = calls
+        elif known is not calls:
+            self._points[key] = _AMBIGUOUS
+
+    def add_train(
+        self, station: str, train: Dict[str, Any], direction: str = "Departure"
+    ) -> None:
+        """Index a train shown on the direction board of station
+
+        Only the calls a leg can board at are indexed by time: the points
+        before the board station give their departure time, the ones after
+        it their arrival, like the board station on the arrival board.
+        """
+        operator = operator_code(train.get("operator"))
+        boarding = True
+        service_id = train.get("serviceID")
+        calls = self._services.get(service_id) if service_id else None
+        if calls is None:
+            calls = {}
+            if service_id:
+                self._services[service_id] = calls
+
+        for point in train.get("callingPoints") or []:
+            crs = point.get("crs")
+            if not crs:
+                continue
+            departs = boarding and (crs != station or direction == "Departure")
+            if crs == station:
+                boarding = False
+            scheduled = _clock(point.get("st"))
+            # The board station gives the platform, its point is kept
+            platform = train.get("platform") if crs == station else None
+            known = calls.get(crs)
+            if known is None or (platform and not known.platform):
+                live = point.get("at") or point.get("et")
+                cancelled = bool(point.get("isCancelled")) or live == "Cancelled"
+                if crs == station:
+                    cancelled = cancelled or bool(train.get("isCancelled"))
+                if isinstance(live, dt.datetime):
+                    expected = _clock(live)
+                else:
+                    # No estimate yet means on time, "Delayed" has no time
+                    expected = scheduled if live is None and not cancelled else None
+                calls[crs] = LiveCall(scheduled, expected, platform, cancelled)
+            if scheduled and departs:
+                self._add_key((crs, scheduled), calls)
+                if operator:
+                    self._add_key((crs, scheduled, operator), calls)
+
+    def _calls(self, leg: Dict[str, Any]) -> Optional[Dict[str, LiveCall]]:
+        service_id = leg.get("service_id")
+        if service_id and service_id in self._services:
+            return self._services[service_id]
+        crs = leg.get("from_crs")
+        departure = leg.get("departure_time")
+        if not crs or not departure:
+            return None
+        calls = self._points.get((crs, departure, operator_code(leg.get("operator"))))
+        if calls is None:
+            calls = self._points.get((crs, departure))
+        return None if calls is _AMBIGUOUS else calls
+
+    def annotate_leg(self, leg: Dict[str, Any]) -> Dict[str, Any]:
+        """A copy of the leg with its live departure and arrival, if known"""
+        calls = self._calls(leg)
+        if not calls:
+            return leg
+
+        leg = dict(leg)
+        departure = calls.get(leg.get("from_crs"))
+        if departure is not None:
+            leg["expected_departure"] = departure.expected
+            leg["departure_delay"] = departure.delay
+            if departure.platform:
+                leg["platform"] = departure.platform
+            leg["cancelled"] = departure.cancelled
+        arrival = calls.get(leg.get("to_crs"))
+        if arrival is not None:
+            leg["expected_arrival"] = arrival.expected
+            leg["arrival_delay"] = arrival.delay
+            leg["cancelled"] = leg.get("cancelled", False) or arrival.cancelled
+        return leg
+
+    def annotate(
+        self, itineraries: Iterable[Dict[str, Any]], min_interchange: int
+    ) -> List[Dict[str, Any]]:
+        """Copies of the itineraries with live legs and broken connections
+
+        A connection is broken when the live arrival of a leg leaves less
+        than min_interchange minutes before the live departure of the next.
+        """
+        annotated = []
+        for itinerary in itineraries:
+            legs = [self.annotate_leg(leg) for leg in itinerary.get("legs") or []]
+            trains = [leg for leg in legs if leg.get("mode", "train") == "train"]
+            broken = []
+            for before, after in zip(trains, trains[1:]):
+                slack = _difference(
+                    after.get("expected_departure") or after.get("departure_time"),
+                    before.get("expected_arrival") or before.get("arrival_time"),
+                )
+                if slack is not None and slack < min_interchange:
+                    broken.append(after.get("from_crs") or after.get("from"))
+
+            result = dict(itinerary, legs=legs)
+            if trains:
+                last = trains[-1]
+                result["expected_arrival"] = last.get("expected_arrival")
+                result["arrival_delay"] = last.get("arrival_delay")
+                result["cancelled"] = any(leg.get("cancelled") for leg in trains)
+                result["broken_connections"] = broken
+            annotated.append(result)
+        return annotated
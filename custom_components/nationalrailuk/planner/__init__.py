@@ -0,0 +1,22 @@
+"""Journey planners used by the journey planner coordinator."""
+
+from .base import (
+    PROVIDERS,
+    PlannerError,
+    PlannerProvider,
+    PlannerState,
+    PlanRequest,
+    create_provider,
+)
+
+# Importing the backends registers their providers
+from . import csa, ojp_client, race, transportapi_client  # noqa: E402,F401
+
+__all__ = [
+    "PROVIDERS",
+    "PlannerError",
+    "PlannerProvider",
+    "PlannerState",
+    "PlanRequest",
+    "create_provider",
+]
@@ -0,0 +1,220 @@
+"""Interface of the journey planner providers and the layers they share
+
+Every provider plans through PlannerProvider.plan, which serves the shared
+itinerary cache first, then waits for the rate limiter of the provider and
+records the latency and outcome of the call. Providers of the same name
+share their rate limiter and metrics across config entries through the
+PlannerState they are built with, and the HTTP providers are given the
+connection pool of Home Assistant.
+"""
+
+from __future__ import annotations
+
+import abc
+import asyncio
+import datetime as dt
+import time
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Type
+
+import httpx
+
+from .cache import ItineraryCache, time_bucket
+from .ranking import RANK_ARRIVAL
+
+# Weight of the last call in the average latency
+LATENCY_SMOOTHING = 0.2
+
+
+class PlannerError(Exception):
+    """The planner could not be queried"""
+
+
+class PlanRequest(NamedTuple):
+    """A journey to plan"""
+
+    origin: str
+    destination: str
+    when: dt.datetime
+    via: Optional[str] = None
+    avoid: Optional[str] = None
+    max_changes: int = 2
+    min_interchange: int = 5
+    count: int = 3
+    rank: str = RANK_ARRIVAL
+
+    def cache_key(self, provider: str) -> tuple:
+        """Key of the request in the itinerary cache, with its time bucket"""
+        return (provider, *self[:2], *self[3:], time_bucket(self.when))
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` calls per second in bursts of `burst`"""
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a call is allowed"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self._burst, self._tokens + (now - self._updated) * self._rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
+class ProviderMetrics:
+    """Call counts and latency of a provider"""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.last_latency: Optional[float] = None
+        self.average_latency: Optional[float] = None
+        # Races entered and won when planning against other providers
+        self.races = 0
+        self.wins = 0
+
+    def record(self, latency: float, error: Optional[BaseException] = None) -> None:
+        """Account for a finished call, latency in seconds"""
+        self.calls += 1
+        if error is not None:
+            self.errors += 1
+            self.last_error = str(error)
+        self.last_latency = latency
+        if self.average_latency is None:
+            self.average_latency = latency
+        else:
+            self.average_latency += LATENCY_SMOOTHING * (latency - self.average_latency)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """JSON serialisable view, latencies in milliseconds"""
+
+        def millis(value: Optional[float]) -> Optional[int]:
+            return None if value is None else round(value * 1000)
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.calls, 3) if self.calls else None,
+            "last_error": self.last_error,
+            "last_latency_ms": millis(self.last_latency),
+            "average_latency_ms": millis(self.average_latency),
+            "races": self.races,
+            "wins": self.wins,
+            "win_rate": round(self.wins / self.races, 3) if self.races else None,
+        }
+
+
+PROVIDERS: Dict[str, Type["PlannerProvider"]] = {}
+
+
+class PlannerState:
+    """Rate limiters and metrics of the providers, by provider name
+
+    The integration keeps one in hass.data so every entry shares them. A
+    provider built without one gets its own.
+    """
+
+    def __init__(self) -> None:
+        self.limiters: Dict[str, RateLimiter] = {}
+        self.metrics: Dict[str, ProviderMetrics] = {}
+
+
+def register_provider(cls: Type["PlannerProvider"]) -> Type["PlannerProvider"]:
+    """Class decorator adding a provider to PROVIDERS under its name"""
+    PROVIDERS[cls.name] = cls
+    return cls
+
+
+class PlannerProvider(abc.ABC):
+    """A journey planner backend
+
+    Subclasses set name, their rate limit, and implement _plan. They are
+    built from the options of a config entry with from_options.
+    """
+
+    name: str = ""
+    # Calls per second and burst allowed upstream, shared by every entry
+    rate: float = 1.0
+    burst: int = 2
+
+    def __init__(
+        self,
+        cache: Optional[ItineraryCache] = None,
+        state: Optional[PlannerState] = None,
+    ) -> None:
+        self._cache = cache
+        state = state or PlannerState()
+        self.limiter = state.limiters.setdefault(
+            self.name, RateLimiter(self.rate, self.burst)
+        )
+        self.metrics = state.metrics.setdefault(self.name, ProviderMetrics())
+
+    @classmethod
+    @abc.abstractmethod
+    def from_options(
+        cls,
+        options: Mapping[str, Any],
+        client: Optional[httpx.AsyncClient] = None,
+        cache: Optional[ItineraryCache] = None,
+        boards: Optional[Callable[[], List[Optional[Dict[str, Any]]]]] = None,
+        state: Optional[PlannerState] = None,
+    ) -> "PlannerProvider":
+        """Build the provider from config entry options
+
+        client is the connection pool of the HTTP providers. boards returns
+        the processed data of the monitored boards, for the providers
+        planning over them. Raises PlannerError when the options are not
+        usable.
+        """
+
+    async def plan(self, request: PlanRequest) -> List[Dict[str, Any]]:
+        """The best itineraries for the request, from the cache if possible"""
+        if self._cache is None:
+            return await self._measured(request)
+        return await self._cache.get_or_plan(
+            request.cache_key(self.name), lambda: self._measured(request)
+        )
+
+    async def _measured(self, request: PlanRequest) -> List[Dict[str, Any]]:
+        await self.limiter.acquire()
+        start = time.monotonic()
+        try:
+            itineraries = await self._plan(request)
+        except Exception as err:
+            # Unexpected failures count as errors of the provider too
+            self.metrics.record(time.monotonic() - start, err)
+            raise
+        self.metrics.record(time.monotonic() - start)
+        return itineraries
+
+    @abc.abstractmethod
+    async def _plan(self, request: PlanRequest) -> List[Dict[str, Any]]:
+        """The count best itineraries for the request, in the sensor shape"""
+
+
+def create_provider(
+    name: str,
+    options: Mapping[str, Any],
+    client: Optional[httpx.AsyncClient] = None,
+    cache: Optional[ItineraryCache] = None,
+    boards: Optional[Callable[[], List[Optional[Dict[str, Any]]]]] = None,
+    state: Optional[PlannerState] = None,
+) -> PlannerProvider:
+    """Build the registered provider called name"""
+    try:
+        cls = PROVIDERS[name]
+    except KeyError as err:
+        raise PlannerError(f"Unknown journey planner {name!r}") from err
+    return cls.from_options(options, client, cache, boards, state)
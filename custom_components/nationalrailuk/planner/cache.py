@@ -0,0 +1,124 @@
+"""Time-bucketed LRU cache of planned itineraries"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+import datetime as dt
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Tuple
+
+# Journeys planned within the same bucket share one result
+TIME_BUCKET_MINUTES = 2
+CACHE_TTL = 120
+CACHE_SIZE = 64
+
+
+def time_bucket(when: dt.datetime, minutes: int = TIME_BUCKET_MINUTES) -> dt.datetime:
+    """Floor a time to its bucket"""
+    floored = when.replace(second=0, microsecond=0)
+    return floored - dt.timedelta(minutes=floored.minute % minutes)
+
+
+def _leg_keys(itineraries: List[Dict[str, Any]]) -> Tuple[set, set]:
+    """Departure points and services used by the legs of itineraries"""
+    points, services = set(), set()
+    for itinerary in itineraries:
+        for leg in itinerary.get("legs") or []:
+            if leg.get("from_crs") and leg.get("departure_time"):
+                points.add((leg["from_crs"], leg["departure_time"]))
+            if leg.get("service_id"):
+                services.add(leg["service_id"])
+    return points, services
+
+
+class ItineraryCache:
+    """LRU cache of itineraries keyed on the journey and a time bucket
+
+    Concurrent requests for the same key share the same planning call.
+    Entries are dropped early when one of their legs is disrupted.
+    """
+
+    def __init__(self, size: int = CACHE_SIZE, ttl: float = CACHE_TTL) -> None:
+        self._size = size
+        self._ttl = ttl
+        self._entries: OrderedDict[Hashable, Tuple[float, List, set, set]] = (
+            OrderedDict()
+        )
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> List[Dict[str, Any]] | None:
+        """Cached itineraries for key, if still fresh"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: Hashable, itineraries: List[Dict[str, Any]]) -> None:
+        """Store itineraries, evicting the least recently used entries"""
+        points, services = _leg_keys(itineraries)
+        expiry = time.monotonic() + self._ttl
+        self._entries[key] = (expiry, itineraries, points, services)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._size:
+            self._entries.popitem(last=False)
+
+    async def get_or_plan(
+        self,
+        key: Hashable,
+        plan: Callable[[], Awaitable[List[Dict[str, Any]]]],
+    ) -> List[Dict[str, Any]]:
+        """Cached itineraries for key, planning them once if missing"""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        if key in self._inflight:
+            return await asyncio.shield(self._inflight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            itineraries = await plan()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as err:
+            future.set_exception(err)
+            # Waiters re-raise it, do not warn if there are none
+            future.exception()
+            raise
+        else:
+            future.set_result(itineraries)
+            self.put(key, itineraries)
+            return itineraries
+        finally:
+            del self._inflight[key]
+
+    def invalidate(
+        self,
+        points: Iterable[Tuple[str, str]] = (),
+        services: Iterable[str] = (),
+    ) -> int:
+        """Drop the entries using a disrupted departure point or service
+
+        points are (crs, "HH:MM") scheduled departures, return the number of
+        entries dropped.
+        """
+        points = set(points)
+        services = set(services)
+        stale = [
+            key
+            for key, (_, _, entry_points, entry_services) in self._entries.items()
+            if entry_points & points or entry_services & services
+        ]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
@@ -0,0 +1,404 @@
+"""Offline journey planner running the Connection Scan Algorithm
+
+The timetable is built from the calling points of the trains already held in
+the processed boards, so planning needs no upstream call. Only the trains
+shown on the monitored boards are known, which covers the journeys between
+the monitored stations and the stations those trains call at.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from bisect import bisect_left
+import datetime as dt
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from ..const import PLANNER_LOCAL, UK_TIMEZONE
+from .base import (
+    PlannerError,
+    PlannerProvider,
+    PlannerState,
+    PlanRequest,
+    register_provider,
+)
+from .cache import ItineraryCache
+from .ranking import RANK_ARRIVAL, TopK, compact_leg, score
+
+INFINITY = float("inf")
+# Successive journeys considered per itinerary returned, so a later but
+# shorter journey can outrank the earliest ones
+CANDIDATES = 3
+
+
+class Connection(NamedTuple):
+    """A train running between two consecutive calling points"""
+
+    departure: int
+    arrival: int
+    from_crs: str
+    to_crs: str
+    trip: int
+
+
+class Trip(NamedTuple):
+    """The train a connection belongs to"""
+
+    service_id: Optional[str]
+    operator: Optional[str]
+    destination: Optional[str]
+
+
+def _timestamp(point: Dict[str, Any], *keys: str) -> Optional[int]:
+    """Epoch seconds of the first time of the point that is a datetime"""
+    for key in keys:
+        value = point.get(key)
+        if isinstance(value, dt.datetime):
+            return int(value.timestamp())
+    return None
+
+
+class Timetable:
+    """Connections sorted by departure time"""
+
+    def __init__(self) -> None:
+        self.connections: List[Connection] = []
+        self.trips: List[Trip] = []
+        self.names: Dict[str, str] = {}
+        self._departures: List[int] = []
+
+    @classmethod
+    def from_boards(
+        cls, boards: Iterable[Optional[Dict[str, Any]]]
+    ) -> "Timetable":
+        """Build the timetable of every train of the processed boards"""
+        timetable = cls()
+        seen: Set[str] = set()
+
+        for board in boards:
+            for dest in (board or {}).get("dests", {}).values():
+                for direction in ("Departure", "Arrival"):
+                    for train in (dest.get(direction) or {}).get("trains", []):
+                        service_id = train.get("serviceID")
+                        if service_id in seen or train.get("isCancelled"):
+                            continue
+                        if service_id:
+                            seen.add(service_id)
+                        timetable.add_train(train)
+
+        timetable.finalise()
+        return timetable
+
+    def add_train(self, train: Dict[str, Any]) -> None:
+        """Add the connections between the calling points of a train"""
+        trip = len(self.trips)
+        self.trips.append(
+            Trip(
+                train.get("serviceID"),
+                train.get("operator"),
+                train.get("destination"),
+            )
+        )
+
+        previous = None
+        for point in train.get("callingPoints", []):
+            if point.get("isCancelled"):
+                continue
+            self.names.setdefault(point["crs"], point["locationName"])
+            # Live times first, the timetable otherwise
+            time = _timestamp(point, "atet", "et", "st")
+            if time is None:
+                continue
+            if previous is not None and time >= previous[1]:
+                self.connections.append(
+                    Connection(previous[1], time, previous[0], point["crs"], trip)
+                )
+            previous = (point["crs"], time)
+
+    def finalise(self) -> None:
+        """Sort the connections, must be called after the last add_train"""
+        self.connections.sort()
+        self._departures = [
+            connection.departure for connection in self.connections
+        ]
+
+    def first_after(self, time: int) -> int:
+        """Index of the first connection departing at or after time"""
+        return bisect_left(self._departures, time)
+
+
+class _Leg(NamedTuple):
+    board: Connection
+    alight: Connection
+
+
+class OfflinePlanner:
+    """Earliest arrival journeys over a Timetable with a bounded number of legs"""
+
+    def __init__(self, timetable: Timetable) -> None:
+        self.timetable = timetable
+
+    def _scan(
+        self,
+        origin: str,
+        destination: str,
+        start: int,
+        max_legs: int,
+        min_change: int,
+        avoid: Set[str],
+        onboard: Optional[Tuple[int, int]] = None,
+    ) -> Optional[List[_Leg]]:
+        """Earliest arrival from origin to destination leaving after start
+
+        earliest[n] holds the earliest arrival at each stop using n legs, so
+        the interchange time and the number of changes are honoured exactly.
+        Each train is ridden with the fewest legs it can be boarded with so
+        far, a later stop boarding it with fewer legs takes over.
+        onboard is the (trip, arrival time) of a train already at origin that
+        can be stayed on without an interchange.
+        """
+        connections = self.timetable.connections
+        earliest: List[Dict[str, int]] = [{} for _ in range(max_legs + 1)]
+        parent: List[Dict[str, Tuple[int, int]]] = [{} for _ in range(max_legs + 1)]
+        boarded: Dict[int, Tuple[int, int]] = {}
+        earliest[0][origin] = start
+        best = INFINITY
+
+        first = start
+        if onboard is not None:
+            first = min(first, onboard[1])
+
+        for index in range(self.timetable.first_after(first), len(connections)):
+            connection = connections[index]
+            if connection.departure >= best:
+                break
+            if connection.from_crs in avoid or connection.to_crs in avoid:
+                continue
+
+            trip = boarded.get(connection.trip)
+            if (
+                trip is None
+                and onboard is not None
+                and connection.trip == onboard[0]
+                and connection.from_crs == origin
+            ):
+                trip = (1, index)
+                boarded[connection.trip] = trip
+            # A train boarded already is boarded again here if that takes
+            # fewer legs, its later stops are then reached with fewer legs
+            for legs in range(trip[0] - 1 if trip else max_legs):
+                reached = earliest[legs].get(connection.from_crs)
+                if reached is None:
+                    continue
+                change = min_change if legs else 0
+                if reached + change <= connection.departure:
+                    trip = (legs + 1, index)
+                    boarded[connection.trip] = trip
+                    break
+            if trip is None:
+                continue
+
+            legs, board_index = trip
+            if connection.arrival < earliest[legs].get(connection.to_crs, INFINITY):
+                earliest[legs][connection.to_crs] = connection.arrival
+                parent[legs][connection.to_crs] = (board_index, index)
+                if connection.to_crs == destination:
+                    best = min(best, connection.arrival)
+
+        arrivals = [
+            (earliest[legs][destination], legs)
+            for legs in range(1, max_legs + 1)
+            if destination in earliest[legs]
+        ]
+        if not arrivals:
+            return None
+
+        _, legs = min(arrivals)
+        journey: List[_Leg] = []
+        stop = destination
+        while legs:
+            board_index, alight_index = parent[legs][stop]
+            journey.append(_Leg(connections[board_index], connections[alight_index]))
+            stop = connections[board_index].from_crs
+            legs -= 1
+        journey.reverse()
+        return journey
+
+    def _journey(
+        self,
+        origin: str,
+        destination: str,
+        start: int,
+        via: Optional[str],
+        max_legs: int,
+        min_change: int,
+        avoid: Set[str],
+    ) -> Optional[List[_Leg]]:
+        if not via:
+            return self._scan(origin, destination, start, max_legs, min_change, avoid)
+
+        first = self._scan(origin, via, start, max_legs, min_change, avoid)
+        if not first:
+            return None
+        # Staying on the same train through via costs no leg
+        arrival = first[-1].alight.arrival
+        second = self._scan(
+            via,
+            destination,
+            arrival + min_change,
+            max_legs - len(first) + 1,
+            min_change,
+            avoid,
+            (first[-1].board.trip, arrival),
+        )
+        if not second:
+            return None
+        if second[0].board.trip == first[-1].board.trip:
+            first[-1] = _Leg(first[-1].board, second[0].alight)
+            second = second[1:]
+        journey = first + second
+        return journey if len(journey) <= max_legs else None
+
+    def plan(
+        self,
+        origin: str,
+        destination: str,
+        when: dt.datetime,
+        via: Optional[str] = None,
+        avoid: Optional[str] = None,
+        max_changes: int = 2,
+        min_interchange: int = 5,
+        count: int = 3,
+        rank: str = RANK_ARRIVAL,
+    ) -> List[Dict[str, Any]]:
+        """The count best of the next journeys, in the to_simple_itineraries shape"""
+        best = TopK(count)
+        start = int(when.timestamp())
+        avoided = {avoid} if avoid else set()
+
+        for _ in range(count * CANDIDATES):
+            journey = self._journey(
+                origin,
+                destination,
+                start,
+                via,
+                max_changes + 1,
+                min_interchange * 60,
+                avoided,
+            )
+            if not journey:
+                break
+            departure = journey[0].board.departure
+            arrival = journey[-1].alight.arrival
+            journey_score = score(rank, arrival, arrival - departure, len(journey) - 1)
+            if best.would_keep(journey_score):
+                best.push(journey_score, self._itinerary(journey))
+            # Next journey must leave later than this one
+            start = departure + 60
+
+        return best.best()
+
+    def _itinerary(self, journey: List[_Leg]) -> Dict[str, Any]:
+        names = self.timetable.names
+
+        def clock(timestamp: int) -> str:
+            when = dt.datetime.fromtimestamp(timestamp, tz=UK_TIMEZONE)
+            return when.strftime("%H:%M")
+
+        legs = []
+        for leg in journey:
+            trip = self.timetable.trips[leg.board.trip]
+            legs.append(
+                compact_leg(
+                    {
+                        "mode": "train",
+                        "from": names.get(leg.board.from_crs),
+                        "from_crs": leg.board.from_crs,
+                        "to": names.get(leg.alight.to_crs),
+                        "to_crs": leg.alight.to_crs,
+                        "departure_time": clock(leg.board.departure),
+                        "arrival_time": clock(leg.alight.arrival),
+                        "operator": trip.operator,
+                        "destination": trip.destination,
+                        "service_id": trip.service_id,
+                    }
+                )
+            )
+
+        departure = journey[0].board.departure
+        arrival = journey[-1].alight.arrival
+        minutes = (arrival - departure) // 60
+        return {
+            "departure_time": clock(departure),
+            "arrival_time": clock(arrival),
+            "duration": f"{minutes // 60:02d}:{minutes % 60:02d}:00",
+            "changes": len(journey) - 1,
+            "legs": legs,
+        }
+
+
+@register_provider
+class LocalProvider(PlannerProvider):
+    """Offline planner over the trains of the monitored boards"""
+
+    name = PLANNER_LOCAL
+    # Nothing is called upstream
+    rate = 20.0
+    burst = 20
+
+    def __init__(
+        self,
+        boards: Callable[[], List[Optional[Dict[str, Any]]]],
+        cache: Optional[ItineraryCache] = None,
+        state: Optional[PlannerState] = None,
+    ) -> None:
+        super().__init__(cache, state)
+        self._boards = boards
+
+    @classmethod
+    def from_options(
+        cls,
+        options: Mapping[str, Any],
+        client=None,
+        cache: Optional[ItineraryCache] = None,
+        boards: Optional[Callable[[], List[Optional[Dict[str, Any]]]]] = None,
+        state: Optional[PlannerState] = None,
+    ) -> "LocalProvider":
+        if boards is None:
+            raise PlannerError("The offline planner needs the monitored boards")
+        return cls(boards, cache, state)
+
+    async def _plan(self, request: PlanRequest) -> List[Dict[str, Any]]:
+        # The boards are read on the event loop, the scan of a few thousand
+        # connections per journey runs in the executor
+        boards = self._boards()
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self._plan_boards, boards, request
+        )
+
+    @staticmethod
+    def _plan_boards(
+        boards: List[Optional[Dict[str, Any]]], request: PlanRequest
+    ) -> List[Dict[str, Any]]:
+        timetable = Timetable.from_boards(boards)
+        return OfflinePlanner(timetable).plan(
+            request.origin,
+            request.destination,
+            request.when,
+            via=request.via,
+            avoid=request.avoid,
+            max_changes=request.max_changes,
+            min_interchange=request.min_interchange,
+            count=request.count,
+            rank=request.rank,
+        )
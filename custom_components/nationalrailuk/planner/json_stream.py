@@ -0,0 +1,59 @@
+"""Incremental parsing of a JSON array inside a streamed response"""
+
+from __future__ import annotations
+
+import codecs
+import json
+from typing import Any, AsyncIterator
+
+
+class JsonStreamError(ValueError):
+    """The streamed document ended before the array was complete"""
+
+
+async def iter_json_array(
+    chunks: AsyncIterator[bytes], key: str
+) -> AsyncIterator[Any]:
+    """Yield the items of the array stored under `key` as they arrive
+
+    Only the item being decoded is held in memory, the rest of the document
+    is skipped. The first occurrence of the key is used, so it must not
+    appear as a string earlier in the document.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    marker = f'"{key}"'
+    buffer = ""
+    in_array = False
+
+    async for chunk in chunks:
+        buffer += text.decode(chunk)
+        while True:
+            if not in_array:
+                start = buffer.find(marker)
+                if start < 0:
+                    # Keep enough to match a marker split across chunks
+                    buffer = buffer[-len(marker) :]
+                    break
+                bracket = buffer.find("[", start + len(marker))
+                if bracket < 0:
+                    buffer = buffer[start:]
+                    break
+                buffer = buffer[bracket + 1 :]
+                in_array = True
+
+            buffer = buffer.lstrip(" \t\r\n,")
+            if not buffer:
+                break
+            if buffer[0] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                # Incomplete item, wait for the next chunk
+                break
+            yield item
+            buffer = buffer[end:]
+
+    if in_array:
+        raise JsonStreamError(f"Truncated '{key}' array")
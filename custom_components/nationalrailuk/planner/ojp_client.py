@@ -0,0 +1,316 @@
+"""Client for Open Journey Planner (OJP 1.0) trip requests
+
+The endpoint and its bearer token come from the config entry. Stations are
+referenced by their CRS code, so the endpoint must accept CRS codes as stop
+place references. Trip results are parsed one by one while the XML response
+streams in and only the best are kept.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import re
+import sys
+from typing import Any, Callable, Dict, List, Mapping, Optional
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+import httpx
+
+from ..const import CONF_OJP_TOKEN, CONF_OJP_URL, PLANNER_OJP
+from ..stations import get_registry
+from .base import (
+    PlannerError,
+    PlannerProvider,
+    PlannerState,
+    PlanRequest,
+    register_provider,
+)
+from .cache import ItineraryCache
+from .ranking import TopK, compact_leg, score
+
+_LOGGER = logging.getLogger(__name__)
+
+OJP_NS = "http://www.vdv.de/ojp"
+SIRI_NS = "http://www.siri.org.uk/siri"
+REQUESTOR = "homeassistant_nationalrail"
+
+_TAG = "{%s}%%s" % OJP_NS
+_DURATION = re.compile(r"P(?:(\d+)D)?T?(?:(\d+)H)?(?:(\d+)M)?(?:[\d.]+S)?$")
+
+
+class OjpError(PlannerError):
+    """The OJP endpoint could not be queried"""
+
+
+def _ojp(name: str) -> str:
+    return _TAG % name
+
+
+def _text(element: Optional[ElementTree.Element], path: str) -> Optional[str]:
+    """Text of the first element at an OJP path like "LegBoard/StopPointRef" """
+    if element is None:
+        return None
+    found = element.find("/".join(_ojp(part) for part in path.split("/")))
+    return found.text.strip() if found is not None and found.text else None
+
+
+def _time(value: Optional[str], tzinfo) -> Optional[dt.datetime]:
+    if not value:
+        return None
+    try:
+        return dt.datetime.fromisoformat(value.replace("Z", "+00:00")).astimezone(
+            tzinfo
+        )
+    except ValueError:
+        return None
+
+
+def _duration_minutes(value: Optional[str]) -> Optional[int]:
+    """Minutes of an xs:duration such as PT1H25M"""
+    match = _DURATION.match(value or "")
+    if not match or not value:
+        return None
+    days, hours, minutes = (int(part or 0) for part in match.groups())
+    return (days * 24 + hours) * 60 + minutes
+
+
+def _crs(ref: Optional[str], name: Optional[str]) -> Optional[str]:
+    registry = get_registry()
+    if ref and ref.upper() in registry:
+        return ref.upper()
+    station = registry.by_name(name) if name else None
+    return station.crs if station else None
+
+
+def _place(tag: str, crs: str) -> str:
+    return (
+        f"<ojp:{tag}><ojp:StopPlaceRef>{escape(crs)}</ojp:StopPlaceRef></ojp:{tag}>"
+    )
+
+
+def trip_request(request: PlanRequest) -> str:
+    """Body of the OJPTripRequest of a journey"""
+    now = dt.datetime.now(dt.timezone.utc).isoformat()
+    when = request.when.astimezone(dt.timezone.utc).isoformat()
+    via = (
+        f"<ojp:Via><ojp:ViaPoint><ojp:StopPlaceRef>{escape(request.via)}"
+        "</ojp:StopPlaceRef></ojp:ViaPoint></ojp:Via>"
+        if request.via
+        else ""
+    )
+    not_via = (
+        f"<ojp:NotVia><ojp:StopPlaceRef>{escape(request.avoid)}"
+        "</ojp:StopPlaceRef></ojp:NotVia>"
+        if request.avoid
+        else ""
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<OJP xmlns="{SIRI_NS}" xmlns:ojp="{OJP_NS}" version="1.0">'
+        "<OJPRequest><ServiceRequest>"
+        f"<RequestTimestamp>{now}</RequestTimestamp>"
+        f"<RequestorRef>{REQUESTOR}</RequestorRef>"
+        "<ojp:OJPTripRequest>"
+        f"<RequestTimestamp>{now}</RequestTimestamp>"
+        "<ojp:Origin>"
+        f"{_place('PlaceRef', request.origin)}"
+        f"<ojp:DepArrTime>{when}</ojp:DepArrTime>"
+        "</ojp:Origin>"
+        "<ojp:Destination>"
+        f"{_place('PlaceRef', request.destination)}"
+        "</ojp:Destination>"
+        f"{via}{not_via}"
+        "<ojp:Params>"
+        # Results are filtered on the interchange time, ask for spares
+        f"<ojp:NumberOfResults>{request.count * 2}</ojp:NumberOfResults>"
+        f"<ojp:TransferLimit>{request.max_changes}</ojp:TransferLimit>"
+        "<ojp:IncludeIntermediateStops>false</ojp:IncludeIntermediateStops>"
+        "<ojp:PtModeFilter><ojp:Exclude>false</ojp:Exclude>"
+        "<ojp:PtMode>rail</ojp:PtMode></ojp:PtModeFilter>"
+        "</ojp:Params>"
+        "</ojp:OJPTripRequest>"
+        "</ServiceRequest></OJPRequest></OJP>"
+    )
+
+
+def _leg(element: ElementTree.Element, tzinfo) -> Optional[Dict[str, Any]]:
+    """A trip leg in the sensor shape, None for an unknown leg type"""
+    timed = element.find(_ojp("TimedLeg"))
+    if timed is None:
+        walk = element.find(_ojp("TransferLeg"))
+        if walk is None:
+            walk = element.find(_ojp("ContinuousLeg"))
+        if walk is None:
+            return None
+        start = _time(_text(walk, "TimeWindowStart"), tzinfo)
+        end = _time(_text(walk, "TimeWindowEnd"), tzinfo)
+        return compact_leg(
+            {
+                "mode": "foot",
+                "from": _text(walk, "LegStart/LocationName/Text"),
+                "to": _text(walk, "LegEnd/LocationName/Text"),
+                "departure_time": start.strftime("%H:%M") if start else None,
+                "arrival_time": end.strftime("%H:%M") if end else None,
+            }
+        )
+
+    board_name = _text(timed, "LegBoard/StopPointName/Text")
+    alight_name = _text(timed, "LegAlight/StopPointName/Text")
+    departure = _time(_text(timed, "LegBoard/ServiceDeparture/TimetabledTime"), tzinfo)
+    arrival = _time(_text(timed, "LegAlight/ServiceArrival/TimetabledTime"), tzinfo)
+    return compact_leg(
+        {
+            "mode": "train",
+            "from": board_name,
+            "from_crs": _crs(_text(timed, "LegBoard/StopPointRef"), board_name),
+            "to": alight_name,
+            "to_crs": _crs(_text(timed, "LegAlight/StopPointRef"), alight_name),
+            "departure_time": departure.strftime("%H:%M") if departure else None,
+            "arrival_time": arrival.strftime("%H:%M") if arrival else None,
+            "operator": _text(timed, "Service/OperatorRef"),
+            "destination": _text(timed, "Service/DestinationText/Text"),
+            "_departure": departure,
+            "_arrival": arrival,
+        }
+    )
+
+
+def _trip(element: ElementTree.Element, request: PlanRequest):
+    """(score, itinerary) of a TripResult, None if it breaks the request"""
+    trip = element.find(_ojp("Trip"))
+    if trip is None:
+        return None
+    tzinfo = request.when.tzinfo
+    legs = [_leg(trip_leg, tzinfo) for trip_leg in trip.iter(_ojp("TripLeg"))]
+    legs = [leg for leg in legs if leg]
+    trains = [leg for leg in legs if leg["mode"] == "train"]
+    if not trains or len(trains) - 1 > request.max_changes:
+        return None
+    if request.avoid and any(
+        request.avoid in (leg.get("from_crs"), leg.get("to_crs")) for leg in trains
+    ):
+        return None
+    for before, after in zip(trains, trains[1:]):
+        if before.get("_arrival") and after.get("_departure"):
+            gap = (after["_departure"] - before["_arrival"]).total_seconds() / 60
+            if gap < request.min_interchange:
+                return None
+
+    start = _time(_text(trip, "StartTime"), tzinfo) or trains[0].get("_departure")
+    end = _time(_text(trip, "EndTime"), tzinfo) or trains[-1].get("_arrival")
+    duration = _duration_minutes(_text(trip, "Duration"))
+    if duration is None and start and end:
+        duration = int((end - start).total_seconds() // 60)
+    for leg in legs:
+        leg.pop("_departure", None)
+        leg.pop("_arrival", None)
+
+    trip_score = score(
+        request.rank,
+        int(end.timestamp() // 60) if end else sys.maxsize,
+        duration if duration is not None else sys.maxsize,
+        len(trains) - 1,
+    )
+    itinerary = {
+        "departure_time": start.strftime("%H:%M") if start else None,
+        "arrival_time": end.strftime("%H:%M") if end else None,
+        "duration": (
+            f"{duration // 60:02d}:{duration % 60:02d}:00"
+            if duration is not None
+            else None
+        ),
+        "changes": len(trains) - 1,
+        "legs": legs,
+    }
+    return trip_score, itinerary
+
+
+@register_provider
+class OjpClient(PlannerProvider):
+    """Async Open Journey Planner client"""
+
+    name = PLANNER_OJP
+    rate = 1.0
+    burst = 2
+
+    def __init__(
+        self,
+        url: str,
+        token: Optional[str],
+        client: httpx.AsyncClient,
+        cache: Optional[ItineraryCache] = None,
+        state: Optional[PlannerState] = None,
+    ) -> None:
+        super().__init__(cache, state)
+        self._url = url
+        self._token = token
+        self.client = client
+
+    @classmethod
+    def from_options(
+        cls,
+        options: Mapping[str, Any],
+        client: Optional[httpx.AsyncClient] = None,
+        cache: Optional[ItineraryCache] = None,
+        boards: Optional[Callable[[], List[Optional[Dict[str, Any]]]]] = None,
+        state: Optional[PlannerState] = None,
+    ) -> "OjpClient":
+        url = options.get(CONF_OJP_URL)
+        if not url:
+            raise OjpError("The OJP endpoint is missing")
+        if client is None:
+            raise OjpError("OJP needs an HTTP client")
+        return cls(url, options.get(CONF_OJP_TOKEN), client, cache, state)
+
+    async def _plan(self, request: PlanRequest) -> List[Dict[str, Any]]:
+        headers = {"Content-Type": "application/xml; charset=utf-8"}
+        if self._token:
+            headers["Authorization"] = f"Bearer {self._token}"
+
+        best = TopK(request.count)
+        parser = ElementTree.XMLPullParser(events=("end",))
+        parsed = 0
+
+        def drain() -> None:
+            nonlocal parsed
+            for _, element in parser.read_events():
+                if element.tag == _ojp("ErrorCondition"):
+                    raise OjpError(
+                        "OJP error: "
+                        + " ".join(text.strip() for text in element.itertext())
+                    )
+                if element.tag != _ojp("TripResult"):
+                    continue
+                parsed += 1
+                result = _trip(element, request)
+                # The parsed result is not needed any more
+                element.clear()
+                if result is not None:
+                    best.push(*result)
+
+        try:
+            async with self.client.stream(
+                "POST",
+                self._url,
+                content=trip_request(request).encode("utf-8"),
+                headers=headers,
+            ) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes():
+                    parser.feed(chunk)
+                    drain()
+            parser.close()
+            drain()
+        except (httpx.HTTPError, ElementTree.ParseError) as err:
+            raise OjpError(f"OJP request failed: {err}") from err
+
+        _LOGGER.debug(
+            "Kept %d of %d OJP trips from %s to %s",
+            len(best),
+            parsed,
+            request.origin,
+            request.destination,
+        )
+        return best.best()
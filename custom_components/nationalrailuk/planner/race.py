@@ -0,0 +1,210 @@
+"""Hedged planning racing every usable provider
+
+The remote providers are queried together. The answers arriving within a
+short grace window after the first non empty one are merged with it, and
+the providers still running are cancelled. The offline planner is only a
+fallback, queried when no remote provider answered in time: it would otherwise win
+every race and cancel the remote calls after they used their quota.
+
+Each provider counts the races it entered and the ones its itineraries
+were kept from in its metrics, next to its latency.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import httpx
+
+from ..const import PLANNER_LOCAL, PLANNER_OJP, PLANNER_RACE, PLANNER_TRANSPORTAPI
+from .base import (
+    PlannerError,
+    PlannerProvider,
+    PlannerState,
+    PlanRequest,
+    create_provider,
+    register_provider,
+)
+from .cache import ItineraryCache
+from .ranking import TopK, itinerary_score
+
+_LOGGER = logging.getLogger(__name__)
+
+# Providers raced, the offline one being the fallback of the remote ones
+RACED = (PLANNER_LOCAL, PLANNER_TRANSPORTAPI, PLANNER_OJP)
+# Seconds the other answers are waited for once the first one is in
+GRACE_WINDOW = 0.5
+# Seconds the remote providers are given before falling back to the offline one
+REMOTE_TIMEOUT = 10
+
+
+def _identity(itinerary: Dict[str, Any]) -> tuple:
+    """What two providers returning the same journey agree on"""
+    return (
+        itinerary.get("departure_time"),
+        itinerary.get("arrival_time"),
+        tuple(
+            (leg.get("from_crs"), leg.get("to_crs"), leg.get("departure_time"))
+            for leg in itinerary.get("legs") or []
+            if leg.get("mode", "train") == "train"
+        ),
+    )
+
+
+@register_provider
+class RaceProvider(PlannerProvider):
+    """Provider planning with every other usable provider at once"""
+
+    name = PLANNER_RACE
+    # The members are rate limited on their own
+    rate = 20.0
+    burst = 20
+
+    def __init__(
+        self,
+        members: Sequence[PlannerProvider],
+        cache: Optional[ItineraryCache] = None,
+        grace: float = GRACE_WINDOW,
+        timeout: float = REMOTE_TIMEOUT,
+        state: Optional[PlannerState] = None,
+    ) -> None:
+        super().__init__(cache, state)
+        self.members = list(members)
+        self._grace = grace
+        self._timeout = timeout
+
+    @classmethod
+    def from_options(
+        cls,
+        options: Mapping[str, Any],
+        client: Optional[httpx.AsyncClient] = None,
+        cache: Optional[ItineraryCache] = None,
+        boards: Optional[Callable[[], List[Optional[Dict[str, Any]]]]] = None,
+        state: Optional[PlannerState] = None,
+    ) -> "RaceProvider":
+        members = []
+        for name in RACED:
+            try:
+                # The race result is cached, not the answer of each member
+                members.append(
+                    create_provider(name, options, client, None, boards, state)
+                )
+            except PlannerError as err:
+                _LOGGER.debug("%s is not raced: %s", name, err)
+        if not members:
+            raise PlannerError("No journey planner can be raced")
+        return cls(members, cache, state=state)
+
+    async def _race(
+        self,
+        members: Sequence[PlannerProvider],
+        request: PlanRequest,
+        limit: Optional[float] = None,
+    ) -> Tuple[List[Tuple[str, List[Dict[str, Any]]]], List[PlannerError]]:
+        """Answers of the members in by the end of the grace window, and errors
+
+        Members still silent limit seconds after the start are given up. A
+        member failing with an unexpected exception is logged and its failure
+        is returned as a PlannerError.
+        """
+        loop = asyncio.get_running_loop()
+        tasks = {
+            asyncio.ensure_future(member.plan(request)): member for member in members
+        }
+        for member in members:
+            member.metrics.races += 1
+
+        answers: List[Tuple[str, List[Dict[str, Any]]]] = []
+        errors: List[PlannerError] = []
+        pending = set(tasks)
+        deadline = None if limit is None else loop.time() + limit
+        try:
+            while pending:
+                timeout = None if deadline is None else max(deadline - loop.time(), 0)
+                done, pending = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    break
+                for task in done:
+                    member = tasks[task]
+                    try:
+                        itineraries = task.result()
+                    except PlannerError as err:
+                        errors.append(err)
+                        continue
+                    except Exception as err:  # pylint: disable=broad-except
+                        # One broken provider must not cancel the others
+                        _LOGGER.exception("%s failed while raced", member.name)
+                        errors.append(PlannerError(f"{member.name} failed: {err!r}"))
+                        continue
+                    if not itineraries:
+                        continue
+                    if not answers:
+                        grace = loop.time() + self._grace
+                        deadline = grace if deadline is None else min(deadline, grace)
+                    answers.append((member.name, itineraries))
+        finally:
+            for task in pending:
+                task.cancel()
+        return answers, errors
+
+    async def _plan(self, request: PlanRequest) -> List[Dict[str, Any]]:
+        remote = [m for m in self.members if m.name != PLANNER_LOCAL]
+        fallback = [m for m in self.members if m.name == PLANNER_LOCAL]
+
+        answers, errors = (
+            await self._race(remote, request, self._timeout) if remote else ([], [])
+        )
+        attempted = len(remote)
+        if not answers and fallback:
+            # The offline planner answers at once but knows fewer trains, it
+            # is only used when no remote provider could
+            answers, local_errors = await self._race(fallback, request)
+            errors += local_errors
+            attempted += len(fallback)
+
+        if not answers:
+            if errors and len(errors) == attempted:
+                raise PlannerError(
+                    "Every journey planner failed: "
+                    + "; ".join(str(err) for err in errors)
+                )
+            return []
+
+        best = TopK(request.count)
+        seen = set()
+        for name, itineraries in answers:
+            for itinerary in itineraries:
+                identity = _identity(itinerary)
+                if identity in seen:
+                    continue
+                seen.add(identity)
+                best.push(
+                    itinerary_score(itinerary, request.rank, request.when),
+                    dict(itinerary, provider=name),
+                )
+        itineraries = best.best()
+
+        # A member wins when one of its itineraries is kept
+        used = {itinerary["provider"] for itinerary in itineraries}
+        for member in self.members:
+            if member.name in used:
+                member.metrics.wins += 1
+        _LOGGER.debug(
+            "Raced %s, kept itineraries of %s",
+            [name for name, _ in answers],
+            sorted(used),
+        )
+        return itineraries
@@ -0,0 +1,98 @@
+"""Bounded selection of the best itineraries while they are produced"""
+
+from __future__ import annotations
+
+import datetime as dt
+import heapq
+from itertools import count as counter
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+RANK_ARRIVAL = "arrival"
+RANK_DURATION = "duration"
+RANK_CHANGES = "changes"
+RANKS = (RANK_ARRIVAL, RANK_DURATION, RANK_CHANGES)
+
+Score = Tuple[int, ...]
+
+
+def score(rank: str, arrival: int, duration: int, changes: int) -> Score:
+    """Sort key of an itinerary, lower is better
+
+    arrival is any increasing time, ties are broken on the other criteria.
+    """
+    if rank == RANK_DURATION:
+        return (duration, arrival, changes)
+    if rank == RANK_CHANGES:
+        return (changes, arrival, duration)
+    return (arrival, changes, duration)
+
+
+def _clock_minutes(clock: Optional[str]) -> Optional[int]:
+    try:
+        hours, minutes = (int(part) for part in (clock or "").split(":")[:2])
+    except ValueError:
+        return None
+    return hours * 60 + minutes
+
+
+def itinerary_score(
+    itinerary: Dict[str, Any], rank: str, when: dt.datetime
+) -> Score:
+    """Score of an itinerary already in the sensor shape
+
+    Only clock times are known, the arrival is counted from when.
+    """
+    arrival = _clock_minutes(itinerary.get("arrival_time"))
+    if arrival is not None:
+        arrival = (arrival - (when.hour * 60 + when.minute)) % (24 * 60)
+    duration = _clock_minutes(itinerary.get("duration"))
+    return score(
+        rank,
+        arrival if arrival is not None else sys.maxsize,
+        duration if duration is not None else sys.maxsize,
+        itinerary.get("changes") or 0,
+    )
+
+
+def compact_leg(leg: Dict[str, Any]) -> Dict[str, Any]:
+    """A leg without its unknown fields"""
+    return {key: value for key, value in leg.items() if value not in (None, "")}
+
+
+class TopK:
+    """The k best items pushed so far, in a heap bounded to k entries
+
+    The heap keeps the negated scores so its root is the worst item kept and
+    an item worse than every kept one is discarded without being stored.
+    """
+
+    def __init__(self, k: int) -> None:
+        self._k = k
+        self._heap: List[Tuple[Score, int, Any]] = []
+        self._order = counter()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def would_keep(self, item_score: Score) -> bool:
+        """Whether an item of that score would make it into the heap"""
+        if self._k < 1:
+            return False
+        if len(self._heap) < self._k:
+            return True
+        return tuple(-value for value in item_score) > self._heap[0][0]
+
+    def push(self, item_score: Score, item: Any) -> None:
+        """Offer an item, ties keep the item pushed first"""
+        if not self.would_keep(item_score):
+            return
+        entry = (tuple(-value for value in item_score), -next(self._order), item)
+        if len(self._heap) < self._k:
+            heapq.heappush(self._heap, entry)
+        else:
+            heapq.heapreplace(self._heap, entry)
+
+    def best(self) -> List[Any]:
+        """The kept items, best first"""
+        return [item for _, _, item in sorted(self._heap, reverse=True)]
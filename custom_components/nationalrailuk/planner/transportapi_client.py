@@ -0,0 +1,266 @@
+"""Client for the TransportAPI public journey planner"""
+
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import sys
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+import httpx
+
+from ..const import (
+    CONF_TRANSPORTAPI_APP_ID,
+    CONF_TRANSPORTAPI_APP_KEY,
+    PLANNER_TRANSPORTAPI,
+)
+from ..stations import get_registry
+from .base import (
+    PlannerError,
+    PlannerProvider,
+    PlannerState,
+    PlanRequest,
+    register_provider,
+)
+from .cache import ItineraryCache, time_bucket
+from .json_stream import JsonStreamError, iter_json_array
+from .ranking import TopK, compact_leg, score
+
+_LOGGER = logging.getLogger(__name__)
+
+BASE_URL = "https://transportapi.com/v3/uk/public/journey"
+
+
+class TransportApiError(PlannerError):
+    """The planner could not be queried"""
+
+
+def _crs(name: Optional[str]) -> Optional[str]:
+    """CRS code of a station name returned by the planner"""
+    if not name:
+        return None
+    station = get_registry().by_name(name)
+    return station.crs if station else None
+
+
+def _minutes(date: Optional[str], time_str: Optional[str]) -> Optional[int]:
+    """Minutes since the epoch of a planner date and HH:MM time"""
+    if not time_str:
+        return None
+    try:
+        hours, minutes = (int(part) for part in str(time_str).split(":")[:2])
+        days = dt.date.fromisoformat(date).toordinal() if date else 0
+    except (TypeError, ValueError):
+        return None
+    return (days * 24 + hours) * 60 + minutes
+
+
+def _duration(value: Optional[str]) -> Optional[int]:
+    """Minutes of a planner HH:MM:SS duration"""
+    if not value:
+        return None
+    try:
+        parts = [int(part) for part in str(value).split(":")]
+    except ValueError:
+        return None
+    return parts[0] * 60 + parts[1] if len(parts) > 1 else parts[0]
+
+
+def _readable(route: Dict[str, Any]) -> bool:
+    """False when a time or the duration of the route is given but malformed"""
+    for item in (route, *(route.get("route_parts") or [])):
+        for event in ("departure", "arrival"):
+            value = item.get(f"{event}_time")
+            if value and _minutes(item.get(f"{event}_date"), value) is None:
+                return False
+    duration = route.get("duration")
+    return not duration or _duration(duration) is not None
+
+
+@register_provider
+class TransportApiClient(PlannerProvider):
+    """Async TransportAPI journey planner client
+
+    Responses are parsed route by route as they stream in and only the best
+    routes are kept, so a large response is never held in memory.
+    """
+
+    name = PLANNER_TRANSPORTAPI
+    # The free plan allows a thousand calls a day
+    rate = 0.5
+    burst = 2
+
+    def __init__(
+        self,
+        app_id: str,
+        app_key: str,
+        client: httpx.AsyncClient,
+        cache: Optional[ItineraryCache] = None,
+        state: Optional[PlannerState] = None,
+    ) -> None:
+        super().__init__(cache, state)
+        self._app_id = app_id
+        self._app_key = app_key
+        self.client = client
+
+    @classmethod
+    def from_options(
+        cls,
+        options: Mapping[str, Any],
+        client: Optional[httpx.AsyncClient] = None,
+        cache: Optional[ItineraryCache] = None,
+        boards: Optional[Callable[[], List[Optional[Dict[str, Any]]]]] = None,
+        state: Optional[PlannerState] = None,
+    ) -> "TransportApiClient":
+        app_id = options.get(CONF_TRANSPORTAPI_APP_ID)
+        app_key = options.get(CONF_TRANSPORTAPI_APP_KEY)
+        if not app_id or not app_key:
+            raise TransportApiError("TransportAPI credentials are missing")
+        if client is None:
+            raise TransportApiError("TransportAPI needs an HTTP client")
+        return cls(app_id, app_key, client, cache, state)
+
+    async def _plan(self, request: PlanRequest) -> List[Dict[str, Any]]:
+        """The count best itineraries from origin to destination leaving after when
+
+        The planner has no via/avoid parameters, so routes are filtered on
+        their interchange stations, along with the number of changes and the
+        interchange time, while they are parsed. The kept itineraries are
+        ranked by rank, one of the planner.ranking RANKS.
+        """
+        return await self._fetch(
+            request.origin,
+            request.destination,
+            time_bucket(request.when),
+            request.via,
+            request.avoid,
+            request.max_changes,
+            request.min_interchange,
+            request.count,
+            request.rank,
+        )
+
+    async def _fetch(
+        self,
+        origin: str,
+        destination: str,
+        when: dt.datetime,
+        via: Optional[str],
+        avoid: Optional[str],
+        max_changes: int,
+        min_interchange: int,
+        count: int,
+        rank: str,
+    ) -> List[Dict[str, Any]]:
+        url = (
+            f"{BASE_URL}/from/crs:{origin}/to/crs:{destination}"
+            f"/at/{when:%Y-%m-%d}/{when:%H:%M}.json"
+        )
+        params = {
+            "app_id": self._app_id,
+            "app_key": self._app_key,
+            "modes": "train",
+            "service": "silverrail",
+        }
+
+        best = TopK(count)
+        parsed = 0
+        try:
+            async with self.client.stream("GET", url, params=params) as response:
+                response.raise_for_status()
+                async for route in iter_json_array(response.aiter_bytes(), "routes"):
+                    parsed += 1
+                    if not _acceptable(route, via, avoid, max_changes, min_interchange):
+                        continue
+                    route_score = _score(route, rank)
+                    if best.would_keep(route_score):
+                        best.push(route_score, _itinerary(route))
+        except (httpx.HTTPError, JsonStreamError) as err:
+            raise TransportApiError(f"Journey planner request failed: {err}") from err
+
+        _LOGGER.debug(
+            "Kept %d of %d routes from %s to %s", len(best), parsed, origin, destination
+        )
+        return best.best()
+
+    @staticmethod
+    def to_simple_itineraries(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Flatten the routes of a full planner response into itineraries"""
+        return [_itinerary(route) for route in (payload or {}).get("routes") or []]
+
+
+def _train_parts(route: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        part
+        for part in route.get("route_parts") or []
+        if part.get("mode") not in ("foot", "walk")
+    ]
+
+
+def _acceptable(
+    route: Dict[str, Any],
+    via: Optional[str],
+    avoid: Optional[str],
+    max_changes: int,
+    min_interchange: int,
+) -> bool:
+    # A route whose times cannot be read cannot be ranked
+    if not _readable(route):
+        return False
+    parts = _train_parts(route)
+    if len(parts) - 1 > max_changes:
+        return False
+
+    stations = set()
+    for part in parts:
+        stations.add(_crs(part.get("from_point_name")))
+        stations.add(_crs(part.get("to_point_name")))
+    if avoid and avoid in stations:
+        return False
+    if via and via not in stations:
+        return False
+
+    for before, after in zip(parts, parts[1:]):
+        arrival = _minutes(before.get("arrival_date"), before.get("arrival_time"))
+        departure = _minutes(after.get("departure_date"), after.get("departure_time"))
+        if arrival is not None and departure is not None:
+            if departure - arrival < min_interchange:
+                return False
+    return True
+
+
+def _score(route: Dict[str, Any], rank: str):
+    arrival = _minutes(route.get("arrival_date"), route.get("arrival_time"))
+    duration = _duration(route.get("duration"))
+    return score(
+        rank,
+        arrival if arrival is not None else sys.maxsize,
+        duration if duration is not None else sys.maxsize,
+        max(len(_train_parts(route)) - 1, 0),
+    )
+
+
+def _itinerary(route: Dict[str, Any]) -> Dict[str, Any]:
+    legs = [
+        compact_leg(
+            {
+                "mode": part.get("mode"),
+                "from": part.get("from_point_name"),
+                "from_crs": _crs(part.get("from_point_name")),
+                "to": part.get("to_point_name"),
+                "to_crs": _crs(part.get("to_point_name")),
+                "departure_time": part.get("departure_time"),
+                "arrival_time": part.get("arrival_time"),
+                "operator": part.get("line_name") or part.get("operator"),
+                "destination": part.get("destination"),
+            }
+        )
+        for part in route.get("route_parts") or []
+    ]
+    return {
+        "departure_time": route.get("departure_time"),
+        "arrival_time": route.get("arrival_time"),
+        "duration": route.get("duration"),
+        "changes": max(len(_train_parts(route)) - 1, 0),
+        "legs": legs,
+    }
@@ -0,0 +1,247 @@
+"""Streaming punctuality statistics of the departures seen on a board
+
+A train is counted once, with its last known state, when it leaves the
+departure board. The statistics of each route (board destination) and each
+timetabled train (destination and scheduled time) decay exponentially with
+a half-life, so recent days weigh most, and every train updates them in
+constant time. The delays go into a decayed histogram of one minute bins
+from which the 90th percentile is read.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .board_diff import service_key
+
+# Delays of this many minutes or more share the last histogram bin
+DELAY_BINS = 121
+# Seconds a train may drop from the board ahead of its time and still be
+# counted as departed
+DEPARTED_MARGIN = 120
+# Weights are brought back to 1 before they overflow
+_RESCALE = 1e12
+
+
+class DecayedStats:
+    """Exponentially decayed counts of the trains of a route or timetable slot
+
+    Rather than decaying every count at each update, a new train is given
+    the weight 2 ** (age of the origin / half-life), which grows with time.
+    """
+
+    __slots__ = (
+        "half_life",
+        "origin",
+        "weight",
+        "on_time",
+        "cancelled",
+        "delay_weight",
+        "delay_sum",
+        "bins",
+    )
+
+    def __init__(self, half_life: float, origin: float) -> None:
+        self.half_life = half_life
+        self.origin = origin
+        self.weight = 0.0
+        self.on_time = 0.0
+        self.cancelled = 0.0
+        self.delay_weight = 0.0
+        self.delay_sum = 0.0
+        self.bins = [0.0] * DELAY_BINS
+
+    def _scale(self, when: float) -> float:
+        return 2.0 ** ((when - self.origin) / self.half_life)
+
+    def _rescale(self, when: float) -> None:
+        factor = self._scale(when)
+        self.origin = when
+        self.weight /= factor
+        self.on_time /= factor
+        self.cancelled /= factor
+        self.delay_weight /= factor
+        self.delay_sum /= factor
+        self.bins = [count / factor for count in self.bins]
+
+    def add(
+        self, when: float, delay: Optional[float], on_time: bool, cancelled: bool
+    ) -> None:
+        """Count a train, delay in minutes or None when unknown"""
+        weight = self._scale(when)
+        if weight > _RESCALE:
+            self._rescale(when)
+            weight = 1.0
+        self.weight += weight
+        if on_time:
+            self.on_time += weight
+        if cancelled:
+            self.cancelled += weight
+        if delay is not None:
+            self.delay_weight += weight
+            self.delay_sum += weight * delay
+            self.bins[min(int(delay), DELAY_BINS - 1)] += weight
+
+    def quantile(self, q: float) -> Optional[int]:
+        """Delay in whole minutes below which a fraction q of the trains were"""
+        if not self.delay_weight:
+            return None
+        target = q * self.delay_weight
+        cumulative = 0.0
+        for minutes, count in enumerate(self.bins):
+            cumulative += count
+            if cumulative >= target:
+                return minutes
+        return DELAY_BINS - 1
+
+    def summary(self, now: float) -> Dict[str, Any]:
+        """On-time and cancellation percentages, mean and p90 delay"""
+        if not self.weight:
+            return {"observed": 0}
+        return {
+            "on_time": round(100 * self.on_time / self.weight, 1),
+            "cancellation_rate": round(100 * self.cancelled / self.weight, 1),
+            "mean_delay": (
+                round(self.delay_sum / self.delay_weight, 1)
+                if self.delay_weight
+                else None
+            ),
+            "p90_delay": self.quantile(0.9),
+            # Trains counted, as weighted by their age
+            "observed": round(self.weight / self._scale(now), 1),
+        }
+
+    def as_dict(self) -> Dict[str, Any]:
+        # The tail of empty bins is left out
+        used = max((i + 1 for i, count in enumerate(self.bins) if count), default=0)
+        return {
+            "origin": self.origin,
+            "counts": [
+                self.weight,
+                self.on_time,
+                self.cancelled,
+                self.delay_weight,
+                self.delay_sum,
+            ],
+            "bins": self.bins[:used],
+        }
+
+    @classmethod
+    def from_dict(cls, half_life: float, saved: Dict[str, Any]) -> "DecayedStats":
+        stats = cls(half_life, saved["origin"])
+        (
+            stats.weight,
+            stats.on_time,
+            stats.cancelled,
+            stats.delay_weight,
+            stats.delay_sum,
+        ) = saved["counts"]
+        bins = saved["bins"][:DELAY_BINS]
+        stats.bins[: len(bins)] = bins
+        return stats
+
+
+def final_state(train: Dict[str, Any]) -> Tuple[Optional[float], bool, bool]:
+    """Delay in minutes, on time and cancelled flags of a departed train"""
+    expected = train.get("expected")
+    cancelled = bool(train.get("isCancelled")) or expected == "Cancelled"
+    delay = None
+    scheduled = train.get("scheduled")
+    if isinstance(expected, datetime) and isinstance(scheduled, datetime):
+        delay = max((expected - scheduled).total_seconds() / 60, 0.0)
+    on_time = not cancelled and not train.get("perturbation")
+    return delay, on_time, cancelled
+
+
+class PunctualityTracker:
+    """Statistics of the routes and timetabled trains of one board"""
+
+    def __init__(self, half_life_days: float) -> None:
+        self.half_life = half_life_days * 86400
+        self.routes: Dict[str, DecayedStats] = {}
+        self.trains: Dict[Tuple[str, str], DecayedStats] = {}
+        # Bumped when the statistics change, their readers may cache by it
+        self.version = 0
+        # Departures on the last board, by destination and service
+        self._pending: Dict[Tuple[str, Any], Dict[str, Any]] = {}
+
+    def _stats(self, table: Dict, key, when: float) -> DecayedStats:
+        stats = table.get(key)
+        if stats is None:
+            stats = table[key] = DecayedStats(self.half_life, when)
+        return stats
+
+    def observe(self, data: Dict[str, Any], now: Optional[float] = None) -> int:
+        """Count the departures gone since the previous board, return how many"""
+        now = time.time() if now is None else now
+        seen = {}
+        for destination, view in (data.get("dests") or {}).items():
+            for train in (view.get("Departure") or {}).get("trains", []):
+                seen[(destination, service_key(train))] = train
+
+        counted = 0
+        for key, train in self._pending.items():
+            if key in seen:
+                continue
+            # A train dropped from the board before its time has not left,
+            # the board was cut short or the service was removed
+            due = train.get("expected")
+            if not isinstance(due, datetime):
+                due = train.get("scheduled")
+            if isinstance(due, datetime) and due.timestamp() > now + DEPARTED_MARGIN:
+                continue
+            destination = key[0]
+            delay, on_time, cancelled = final_state(train)
+            self._stats(self.routes, destination, now).add(
+                now, delay, on_time, cancelled
+            )
+            scheduled = train.get("scheduled")
+            if isinstance(scheduled, datetime):
+                slot = (destination, scheduled.strftime("%H:%M"))
+                self._stats(self.trains, slot, now).add(now, delay, on_time, cancelled)
+            counted += 1
+        self._pending = seen
+        if counted:
+            self.version += 1
+        return counted
+
+    def route(self, destination: str, now: Optional[float] = None) -> Dict[str, Any]:
+        """Statistics of the trains towards destination"""
+        stats = self.routes.get(destination)
+        now = time.time() if now is None else now
+        return stats.summary(now) if stats else {"observed": 0}
+
+    def timetable(
+        self, destination: str, now: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """Statistics of each timetabled train towards destination"""
+        now = time.time() if now is None else now
+        return [
+            {"scheduled": slot, **stats.summary(now)}
+            for (dest, slot), stats in sorted(self.trains.items())
+            if dest == destination
+        ]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "routes": {key: stats.as_dict() for key, stats in self.routes.items()},
+            "trains": [
+                [dest, slot, stats.as_dict()]
+                for (dest, slot), stats in self.trains.items()
+            ],
+        }
+
+    def restore(self, saved: Dict[str, Any]) -> None:
+        """Load the statistics of as_dict"""
+        self.routes = {
+            key: DecayedStats.from_dict(self.half_life, stats)
+            for key, stats in saved.get("routes", {}).items()
+        }
+        self.trains = {
+            (dest, slot): DecayedStats.from_dict(self.half_life, stats)
+            for dest, slot, stats in saved.get("trains", [])
+        }
+        self.version += 1
+
@@ -0,0 +1,195 @@
+"""Darwin Push Port feed shared by the boards of every entry"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+from xml.etree import ElementTree
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+
+from .const import (
+    CONF_PUSH_HOST,
+    CONF_PUSH_PASSWORD,
+    CONF_PUSH_PORT,
+    CONF_PUSH_TOPIC,
+    CONF_PUSH_USERNAME,
+    DEFAULT_PUSH_PORT,
+    DEFAULT_PUSH_TOPIC,
+    DOMAIN,
+    PUSH_FEEDS,
+)
+from .darwin import PushBoards, parse_message
+from .stomp import StompClient, StompError
+
+_LOGGER = logging.getLogger(__name__)
+
+# Seconds between reconnections, doubled after each failure up to the max
+RECONNECT_DELAY = 5
+RECONNECT_MAX_DELAY = 300
+
+
+class PushFeed:
+    """A STOMP subscription materialising the boards of its messages
+
+    Listeners are registered per station and called whenever a message
+    changes a row of its boards.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        host: str,
+        port: int,
+        topic: str,
+        login: Optional[str] = None,
+        passcode: Optional[str] = None,
+    ) -> None:
+        self.hass = hass
+        self.boards = PushBoards()
+        self.connected = False
+        self._host = host
+        self._port = port
+        self._topic = topic
+        self._login = login
+        self._passcode = passcode
+        self._listeners: Dict[str, List[Callable[[], None]]] = {}
+        self._task: Optional[asyncio.Task] = None
+        # Entries using the feed, it stops when the last one is unloaded
+        self.users = 0
+        self.unsub_stop: Optional[CALLBACK_TYPE] = None
+
+    @callback
+    def async_add_listener(
+        self, station: str, update: Callable[[], None]
+    ) -> CALLBACK_TYPE:
+        """Call update when a board row of station changes, return the remover"""
+        self._listeners.setdefault(station, []).append(update)
+
+        @callback
+        def remove() -> None:
+            self._listeners[station].remove(update)
+
+        return remove
+
+    @callback
+    def async_start(self) -> None:
+        """Start consuming the feed in the background"""
+        if self._task is None:
+            self._task = self.hass.async_create_background_task(
+                self._run(), f"{DOMAIN} push feed {self._host}"
+            )
+
+    async def async_stop(self) -> None:
+        """Stop consuming the feed"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        delay = RECONNECT_DELAY
+        while True:
+            client = StompClient(self._host, self._port, self._login, self._passcode)
+            try:
+                await client.connect()
+                await client.subscribe(self._topic)
+                self.connected = True
+                delay = RECONNECT_DELAY
+                _LOGGER.info("Subscribed to %s on %s", self._topic, self._host)
+                async for frame in client.messages():
+                    self._handle(frame.body)
+            except (
+                OSError,
+                EOFError,
+                ValueError,
+                asyncio.TimeoutError,
+                asyncio.IncompleteReadError,
+                asyncio.LimitOverrunError,
+                StompError,
+            ) as err:
+                _LOGGER.warning(
+                    "Push feed %s failed, reconnecting in %ss: %s",
+                    self._host,
+                    delay,
+                    err,
+                )
+            finally:
+                self.connected = False
+                await client.close()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    def _handle(self, body: bytes) -> None:
+        try:
+            message = parse_message(body)
+        except (ElementTree.ParseError, OSError, EOFError) as err:
+            _LOGGER.debug("Ignoring an unreadable push message: %s", err)
+            return
+        try:
+            changes = self.boards.apply(message)
+        except Exception as err:  # pylint: disable=broad-except
+            # One malformed message must not drop the subscription
+            _LOGGER.warning("Skipping a push message that failed to apply: %r", err)
+            return
+        for station in {change.station for change in changes}:
+            for update in self._listeners.get(station, ()):
+                update()
+
+
+def _feed_key(options) -> Tuple[str, int, str]:
+    return (
+        options[CONF_PUSH_HOST],
+        int(options.get(CONF_PUSH_PORT) or DEFAULT_PUSH_PORT),
+        options.get(CONF_PUSH_TOPIC) or DEFAULT_PUSH_TOPIC,
+    )
+
+
+@callback
+def async_get_push_feed(hass: HomeAssistant, options) -> Optional[PushFeed]:
+    """The running feed of the entry options, None when they set no broker
+
+    Entries using the same broker and topic share one subscription.
+    """
+    if not options.get(CONF_PUSH_HOST):
+        return None
+
+    feeds: Dict[Tuple, PushFeed] = hass.data.setdefault(DOMAIN, {}).setdefault(
+        PUSH_FEEDS, {}
+    )
+    key = _feed_key(options)
+    feed = feeds.get(key)
+    if feed is None:
+        feed = feeds[key] = PushFeed(
+            hass,
+            *key,
+            login=options.get(CONF_PUSH_USERNAME),
+            passcode=options.get(CONF_PUSH_PASSWORD),
+        )
+        feed.async_start()
+
+        async def _stop(_event: Event) -> None:
+            feed.unsub_stop = None
+            await feed.async_stop()
+
+        feed.unsub_stop = hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _stop)
+    feed.users += 1
+    return feed
+
+
+async def async_release_push_feed(hass: HomeAssistant, options) -> None:
+    """Release the feed of an unloaded entry, stopping it with its last user"""
+    feeds: Dict[Tuple, PushFeed] = hass.data.get(DOMAIN, {}).get(PUSH_FEEDS, {})
+    key = _feed_key(options)
+    feed = feeds.get(key)
+    if feed is None:
+        return
+    feed.users -= 1
+    if feed.users > 0:
+        return
+    del feeds[key]
+    if feed.unsub_stop is not None:
+        feed.unsub_stop()
+        feed.unsub_stop = None
+    await feed.async_stop()
@@ -1,17 +1,39 @@
 from __future__ import annotations
 
+from datetime import datetime
+import json
 from typing import Any, Dict, Optional
 
-from homeassistant.components.sensor import SensorEntity
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorStateClass,
+)
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.const import PERCENTAGE
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
+from .board_coordinator import BoardCoordinator
+from .boards import (
+    board_trains,
+    compact_summary,
+    departure_key,
+    epoch,
+    iter_merged_trains,
+    top_departures,
+)
 from .const import (
+    ATTRIBUTE_MODE_COMPACT,
+    ATTRIBUTE_MODE_FULL,
+    BOARD_COORDINATORS,
+    CONF_ATTRIBUTE_MODE,
     CONF_DESTINATIONS,
     CONF_STATION,
+    CONF_SUMMARY_TRAINS,
     CONF_VIA,
+    DEFAULT_SUMMARY_TRAINS,
     DOMAIN,
 )
 from .journey_coordinator import JourneyPlannerCoordinator
@@ -20,22 +42,291 @@ from .journey_coordinator import JourneyPlannerCoordinator
 async def async_setup_entry(
     hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
 ) -> None:
-    """Set up journey planner sensors from a config entry."""
-    coordinator: JourneyPlannerCoordinator = hass.data[DOMAIN][entry.entry_id]
-
+    """Set up board and journey planner sensors from a config entry."""
     origin = entry.data.get(CONF_STATION, "?")
     dests = entry.data.get(CONF_DESTINATIONS, []) or []
     dest = dests[0] if dests else "?"
     via = entry.data.get(CONF_VIA)
 
-    entities: list[SensorEntity] = [
-        NextJourneySensor(coordinator, origin, dest, via, entry.entry_id),
-        ItinerariesSensor(coordinator, origin, dest, via, entry.entry_id),
-    ]
+    entities: list[SensorEntity] = []
+
+    board: BoardCoordinator | None = (
+        hass.data[DOMAIN].get(BOARD_COORDINATORS, {}).get(entry.entry_id)
+    )
+    if board is not None:
+        mode = entry.data.get(CONF_ATTRIBUTE_MODE, ATTRIBUTE_MODE_COMPACT)
+        count = int(entry.data.get(CONF_SUMMARY_TRAINS, DEFAULT_SUMMARY_TRAINS))
+        entities.extend(
+            BoardSensor(board, origin, each, entry.entry_id, mode, count)
+            for each in dests
+        )
+        if len(dests) > 1:
+            entities.append(NextDepartureSensor(board, origin, entry.entry_id, count))
+        entities.extend(
+            PunctualitySensor(board, origin, each, entry.entry_id) for each in dests
+        )
+
+    coordinator: JourneyPlannerCoordinator | None = hass.data[DOMAIN].get(
+        entry.entry_id
+    )
+    if coordinator is not None:
+        entities.extend(
+            [
+                NextJourneySensor(coordinator, origin, dest, via, entry.entry_id),
+                ItinerariesSensor(coordinator, origin, dest, via, entry.entry_id),
+            ]
+        )
     async_add_entities(entities)
 
 
-class _BaseJourneySensor(CoordinatorEntity[JourneyPlannerCoordinator], SensorEntity):
+def board_device_info(entry_id: str, station: str) -> Dict[str, Any]:
+    """Device of the board sensors of an entry
+
+    The journey sensors of the same entry own the device identified by the
+    entry id alone, so the board gets an identifier of its own.
+    """
+    return {
+        "identifiers": {(DOMAIN, f"{entry_id}_board")},
+        "name": f"National Rail ({station})",
+        "manufacturer": "National Rail",
+        "model": "Station board",
+    }
+
+
+class _MemoizedStateMixin:
+    """Compute state and attributes once per coordinator update.
+
+    Subclasses implement `_compute_value` and `_compute_attributes`. The result
+    is hashed and the state is only written when it differs from the last
+    written one, so quiet refreshes cost no recorder or websocket traffic.
+    Attributes listed in `_memo_volatile` do not trigger a write on their own.
+    While the coordinator serves stale data, restored at startup or kept
+    after failed refreshes, its age and offline state are added. The age
+    grows on every update, it is written along with the other changes only.
+    """
+
+    # Freshness attributes changing on every update of stale data
+    _FRESHNESS_VOLATILE = ("age",)
+
+    _memo_value: Any = None
+    _memo_attributes: Dict[str, Any] = {}
+    _memo_hash: int | None = None
+    _memo_volatile: tuple[str, ...] = ()
+
+    def _compute_value(self) -> Any:
+        raise NotImplementedError
+
+    def _compute_attributes(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def _refresh_memo(self) -> bool:
+        """Recompute the memoised state, return True if it changed"""
+        value = self._compute_value()
+        attributes = self._compute_attributes()
+        attributes.update(self.coordinator.freshness.attributes())
+        stable = {
+            key: item
+            for key, item in attributes.items()
+            if key not in self._memo_volatile and key not in self._FRESHNESS_VOLATILE
+        }
+        digest = hash(
+            json.dumps([self.available, value, stable], sort_keys=True, default=str)
+        )
+        self._memo_value = value
+        self._memo_attributes = attributes
+        if digest == self._memo_hash:
+            return False
+        self._memo_hash = digest
+        return True
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self._refresh_memo()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        if self._refresh_memo():
+            self.async_write_ha_state()
+
+    @property
+    def native_value(self) -> Any:
+        return self._memo_value
+
+    @property
+    def extra_state_attributes(self) -> Dict[str, Any]:
+        return self._memo_attributes
+
+
+class BoardSensor(
+    _MemoizedStateMixin, CoordinatorEntity[BoardCoordinator], SensorEntity
+):
+    """Next departures from the station towards one destination."""
+
+    _attr_icon = "mdi:train"
+    _attr_device_class = SensorDeviceClass.TIMESTAMP
+
+    def __init__(
+        self,
+        coordinator: BoardCoordinator,
+        station: str,
+        dest: str,
+        entry_id: str,
+        mode: str,
+        count: int,
+    ) -> None:
+        super().__init__(coordinator)
+        self._station = station
+        self._dest = dest
+        self._entry_id = entry_id
+        self._mode = mode
+        self._count = count
+
+    @property
+    def name(self) -> str:
+        return f"Train schedule {self._station} → {self._dest}"
+
+    @property
+    def unique_id(self) -> str:
+        return f"{self._entry_id}_board_{self._station}_{self._dest}"
+
+    @property
+    def device_info(self) -> Dict[str, Any]:
+        return board_device_info(self._entry_id, self._station)
+
+    def _trains(self) -> list[Dict[str, Any]]:
+        return board_trains(self.coordinator.data, self._dest)
+
+    def _compute_value(self):
+        trains = self._trains()
+        if not trains:
+            return None
+        first = trains[0]
+        if isinstance(first["expected"], datetime):
+            return first["expected"]
+        return first["scheduled"]
+
+    def _compute_attributes(self) -> Dict[str, Any]:
+        data = self.coordinator.data or {}
+        dest = data.get("dests", {}).get(self._dest) or {}
+        trains = self._trains()
+        first = trains[0] if trains else {}
+        attributes = {
+            "station": data.get("station"),
+            "destination": dest.get("displayName", self._dest),
+            "messages": dest.get("messages"),
+            "service_id": first.get("serviceID"),
+            "platform": first.get("platform"),
+            "expected": epoch(first.get("expected")),
+            "perturbations": any(train["perturbation"] for train in trains),
+        }
+        if self._mode == ATTRIBUTE_MODE_FULL:
+            attributes["trains"] = trains
+        else:
+            attributes["trains"] = compact_summary(trains, self._count)
+        return attributes
+
+
+class NextDepartureSensor(
+    _MemoizedStateMixin, CoordinatorEntity[BoardCoordinator], SensorEntity
+):
+    """Next departures from the station to any of the destinations."""
+
+    _attr_icon = "mdi:train"
+    _attr_device_class = SensorDeviceClass.TIMESTAMP
+
+    def __init__(
+        self, coordinator: BoardCoordinator, station: str, entry_id: str, count: int
+    ) -> None:
+        super().__init__(coordinator)
+        self._station = station
+        self._entry_id = entry_id
+        self._count = count
+
+    @property
+    def name(self) -> str:
+        return f"Next departure {self._station}"
+
+    @property
+    def unique_id(self) -> str:
+        return f"{self._entry_id}_next_departure_{self._station}"
+
+    @property
+    def device_info(self) -> Dict[str, Any]:
+        return board_device_info(self._entry_id, self._station)
+
+    def _compute_value(self):
+        first = next(iter_merged_trains(self.coordinator.data), None)
+        return departure_key(first["train"]) if first else None
+
+    def _compute_attributes(self) -> Dict[str, Any]:
+        data = self.coordinator.data or {}
+        return {
+            "station": data.get("station"),
+            "trains": top_departures(data, self._count),
+        }
+
+
+class PunctualitySensor(
+    _MemoizedStateMixin, CoordinatorEntity[BoardCoordinator], SensorEntity
+):
+    """Share of the departures towards one destination that left on time."""
+
+    _attr_icon = "mdi:clock-check-outline"
+    _attr_native_unit_of_measurement = PERCENTAGE
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    # The statistics of every timetabled train are too bulky for the recorder
+    _unrecorded_attributes = frozenset({"trains"})
+
+    def __init__(
+        self, coordinator: BoardCoordinator, station: str, dest: str, entry_id: str
+    ) -> None:
+        super().__init__(coordinator)
+        self._station = station
+        self._dest = dest
+        self._entry_id = entry_id
+        self._version: int | None = None
+        self._summary: Dict[str, Any] = {}
+
+    @property
+    def name(self) -> str:
+        return f"Punctuality {self._station} → {self._dest}"
+
+    @property
+    def unique_id(self) -> str:
+        return f"{self._entry_id}_punctuality_{self._station}_{self._dest}"
+
+    @property
+    def device_info(self) -> Dict[str, Any]:
+        return board_device_info(self._entry_id, self._station)
+
+    def _route_summary(self) -> Dict[str, Any]:
+        """Statistics of the route, recomputed only when a train was counted"""
+        punctuality = self.coordinator.punctuality
+        if punctuality.version != self._version:
+            self._version = punctuality.version
+            self._summary = {
+                **punctuality.route(self._dest),
+                "trains": punctuality.timetable(self._dest),
+            }
+        return self._summary
+
+    def _compute_value(self) -> float | None:
+        return self._route_summary().get("on_time")
+
+    def _compute_attributes(self) -> Dict[str, Any]:
+        return {
+            key: value
+            for key, value in self._route_summary().items()
+            if key != "on_time"
+        }
+
+
+class _BaseJourneySensor(
+    _MemoizedStateMixin, CoordinatorEntity[JourneyPlannerCoordinator], SensorEntity
+):
+    # The planning time moves on every refresh
+    _memo_volatile = ("when",)
+
     def __init__(
         self,
         coordinator: JourneyPlannerCoordinator,
@@ -74,8 +365,7 @@ class NextJourneySensor(_BaseJourneySensor):
         via = self._via or ""
         return f"{self._entry_id}_next_{self._origin}_{self._dest}_{via}"
 
-    @property
-    def native_value(self) -> str | None:
+    def _compute_value(self) -> str | None:
         data = self.coordinator.data or {}
         itins = data.get("itineraries") or []
         if not itins:
@@ -87,8 +377,7 @@ class NextJourneySensor(_BaseJourneySensor):
             return f"{dep} → {arr}"
         return dep or arr
 
-    @property
-    def extra_state_attributes(self) -> Dict[str, Any]:
+    def _compute_attributes(self) -> Dict[str, Any]:
         data = self.coordinator.data or {}
         itins = data.get("itineraries") or []
         if not itins:
@@ -123,13 +412,11 @@ class ItinerariesSensor(_BaseJourneySensor):
         via = self._via or ""
         return f"{self._entry_id}_itins_{self._origin}_{self._dest}_{via}"
 
-    @property
-    def native_value(self) -> int | None:
+    def _compute_value(self) -> int | None:
         itins = (self.coordinator.data or {}).get("itineraries") or []
         return len(itins) if itins is not None else None
 
-    @property
-    def extra_state_attributes(self) -> Dict[str, Any]:
+    def _compute_attributes(self) -> Dict[str, Any]:
         data = self.coordinator.data or {}
         return {
             "origin": self._origin,
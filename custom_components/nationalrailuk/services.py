@@ -0,0 +1,80 @@
+"""Services of the National Rail UK integration"""
+
+from __future__ import annotations
+
+import voluptuous as vol
+
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+)
+from homeassistant.exceptions import HomeAssistantError
+
+from .boards import (
+    find_board,
+    find_train,
+    serialise_calling_points,
+    top_departures,
+)
+from .const import (
+    ATTR_COUNT,
+    ATTR_SERVICE_ID,
+    ATTR_STATION,
+    DEFAULT_SUMMARY_TRAINS,
+    DOMAIN,
+    SERVICE_GET_CALLING_POINTS,
+    SERVICE_GET_NEXT_DEPARTURES,
+)
+
+GET_CALLING_POINTS_SCHEMA = vol.Schema({vol.Required(ATTR_SERVICE_ID): str})
+GET_NEXT_DEPARTURES_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_STATION): vol.All(str, vol.Upper),
+        vol.Optional(ATTR_COUNT, default=DEFAULT_SUMMARY_TRAINS): vol.All(
+            int, vol.Range(min=1)
+        ),
+    }
+)
+
+
+async def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the integration services once"""
+    if hass.services.has_service(DOMAIN, SERVICE_GET_CALLING_POINTS):
+        return
+
+    async def get_calling_points(call: ServiceCall) -> ServiceResponse:
+        service_id = call.data[ATTR_SERVICE_ID]
+        train = find_train(hass, service_id)
+        if train is None:
+            raise HomeAssistantError(f"Unknown service {service_id}")
+        return {
+            ATTR_SERVICE_ID: service_id,
+            "calling_points": serialise_calling_points(train),
+        }
+
+    async def get_next_departures(call: ServiceCall) -> ServiceResponse:
+        station = call.data[ATTR_STATION]
+        board = find_board(hass, station)
+        if board is None:
+            raise HomeAssistantError(f"Station {station} is not monitored")
+        return {
+            ATTR_STATION: station,
+            "departures": top_departures(board.data, call.data[ATTR_COUNT]),
+        }
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_NEXT_DEPARTURES,
+        get_next_departures,
+        schema=GET_NEXT_DEPARTURES_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_CALLING_POINTS,
+        get_calling_points,
+        schema=GET_CALLING_POINTS_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
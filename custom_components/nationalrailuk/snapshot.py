@@ -0,0 +1,120 @@
+"""Snapshots of the last data of the coordinators, restored at startup
+
+The data is written with the Home Assistant storage helper, which writes
+atomically and flushes the pending writes when Home Assistant stops. Times
+are stored as epoch seconds with their UTC offset rather than ISO strings.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import logging
+from typing import Any, Dict
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN, SNAPSHOT_MAX_AGE, SNAPSHOT_SAVE_DELAY, SNAPSHOT_VERSION
+from .freshness import StaleWhileRevalidateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+# Coordinators keeping a snapshot, part of the storage key
+SNAPSHOT_BOARD = "board"
+SNAPSHOT_JOURNEY = "journey"
+SNAPSHOT_PUNCTUALITY = "punctuality"
+SNAPSHOT_KINDS = (SNAPSHOT_BOARD, SNAPSHOT_JOURNEY, SNAPSHOT_PUNCTUALITY)
+
+_TIME = "@t"
+
+
+def encode(value: Any) -> Any:
+    """The JSON form of coordinator data"""
+    if isinstance(value, dt.datetime):
+        offset = value.utcoffset()
+        minutes = int(offset.total_seconds() // 60) if offset is not None else None
+        return {_TIME: [int(value.timestamp()), minutes]}
+    if isinstance(value, dict):
+        return {key: encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode(item) for item in value]
+    return value
+
+
+def decode(value: Any) -> Any:
+    """Coordinator data from its JSON form"""
+    if isinstance(value, dict):
+        if len(value) == 1 and _TIME in value:
+            epoch, minutes = value[_TIME]
+            if minutes is None:
+                return dt.datetime.fromtimestamp(epoch)
+            zone = dt.timezone(dt.timedelta(minutes=minutes))
+            return dt.datetime.fromtimestamp(epoch, zone)
+        return {key: decode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode(item) for item in value]
+    return value
+
+
+def snapshot_store(hass: HomeAssistant, kind: str, entry_id: str) -> Store:
+    return Store(hass, SNAPSHOT_VERSION, f"{DOMAIN}.{kind}_{entry_id}")
+
+
+class CoordinatorSnapshot:
+    """The saved data of one coordinator
+
+    Every successful refresh is saved, a burst of refreshes being written
+    once. Stale data, restored or served after a failure, is not saved again.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        coordinator: StaleWhileRevalidateCoordinator,
+        kind: str,
+    ) -> None:
+        self._coordinator = coordinator
+        self._store = snapshot_store(hass, kind, coordinator.entry.entry_id)
+        coordinator.entry.async_on_unload(coordinator.async_add_listener(self._updated))
+
+    async def async_restore(self) -> bool:
+        """Set the coordinator data from the snapshot, False if none is fresh"""
+        try:
+            saved = await self._store.async_load()
+        except (OSError, ValueError) as err:
+            _LOGGER.warning("Ignoring an unreadable snapshot: %s", err)
+            return False
+        if not saved or self._coordinator.data is not None:
+            return False
+
+        saved_at = dt.datetime.fromtimestamp(saved["saved_at"], dt.timezone.utc)
+        age = dt.datetime.now(dt.timezone.utc) - saved_at
+        if age > dt.timedelta(minutes=SNAPSHOT_MAX_AGE):
+            _LOGGER.debug("Not restoring a snapshot %s old", age)
+            return False
+
+        self._coordinator.data = decode(saved["data"])
+        self._coordinator.freshness.restored(saved_at)
+        return True
+
+    @callback
+    def _updated(self) -> None:
+        coordinator = self._coordinator
+        if not coordinator.last_update_success or coordinator.data is None:
+            return
+        if coordinator.freshness.stale:
+            return
+        self._store.async_delay_save(self._payload, SNAPSHOT_SAVE_DELAY)
+
+    @callback
+    def _payload(self) -> Dict[str, Any]:
+        return {
+            "saved_at": int(self._coordinator.freshness.fetched_at.timestamp()),
+            "data": encode(self._coordinator.data),
+        }
+
+
+async def async_remove_snapshots(hass: HomeAssistant, entry_id: str) -> None:
+    """Delete the snapshots of a removed entry"""
+    for kind in SNAPSHOT_KINDS:
+        await snapshot_store(hass, kind, entry_id).async_remove()
@@ -0,0 +1,143 @@
+"""Memory-mapped binary station dataset
+
+The file starts with a header followed by fixed size records sorted by CRS
+code, then a blob of UTF-8 strings the records point into:
+
+    header  <4sHI>      magic, version, number of records
+    record  <3sBffIHIH> crs, flags, latitude, longitude,
+                        name offset, name length,
+                        tiploc offset, tiploc length
+
+Coordinates are only meaningful when the HAS_COORDINATES flag is set, and the
+TIPLOC codes of a station are stored space separated. The file is opened
+read-only with mmap so every process shares it through the page cache and
+nothing is decoded until a record is read.
+
+This module has no Home Assistant dependency so the build script can use it.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+from typing import Iterable, Iterator, NamedTuple, Optional, Tuple
+
+DATASET_FILE = os.path.join(os.path.dirname(__file__), "stations.bin")
+
+MAGIC = b"NRST"
+VERSION = 1
+
+HEADER = struct.Struct("<4sHI")
+RECORD = struct.Struct("<3sBffIHIH")
+
+HAS_COORDINATES = 0x01
+
+
+class StationRecord(NamedTuple):
+    """A station of the dataset"""
+
+    crs: str
+    name: str
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    tiplocs: Tuple[str, ...] = ()
+
+
+class StationDataset:
+    """Read-only accessor over a memory-mapped station file"""
+
+    def __init__(self, path: str = DATASET_FILE) -> None:
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} station dataset")
+        self._count = count
+        self._strings = HEADER.size + count * RECORD.size
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[StationRecord]:
+        for index in range(self._count):
+            yield self.record(index)
+
+    def _crs_at(self, index: int) -> bytes:
+        offset = HEADER.size + index * RECORD.size
+        return self._map[offset : offset + 3]
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._strings + offset
+        return self._map[start : start + length].decode("utf-8")
+
+    def record(self, index: int) -> StationRecord:
+        """Decode the record at index"""
+        crs, flags, lat, lon, name_off, name_len, tip_off, tip_len = (
+            RECORD.unpack_from(self._map, HEADER.size + index * RECORD.size)
+        )
+        has_coordinates = flags & HAS_COORDINATES
+        tiplocs = self._string(tip_off, tip_len)
+        return StationRecord(
+            crs.decode("ascii"),
+            self._string(name_off, name_len),
+            lat if has_coordinates else None,
+            lon if has_coordinates else None,
+            tuple(tiplocs.split()) if tiplocs else (),
+        )
+
+    def find(self, crs: str) -> Optional[StationRecord]:
+        """Binary search a station by CRS code, without decoding the others"""
+        key = crs.strip().upper().encode("ascii", "replace")
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._crs_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._count and self._crs_at(low) == key:
+            return self.record(low)
+        return None
+
+    def close(self) -> None:
+        """Release the mapping"""
+        self._map.close()
+
+
+def write_dataset(path: str, stations: Iterable[StationRecord]) -> int:
+    """Write stations to path in the dataset format, return the record count"""
+    records = []
+    strings = bytearray()
+
+    def add_string(value: str) -> Tuple[int, int]:
+        data = value.encode("utf-8")
+        offset = len(strings)
+        strings.extend(data)
+        return offset, len(data)
+
+    for station in sorted(stations, key=lambda station: station.crs):
+        crs = station.crs.upper().encode("ascii")
+        if len(crs) != 3:
+            raise ValueError(f"Invalid CRS code {station.crs!r}")
+        has_coordinates = (
+            station.latitude is not None and station.longitude is not None
+        )
+        records.append(
+            RECORD.pack(
+                crs,
+                HAS_COORDINATES if has_coordinates else 0,
+                station.latitude if has_coordinates else 0.0,
+                station.longitude if has_coordinates else 0.0,
+                *add_string(station.name),
+                *add_string(" ".join(station.tiplocs)),
+            )
+        )
+
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(records)))
+        file.writelines(records)
+        file.write(strings)
+
+    return len(records)
@@ -0,0 +1,150 @@
+"""Nearest station lookups over the station coordinates"""
+
+from __future__ import annotations
+
+import heapq
+import math
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from .stations import Station, get_dataset
+
+EARTH_RADIUS_KM = 6371.0
+
+Point = Tuple[float, float, float]
+
+
+class NearbyStation(NamedTuple):
+    """A station and its distance from the searched location"""
+
+    station: Station
+    distance_km: float
+
+
+def _to_point(latitude: float, longitude: float) -> Point:
+    """Unit vector of a location, the chord length grows with the distance"""
+    lat = math.radians(latitude)
+    lon = math.radians(longitude)
+    return (
+        math.cos(lat) * math.cos(lon),
+        math.cos(lat) * math.sin(lon),
+        math.sin(lat),
+    )
+
+
+def _chord_to_km(chord: float) -> float:
+    return 2 * EARTH_RADIUS_KM * math.asin(min(chord / 2, 1.0))
+
+
+class StationGeoIndex:
+    """k-d tree over the stations with known coordinates
+
+    Locations are projected on the unit sphere so the euclidean distance in
+    the tree orders stations like the great-circle distance does.
+    """
+
+    def __init__(self, stations: Sequence[Station]) -> None:
+        located = [
+            station
+            for station in stations
+            if station.latitude is not None and station.longitude is not None
+        ]
+        self._stations = located
+        self._points = [_to_point(s.latitude, s.longitude) for s in located]
+
+        # Implicit tree: node i holds a station index, its split axis and the
+        # indexes of its children, or -1
+        self._node_station: List[int] = []
+        self._node_axis: List[int] = []
+        self._left: List[int] = []
+        self._right: List[int] = []
+        self._root = self._build(list(range(len(located))), 0)
+
+    def __len__(self) -> int:
+        return len(self._stations)
+
+    def _build(self, indexes: List[int], depth: int) -> int:
+        if not indexes:
+            return -1
+        axis = depth % 3
+        indexes.sort(key=lambda index: self._points[index][axis])
+        middle = len(indexes) // 2
+
+        node = len(self._node_station)
+        self._node_station.append(indexes[middle])
+        self._node_axis.append(axis)
+        self._left.append(-1)
+        self._right.append(-1)
+
+        self._left[node] = self._build(indexes[:middle], depth + 1)
+        self._right[node] = self._build(indexes[middle + 1 :], depth + 1)
+        return node
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        count: int = 1,
+        max_distance_km: Optional[float] = None,
+    ) -> List[NearbyStation]:
+        """The `count` stations closest to a location, closest first"""
+        if self._root < 0 or count < 1:
+            return []
+
+        target = _to_point(latitude, longitude)
+        tx, ty, tz = target
+        # Max-heap of (-squared distance, station index) of the best so far
+        best: List[Tuple[float, int]] = []
+        limit = math.inf
+        if max_distance_km is not None:
+            angle = min(max_distance_km / EARTH_RADIUS_KM, math.pi)
+            chord = 2 * math.sin(angle / 2)
+            limit = chord * chord
+
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node < 0:
+                continue
+            index = self._node_station[node]
+            point = self._points[index]
+            dx = point[0] - tx
+            dy = point[1] - ty
+            dz = point[2] - tz
+            distance = dx * dx + dy * dy + dz * dz
+
+            bound = -best[0][0] if len(best) == count else limit
+            if distance <= bound and distance <= limit:
+                if len(best) == count:
+                    heapq.heapreplace(best, (-distance, index))
+                else:
+                    heapq.heappush(best, (-distance, index))
+
+            axis = self._node_axis[node]
+            delta = target[axis] - point[axis]
+            near, far = (
+                (self._left[node], self._right[node])
+                if delta < 0
+                else (self._right[node], self._left[node])
+            )
+            bound = -best[0][0] if len(best) == count else limit
+            # Visit the far side only if the splitting plane is within reach,
+            # the near side is pushed last to be explored first
+            if delta * delta <= bound:
+                stack.append(far)
+            stack.append(near)
+
+        return [
+            NearbyStation(self._stations[index], _chord_to_km(math.sqrt(-distance)))
+            for distance, index in sorted(best, reverse=True)
+        ]
+
+
+_INDEX: Optional[StationGeoIndex] = None
+
+
+def get_geo_index() -> StationGeoIndex:
+    """The spatial index of the station dataset, built on first use"""
+    global _INDEX  # pylint: disable=global-statement
+    if _INDEX is None:
+        _INDEX = StationGeoIndex(list(get_dataset()))
+    return _INDEX
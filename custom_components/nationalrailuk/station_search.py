@@ -0,0 +1,220 @@
+"""Ranked fuzzy search over the station registry"""
+
+from __future__ import annotations
+
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Set
+
+from .stations import Station, StationRegistry, get_registry, normalise
+
+# Abbreviations commonly typed for words of station names
+ABBREVIATIONS = {
+    "st": "saint",
+    "x": "cross",
+    "intl": "international",
+    "int": "international",
+    "rd": "road",
+    "jn": "junction",
+    "jct": "junction",
+    "pk": "park",
+    "pkwy": "parkway",
+    "pwy": "parkway",
+    "ctrl": "central",
+    "cen": "central",
+    "stn": "station",
+    "bham": "birmingham",
+}
+
+# Popular names that do not match the official station names
+ALIASES = {
+    "kings x": "KGX",
+    "kx": "KGX",
+    "st pancras": "STP",
+    "new street": "BHM",
+    "brum": "BHM",
+    "lime street": "LIV",
+    "piccadilly": "MAN",
+    "heathrow": "HXX",
+    "gatwick": "GTW",
+    "clapham": "CLJ",
+    "clapham jn": "CLJ",
+    "waverley": "EDB",
+}
+
+# The busiest stations by passenger entries and exits, ranked above the
+# smaller stations sharing a word of their name ("waterloo")
+MAJOR_STATIONS = frozenset(
+    "BHM BRI BTN CBG CDF CHX CLJ CST ECR EDB EUS FST GLC GLQ GTW HHY KGX LBG "
+    "LDS LIV LST MAN MYB NCL NOT PAD RDG SHF SOU SRA STP VIC WAT YRK".split()
+)
+
+# Scores of the different kinds of match, the trigram similarity scales
+# the fuzzy score
+SCORE_CODE = 100.0
+SCORE_ALIAS = 95.0
+SCORE_NAME = 90.0
+SCORE_PREFIX = 70.0
+SCORE_FUZZY = 60.0
+# Added to the prefix score of a major station
+SCORE_MAJOR = 6.0
+
+# Minimum trigram similarity for a fuzzy match
+FUZZY_THRESHOLD = 0.35
+
+
+class SearchResult(NamedTuple):
+    """A station matching a search query"""
+
+    crs: str
+    name: str
+    score: float
+
+
+class _TrieNode:
+    __slots__ = ("children", "stations")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, _TrieNode] = {}
+        self.stations: Set[int] = set()
+
+
+def _expand(token: str) -> str:
+    return ABBREVIATIONS.get(token, token)
+
+
+def _canonical(name: str) -> str:
+    """Normalised name with the abbreviations expanded"""
+    return " ".join(_expand(token) for token in normalise(name).split())
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class StationSearch:
+    """Prefix trie over the words of the station names plus a trigram index
+
+    Queries are ranked by kind of match: CRS code, alias, exact name, every
+    word a prefix of a word of the name, then trigram similarity for typos.
+    Among the prefix matches the major stations come first.
+    """
+
+    def __init__(self, registry: StationRegistry) -> None:
+        self._registry = registry
+        self._stations: List[Station] = list(registry)
+        self._names: List[str] = []
+        self._root = _TrieNode()
+        self._trigrams: Dict[str, List[int]] = {}
+        self._trigram_counts: List[int] = []
+        self._aliases = {_canonical(alias): crs for alias, crs in ALIASES.items()}
+
+        for index, station in enumerate(self._stations):
+            name = _canonical(station.name)
+            self._names.append(name)
+
+            for token in set(name.split()):
+                node = self._root
+                for char in token:
+                    node = node.children.setdefault(char, _TrieNode())
+                    node.stations.add(index)
+
+            grams = _trigrams(name)
+            self._trigram_counts.append(len(grams))
+            for gram in grams:
+                self._trigrams.setdefault(gram, []).append(index)
+
+    def _prefixed(self, token: str) -> Set[int]:
+        """Stations with a word starting with token"""
+        node = self._root
+        for char in token:
+            node = node.children.get(char)
+            if node is None:
+                return set()
+        return node.stations
+
+    def _result(self, index: int, score: float) -> SearchResult:
+        station = self._stations[index]
+        return SearchResult(station.crs, station.name, score)
+
+    def search(self, query: str, limit: int = 10) -> List[SearchResult]:
+        """Stations matching query, best first"""
+        text = _canonical(query)
+        if not text:
+            return []
+
+        scores: Dict[str, SearchResult] = {}
+
+        def add(result: SearchResult) -> None:
+            best = scores.get(result.crs)
+            if best is None or best.score < result.score:
+                scores[result.crs] = result
+
+        station = self._registry.get(query)
+        if station is not None and len(query.strip()) == 3:
+            add(SearchResult(station.crs, station.name, SCORE_CODE))
+
+        alias = self._aliases.get(text)
+        if alias is not None and alias in self._registry:
+            add(SearchResult(alias, self._registry.name(alias), SCORE_ALIAS))
+
+        tokens = text.split()
+        candidates: Optional[Set[int]] = None
+        for token in tokens:
+            matches = self._prefixed(token)
+            candidates = set(matches) if candidates is None else candidates & matches
+            if not candidates:
+                break
+
+        for index in candidates or ():
+            name = self._names[index]
+            if name == text:
+                add(self._result(index, SCORE_NAME))
+                continue
+            # Prefer names starting with the query, then the shortest ones
+            score = SCORE_PREFIX
+            if name.startswith(tokens[0]):
+                score += 5
+            score -= min(len(name) - len(text), 40) / 10
+            if self._stations[index].crs in MAJOR_STATIONS:
+                score += SCORE_MAJOR
+            add(self._result(index, score))
+
+        if len(scores) < limit:
+            grams = _trigrams(text)
+            shared: Counter = Counter()
+            for gram in grams:
+                shared.update(self._trigrams.get(gram, ()))
+            for index, common in shared.items():
+                similarity = 2 * common / (len(grams) + self._trigram_counts[index])
+                if similarity >= FUZZY_THRESHOLD:
+                    add(self._result(index, SCORE_FUZZY * similarity))
+
+        ranked = sorted(
+            scores.values(), key=lambda result: (-result.score, result.name)
+        )
+        return ranked[:limit]
+
+    def best_match(self, query: str) -> Optional[str]:
+        """CRS code of the only confident match for query, if any"""
+        results = self.search(query, limit=2)
+        if not results:
+            return None
+        best = results[0]
+        if best.score >= SCORE_NAME:
+            return best.crs
+        if len(results) == 1 or best.score - results[1].score >= 5:
+            if best.score >= SCORE_FUZZY * 0.6:
+                return best.crs
+        return None
+
+
+_ENGINE: Optional[StationSearch] = None
+
+
+def get_search_engine() -> StationSearch:
+    """The station search engine, built on first use"""
+    global _ENGINE  # pylint: disable=global-statement
+    if _ENGINE is None:
+        _ENGINE = StationSearch(get_registry())
+    return _ENGINE
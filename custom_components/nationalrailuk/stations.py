@@ -0,0 +1,106 @@
+"""Indexed registry of the stations and their CRS codes"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+import re
+from typing import Iterable, Iterator, List, Optional
+
+from .station_data import StationDataset, StationRecord as Station
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalise(name: str) -> str:
+    """Normalised form of a station name used for lookups"""
+    name = name.lower().replace("&", " and ")
+    name = _PUNCTUATION.sub(" ", name)
+    return _SPACES.sub(" ", name).strip()
+
+
+class StationRegistry:
+    """Station lookups by code, by name and by name prefix"""
+
+    def __init__(self, stations: Iterable[Station]) -> None:
+        self._by_code: dict[str, Station] = {}
+        self._by_name: dict[str, Station] = {}
+        self._by_tiploc: dict[str, Station] = {}
+
+        for station in stations:
+            self._by_code[station.crs] = station
+            self._by_name[normalise(station.name)] = station
+            for tiploc in station.tiplocs:
+                self._by_tiploc[tiploc] = station
+
+        # Sorted normalised names for prefix lookups with bisect
+        self._names: List[str] = sorted(self._by_name)
+
+    def __len__(self) -> int:
+        return len(self._by_code)
+
+    def __iter__(self) -> Iterator[Station]:
+        return iter(self._by_code.values())
+
+    def __contains__(self, code: object) -> bool:
+        return isinstance(code, str) and code.strip().upper() in self._by_code
+
+    def get(self, code: str) -> Optional[Station]:
+        """Station for a CRS code"""
+        return self._by_code.get(code.strip().upper())
+
+    def name(self, code: str) -> Optional[str]:
+        """Name of the station for a CRS code"""
+        station = self.get(code)
+        return station.name if station else None
+
+    def by_name(self, name: str) -> Optional[Station]:
+        """Station for an exact name, ignoring case and punctuation"""
+        return self._by_name.get(normalise(name))
+
+    def by_tiploc(self, tiploc: str) -> Optional[Station]:
+        """Station for one of its TIPLOC codes"""
+        return self._by_tiploc.get(tiploc.strip().upper())
+
+    def resolve(self, value: str) -> Optional[str]:
+        """CRS code for a value typed by the user: a code, a name or a TIPLOC"""
+        station = self.get(value) or self.by_name(value) or self.by_tiploc(value)
+        return station.crs if station else None
+
+    def prefix(self, prefix: str, limit: Optional[int] = None) -> List[Station]:
+        """Stations whose normalised name starts with prefix, in name order"""
+        key = normalise(prefix)
+        matches = []
+        index = bisect_left(self._names, key)
+        while index < len(self._names) and self._names[index].startswith(key):
+            matches.append(self._by_name[self._names[index]])
+            if limit is not None and len(matches) >= limit:
+                break
+            index += 1
+        return matches
+
+
+_REGISTRY: Optional[StationRegistry] = None
+
+
+def get_registry() -> StationRegistry:
+    """The station registry, built on first use from the station dataset
+
+    The first call decodes every record, it is made in the executor while
+    the entries are set up.
+    """
+    global _REGISTRY  # pylint: disable=global-statement
+    if _REGISTRY is None:
+        _REGISTRY = StationRegistry(get_dataset())
+    return _REGISTRY
+
+
+_DATASET: Optional[StationDataset] = None
+
+
+def get_dataset() -> StationDataset:
+    """The memory-mapped station dataset, opened on first use"""
+    global _DATASET  # pylint: disable=global-statement
+    if _DATASET is None:
+        _DATASET = StationDataset()
+    return _DATASET
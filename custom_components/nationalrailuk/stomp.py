@@ -0,0 +1,189 @@
+"""Minimal asyncio STOMP 1.2 client, enough to consume a topic
+
+Only CONNECT, SUBSCRIBE with automatic acknowledgement, heart-beats and
+MESSAGE frames are supported. Frame bodies are read by content-length when
+the header is present, so binary (gzip) bodies are handled.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+from typing import AsyncIterator, Dict, NamedTuple, Optional, Tuple
+
+_LOGGER = logging.getLogger(__name__)
+
+# Heart-beat the client sends and wants, in milliseconds
+HEARTBEAT = 15000
+
+
+class StompError(Exception):
+    """The broker refused the connection or sent an ERROR frame"""
+
+
+class Frame(NamedTuple):
+    """A STOMP frame"""
+
+    command: str
+    headers: Dict[str, str]
+    body: bytes
+
+
+_ESCAPES = {"n": "\n", "c": ":", "\\": "\\", "r": "\r"}
+_ESCAPED = re.compile(r"\\(.)", re.DOTALL)
+
+
+def _unescape(value: str) -> str:
+    # One pass, an escaped backslash followed by n is not a newline
+    if "\\" not in value:
+        return value
+    return _ESCAPED.sub(lambda match: _ESCAPES.get(match[1], match[0]), value)
+
+
+def _escape(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\")
+        .replace("\n", "\\n")
+        .replace(":", "\\c")
+        .replace("\r", "\\r")
+    )
+
+
+def encode_frame(command: str, headers: Dict[str, str], body: bytes = b"") -> bytes:
+    """Serialise a frame"""
+    lines = [command]
+    lines.extend(f"{_escape(key)}:{_escape(value)}" for key, value in headers.items())
+    if body:
+        lines.append(f"content-length:{len(body)}")
+    return ("\n".join(lines) + "\n\n").encode("utf-8") + body + b"\x00"
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[Frame]:
+    """Next frame of a stream, None for a heart-beat"""
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Connection closed by the broker")
+    command = line.rstrip(b"\r\n").decode("utf-8")
+    if not command:
+        return None
+
+    headers: Dict[str, str] = {}
+    while True:
+        line = (await reader.readline()).rstrip(b"\r\n")
+        if not line:
+            break
+        key, _, value = line.decode("utf-8").partition(":")
+        # The first occurrence of a repeated header wins
+        headers.setdefault(_unescape(key), _unescape(value))
+
+    length = headers.get("content-length")
+    if length is not None:
+        body = await reader.readexactly(int(length))
+        await reader.readexactly(1)
+    else:
+        body = (await reader.readuntil(b"\x00"))[:-1]
+    return Frame(command, headers, body)
+
+
+class StompClient:
+    """A connection subscribed to one destination"""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        login: Optional[str] = None,
+        passcode: Optional[str] = None,
+        heartbeat: int = HEARTBEAT,
+    ) -> None:
+        self._host = host
+        self._port = port
+        self._login = login
+        self._passcode = passcode
+        self._heartbeat = heartbeat
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._beats: Optional[asyncio.Task] = None
+        self._timeout: Optional[float] = None
+
+    async def connect(self) -> Dict[str, str]:
+        """Open the connection, return the CONNECTED headers"""
+        self._reader, self._writer = await asyncio.open_connection(
+            self._host, self._port
+        )
+        headers = {
+            "accept-version": "1.2",
+            "host": self._host,
+            "heart-beat": f"{self._heartbeat},{self._heartbeat}",
+        }
+        if self._login:
+            headers["login"] = self._login
+            headers["passcode"] = self._passcode or ""
+        await self._send("CONNECT", headers)
+
+        frame = None
+        while frame is None:
+            frame = await read_frame(self._reader)
+        if frame.command != "CONNECTED":
+            raise StompError(frame.headers.get("message") or frame.body.decode())
+
+        send, receive = _negotiate(self._heartbeat, frame.headers.get("heart-beat"))
+        if send:
+            self._beats = asyncio.create_task(self._send_beats(send / 1000))
+        # Allow twice the interval the broker promised before giving up
+        self._timeout = 2 * receive / 1000 if receive else None
+        return frame.headers
+
+    async def subscribe(self, destination: str, subscription: str = "0") -> None:
+        """Subscribe to a destination, messages are acknowledged automatically"""
+        await self._send(
+            "SUBSCRIBE", {"id": subscription, "destination": destination, "ack": "auto"}
+        )
+
+    async def messages(self) -> AsyncIterator[Frame]:
+        """The MESSAGE frames received, until the connection fails"""
+        assert self._reader is not None
+        while True:
+            frame = await asyncio.wait_for(read_frame(self._reader), self._timeout)
+            if frame is None:
+                continue
+            if frame.command == "ERROR":
+                raise StompError(frame.headers.get("message") or frame.body.decode())
+            if frame.command == "MESSAGE":
+                yield frame
+
+    async def close(self) -> None:
+        """Disconnect, without waiting for a receipt"""
+        if self._beats is not None:
+            self._beats.cancel()
+            self._beats = None
+        if self._writer is not None:
+            try:
+                await self._send("DISCONNECT", {})
+            except ConnectionError:
+                pass
+            self._writer.close()
+            self._writer = None
+
+    async def _send(self, command: str, headers: Dict[str, str]) -> None:
+        assert self._writer is not None
+        self._writer.write(encode_frame(command, headers))
+        await self._writer.drain()
+
+    async def _send_beats(self, interval: float) -> None:
+        while self._writer is not None:
+            await asyncio.sleep(interval)
+            self._writer.write(b"\n")
+            await self._writer.drain()
+
+
+def _negotiate(heartbeat: int, header: Optional[str]) -> Tuple[int, int]:
+    """Intervals to send and expect heart-beats at, 0 for none"""
+    try:
+        broker_send, broker_wants = (int(part) for part in (header or "0,0").split(","))
+    except ValueError:
+        return 0, 0
+    send = max(heartbeat, broker_wants) if broker_wants else 0
+    receive = max(heartbeat, broker_send) if broker_send else 0
+    return send, receive
@@ -0,0 +1,125 @@
+"""WebSocket commands of the National Rail UK integration"""
+
+from __future__ import annotations
+
+from typing import Any
+
+import voluptuous as vol
+
+from homeassistant.components import websocket_api
+from homeassistant.core import HomeAssistant, callback
+
+from .boards import (
+    find_board,
+    find_train,
+    serialise_calling_points,
+    top_departures,
+)
+from .const import DEFAULT_SUMMARY_TRAINS, DOMAIN, PLANNER_STATE
+from .station_search import get_search_engine
+
+WS_REGISTERED = "websocket_registered"
+
+
+@callback
+def async_setup_websocket(hass: HomeAssistant) -> None:
+    """Register the WebSocket commands once"""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if domain_data.get(WS_REGISTERED):
+        return
+    domain_data[WS_REGISTERED] = True
+
+    websocket_api.async_register_command(hass, ws_calling_points)
+    websocket_api.async_register_command(hass, ws_next_departures)
+    websocket_api.async_register_command(hass, ws_search_stations)
+    websocket_api.async_register_command(hass, ws_planner_metrics)
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): f"{DOMAIN}/calling_points",
+        vol.Required("service_id"): str,
+    }
+)
+@callback
+def ws_calling_points(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict[str, Any]
+) -> None:
+    """Return the calling points of a service from the in-memory boards"""
+    train = find_train(hass, msg["service_id"])
+    if train is None:
+        connection.send_error(msg["id"], "not_found", "Unknown service")
+        return
+    connection.send_result(
+        msg["id"],
+        {
+            "service_id": msg["service_id"],
+            "calling_points": serialise_calling_points(train),
+        },
+    )
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): f"{DOMAIN}/next_departures",
+        vol.Required("station"): vol.All(str, vol.Upper),
+        vol.Optional("count", default=DEFAULT_SUMMARY_TRAINS): vol.All(
+            int, vol.Range(min=1)
+        ),
+    }
+)
+@callback
+def ws_next_departures(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict[str, Any]
+) -> None:
+    """Return the next trains from a station to any monitored destination"""
+    board = find_board(hass, msg["station"])
+    if board is None:
+        connection.send_error(msg["id"], "not_found", "Station is not monitored")
+        return
+    connection.send_result(
+        msg["id"],
+        {
+            "station": msg["station"],
+            "departures": top_departures(board.data, msg["count"]),
+        },
+    )
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): f"{DOMAIN}/search_stations",
+        vol.Required("query"): str,
+        vol.Optional("limit", default=10): vol.All(int, vol.Range(min=1, max=50)),
+    }
+)
+@websocket_api.async_response
+async def ws_search_stations(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict[str, Any]
+) -> None:
+    """Return the stations matching a query, best first"""
+    # The index is built on first use, keep that off the event loop
+    engine = await hass.async_add_executor_job(get_search_engine)
+    results = engine.search(msg["query"], msg["limit"])
+    connection.send_result(
+        msg["id"],
+        {
+            "stations": [
+                {"value": result.crs, "label": result.name, "score": result.score}
+                for result in results
+            ]
+        },
+    )
+
+
+@websocket_api.websocket_command({vol.Required("type"): f"{DOMAIN}/planner_metrics"})
+@callback
+def ws_planner_metrics(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict[str, Any]
+) -> None:
+    """Return the call counts and latencies of the journey planners"""
+    state = hass.data.get(DOMAIN, {}).get(PLANNER_STATE)
+    metrics = state.metrics if state is not None else {}
+    connection.send_result(
+        msg["id"], {name: value.as_dict() for name, value in metrics.items()}
+    )
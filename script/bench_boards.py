@@ -0,0 +1,149 @@
+"""Measure the service updates per second the board materialiser applies
+
+    python script/bench_boards.py --services 2000 --updates 100000
+    python script/bench_boards.py --push --services 500
+
+The default run upserts synthetic rows straight into the materialiser:
+every update moves a service to a new expected time on each view of the
+stations it calls at, like a delay reported by the feed. --push replays
+Darwin messages from darwin_replay.generate through PushBoards instead,
+so XML parsing and row building are counted too.
+"""
+
+import argparse
+import datetime as dt
+import importlib.util
+import os
+import random
+import sys
+import time
+import types
+
+SCRIPT = os.path.dirname(os.path.abspath(__file__))
+COMPONENT = os.path.join(os.path.dirname(SCRIPT), "custom_components", "nationalrailuk")
+PACKAGE = "nationalrailuk_bench"
+
+
+def _load(name):
+    """Load a module of the integration without importing Home Assistant"""
+    if PACKAGE not in sys.modules:
+        # Stand-in package so the relative imports of darwin resolve
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [COMPONENT]
+        sys.modules[PACKAGE] = package
+    spec = importlib.util.spec_from_file_location(
+        f"{PACKAGE}.{name}", os.path.join(COMPONENT, f"{name}.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def _train(rid, when, destination):
+    return {
+        "serviceID": rid,
+        "scheduled": when,
+        "expected": when,
+        "platform": "1",
+        "otherEnd": {"locationName": destination},
+    }
+
+
+def bench_materialiser(args):
+    boards = _load("board_materialiser")
+    rng = random.Random(args.seed)
+    stations = [f"S{index:02d}" for index in range(args.stations)]
+    materialiser = boards.BoardMaterialiser()
+    for station in stations:
+        materialiser.subscribe(station, [s for s in stations if s != station][:3])
+
+    start = dt.datetime.now(dt.timezone.utc)
+    services = []
+    for index in range(args.services):
+        calls = rng.sample(stations, min(4, len(stations)))
+        when = start + dt.timedelta(minutes=rng.randint(0, 600))
+        services.append((f"R{index:06d}", calls, when))
+
+    def rows(station, calls, when):
+        board = materialiser.boards[station]
+        return {
+            (destination, direction): _train(rid, when, destination)
+            if destination in calls
+            else None
+            for destination, direction in board.views
+        }
+
+    for rid, calls, when in services:
+        for station in calls:
+            materialiser.apply(station, rid, rows(station, calls, when))
+
+    updates = [
+        (rng.choice(services), dt.timedelta(minutes=rng.randint(0, 30)))
+        for _ in range(args.updates)
+    ]
+    changed = 0
+    began = time.perf_counter()
+    for (rid, calls, when), delay in updates:
+        for station in calls:
+            board = materialiser.boards[station]
+            changed += len(
+                materialiser.apply(
+                    station,
+                    rid,
+                    {
+                        view: _train(rid, when + delay, view[0])
+                        if view[0] in calls
+                        else None
+                        for view in board.views
+                    },
+                )
+            )
+    elapsed = time.perf_counter() - began
+    for station in stations:
+        materialiser.board(station, materialiser.boards[station].destinations, 10)
+
+    print(
+        f"{args.updates} service updates over {args.services} services and "
+        f"{len(stations)} stations in {elapsed:.2f}s: "
+        f"{args.updates / elapsed:,.0f} updates/s, {changed} rows changed"
+    )
+
+
+def bench_push(args):
+    darwin = _load("darwin")
+    sys.path.insert(0, SCRIPT)
+    from darwin_replay import generate
+
+    stations = args.push_stations.split(",")
+    messages = [
+        darwin.parse_message(message.encode("utf-8"))
+        for message in generate(args.services, stations, args.seed)
+    ]
+    boards = darwin.PushBoards()
+    for station in stations:
+        boards.board(station, [s for s in stations if s != station])
+
+    began = time.perf_counter()
+    changes = sum(len(boards.apply(message)) for message in messages)
+    elapsed = time.perf_counter() - began
+    print(
+        f"{len(messages)} push messages on {len(stations)} stations in "
+        f"{elapsed:.2f}s: {len(messages) / elapsed:,.0f} messages/s, "
+        f"{changes} rows changed"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--services", type=int, default=2000)
+    parser.add_argument("--stations", type=int, default=20)
+    parser.add_argument("--updates", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--push", action="store_true", help="replay push messages")
+    parser.add_argument("--push-stations", default="PAD,RDG,DID,SWI")
+    arguments = parser.parse_args()
+    if arguments.push:
+        bench_push(arguments)
+    else:
+        bench_materialiser(arguments)
@@ -0,0 +1,184 @@
+"""Measure the journeys per second the offline planner finds
+
+    python script/bench_csa.py --lines 12 --stations 15 --trains 40 --queries 500
+
+Synthetic boards are generated: --lines lines of --stations stations each,
+crossing at shared interchange stations, every line run by --trains trains a
+day in each direction. The run times the timetable build, which happens on
+every planning, and the three best journeys between random stations.
+
+Two small timetables are planned first and checked against their known
+best journey: a train boarded at a later stop with fewer changes must be
+ridden from there.
+
+Needs httpx, like the integration.
+"""
+
+import argparse
+import datetime as dt
+import importlib
+import os
+import random
+import sys
+import time
+import types
+
+SCRIPT = os.path.dirname(os.path.abspath(__file__))
+COMPONENT = os.path.join(os.path.dirname(SCRIPT), "custom_components", "nationalrailuk")
+PACKAGE = "nationalrailuk_bench"
+
+
+def _load(name):
+    """Import a module of the integration without importing Home Assistant"""
+    if PACKAGE not in sys.modules:
+        # Stand-in package so the relative imports of the planner resolve
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [COMPONENT]
+        sys.modules[PACKAGE] = package
+    return importlib.import_module(f"{PACKAGE}.{name}")
+
+
+def _code(index):
+    return f"{chr(65 + index // 26 % 26)}{chr(65 + index % 26)}X"
+
+
+def network(rng, args):
+    """The stations of each line, consecutive lines sharing one station"""
+    lines = []
+    next_code = 0
+    for number in range(args.lines):
+        stations = [lines[-1][rng.randrange(args.stations)]] if number else []
+        while len(stations) < args.stations:
+            stations.append(_code(next_code))
+            next_code += 1
+        rng.shuffle(stations)
+        lines.append(stations)
+    return lines
+
+
+def boards(rng, lines, args, start):
+    """One processed board holding every train of the network"""
+    trains = []
+    for number, stations in enumerate(lines):
+        for run in range(args.trains):
+            for route in (stations, stations[::-1]):
+                when = start + dt.timedelta(minutes=rng.randint(0, 18 * 60))
+                points = []
+                for crs in route:
+                    points.append(
+                        {
+                            "crs": crs,
+                            "locationName": f"Station {crs}",
+                            "st": when,
+                            "et": when,
+                            "atet": when,
+                            "isCancelled": False,
+                        }
+                    )
+                    when += dt.timedelta(minutes=rng.randint(2, 9))
+                trains.append(
+                    {
+                        "serviceID": f"L{number}R{run}{route[0]}",
+                        "operator": f"Line {number}",
+                        "destination": f"Station {route[-1]}",
+                        "isCancelled": False,
+                        "callingPoints": points,
+                    }
+                )
+    return [{"dests": {"ANY": {"Departure": {"trains": trains}}}}]
+
+
+def _train(service_id, start, *stops):
+    """A train calling at stops, given as (crs, minutes after start)"""
+    points = []
+    for crs, minutes in stops:
+        when = start + dt.timedelta(minutes=minutes)
+        points.append(
+            {"crs": crs, "locationName": f"Station {crs}", "st": when, "et": when}
+        )
+    return {"serviceID": service_id, "callingPoints": points}
+
+
+def check(csa, start):
+    """Plan the small timetables, return the number of wrong journeys"""
+    loop = [_train("Y", start, ("O", 0), ("S", 10))]
+    cases = [
+        # X calls at the origin after S, a change onto it at S is a detour
+        (
+            loop + [_train("X", start, ("S", 20), ("O", 30), ("D", 50))],
+            [("O", "D", "X")],
+        ),
+        # Boarded at S, X would leave no change for Z
+        (
+            loop
+            + [
+                _train("X", start, ("S", 20), ("O", 30), ("M", 40)),
+                _train("Z", start, ("M", 50), ("D", 60)),
+            ],
+            [("O", "M", "X"), ("M", "D", "Z")],
+        ),
+    ]
+    wrong = 0
+    for trains, expected in cases:
+        timetable = csa.Timetable()
+        for train in trains:
+            timetable.add_train(train)
+        timetable.finalise()
+        found = csa.OfflinePlanner(timetable).plan(
+            "O", "D", start, max_changes=1, count=1
+        )
+        legs = [
+            (leg["from_crs"], leg["to_crs"], leg["service_id"])
+            for leg in (found[0]["legs"] if found else [])
+        ]
+        if legs != expected:
+            wrong += 1
+            print(f"Expected {expected}, planned {legs}")
+    print(f"{len(cases) - wrong}/{len(cases)} small timetables planned right")
+    return wrong
+
+
+def main(args):
+    csa = _load("planner.csa")
+    rng = random.Random(args.seed)
+    start = dt.datetime.now(dt.timezone.utc).replace(hour=5, minute=0, second=0)
+
+    wrong = check(csa, start)
+
+    lines = network(rng, args)
+    data = boards(rng, lines, args, start)
+    began = time.perf_counter()
+    timetable = csa.Timetable.from_boards(data)
+    built = time.perf_counter() - began
+    print(
+        f"Timetable of {len(timetable.trips)} trains, "
+        f"{len(timetable.connections)} connections built in {built * 1000:.1f} ms"
+    )
+
+    stations = sorted({crs for line in lines for crs in line})
+    planner = csa.OfflinePlanner(timetable)
+    found = 0
+    began = time.perf_counter()
+    for _ in range(args.queries):
+        origin, destination = rng.sample(stations, 2)
+        when = start + dt.timedelta(minutes=rng.randint(0, 12 * 60))
+        found += bool(
+            planner.plan(origin, destination, when, max_changes=args.changes)
+        )
+    elapsed = time.perf_counter() - began
+    print(
+        f"{args.queries} plans in {elapsed:.2f}s: {args.queries / elapsed:,.0f}/s, "
+        f"{elapsed / args.queries * 1000:.2f} ms each, {found} with a journey"
+    )
+    return 1 if wrong else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=12)
+    parser.add_argument("--stations", type=int, default=15, help="per line")
+    parser.add_argument("--trains", type=int, default=40, help="per line and way")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--changes", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    sys.exit(main(parser.parse_args()))
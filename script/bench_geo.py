@@ -0,0 +1,108 @@
+"""Measure the nearest station lookups per second of the k-d tree
+
+    python script/bench_geo.py --stations 2600 --queries 20000 --count 5
+
+The shipped dataset may have no coordinates, so the stations are placed at
+random over Great Britain. Each lookup is checked against a linear scan of
+every station, whose speed is reported alongside.
+"""
+
+import argparse
+import importlib
+import math
+import os
+import random
+import sys
+import time
+import types
+
+SCRIPT = os.path.dirname(os.path.abspath(__file__))
+COMPONENT = os.path.join(os.path.dirname(SCRIPT), "custom_components", "nationalrailuk")
+PACKAGE = "nationalrailuk_bench"
+
+# Bounding box of Great Britain
+LATITUDES = (50.0, 58.6)
+LONGITUDES = (-5.7, 1.8)
+
+
+def _load(name):
+    """Import a module of the integration without importing Home Assistant"""
+    if PACKAGE not in sys.modules:
+        # Stand-in package so the relative imports of the index resolve
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [COMPONENT]
+        sys.modules[PACKAGE] = package
+    return importlib.import_module(f"{PACKAGE}.{name}")
+
+
+def _location(rng):
+    return rng.uniform(*LATITUDES), rng.uniform(*LONGITUDES)
+
+
+def _haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * 6371.0 * math.asin(math.sqrt(a))
+
+
+def linear(stations, latitude, longitude, count):
+    """The count closest stations by a scan of every station"""
+    return sorted(
+        stations,
+        key=lambda s: _haversine(latitude, longitude, s.latitude, s.longitude),
+    )[:count]
+
+
+def main(args):
+    station_data = _load("station_data")
+    station_geo = _load("station_geo")
+    rng = random.Random(args.seed)
+
+    stations = [
+        station_data.StationRecord(f"S{index:04d}", f"Station {index}", *_location(rng))
+        for index in range(args.stations)
+    ]
+    start = time.perf_counter()
+    index = station_geo.StationGeoIndex(stations)
+    built = time.perf_counter() - start
+    print(f"Indexed {len(index)} stations in {built * 1000:.1f} ms")
+
+    targets = [_location(rng) for _ in range(args.queries)]
+    start = time.perf_counter()
+    found = [index.nearest(lat, lon, args.count) for lat, lon in targets]
+    elapsed = time.perf_counter() - start
+    print(
+        f"{len(targets)} k-d tree lookups of {args.count}: "
+        f"{len(targets) / elapsed:,.0f}/s, {elapsed / len(targets) * 1e6:.0f} us each"
+    )
+
+    checked = targets[: args.check]
+    start = time.perf_counter()
+    expected = [linear(stations, lat, lon, args.count) for lat, lon in checked]
+    elapsed = time.perf_counter() - start
+    print(
+        f"{len(checked)} linear scans: {len(checked) / elapsed:,.0f}/s, "
+        f"{elapsed / len(checked) * 1e6:.0f} us each"
+    )
+
+    wrong = sum(
+        [nearby.station.crs for nearby in result] != [s.crs for s in scan]
+        for result, scan in zip(found, expected)
+    )
+    print(f"{len(checked) - wrong}/{len(checked)} lookups match the linear scan")
+    return 1 if wrong else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stations", type=int, default=2600)
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--count", type=int, default=5, help="stations per lookup")
+    parser.add_argument(
+        "--check", type=int, default=500, help="lookups checked by a linear scan"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,92 @@
+"""Measure the station searches per second and the time to build the index
+
+    python script/bench_search.py --queries 20000
+
+The queries are drawn from the station names: whole names, the prefix of a
+word as typed so far, and names with a typo, so every kind of match of the
+search is exercised. The run also prints the ranking of a few ambiguous
+queries.
+"""
+
+import argparse
+import importlib
+import os
+import random
+import sys
+import time
+import types
+
+SCRIPT = os.path.dirname(os.path.abspath(__file__))
+COMPONENT = os.path.join(os.path.dirname(SCRIPT), "custom_components", "nationalrailuk")
+PACKAGE = "nationalrailuk_bench"
+
+SAMPLES = ("waterloo", "london", "manchester", "glasgow", "kings x", "edinbrugh")
+
+
+def _load(name):
+    """Import a module of the integration without importing Home Assistant"""
+    if PACKAGE not in sys.modules:
+        # Stand-in package so the relative imports of the search resolve
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [COMPONENT]
+        sys.modules[PACKAGE] = package
+    return importlib.import_module(f"{PACKAGE}.{name}")
+
+
+def _typo(rng, name):
+    """The name with two adjacent letters swapped"""
+    if len(name) < 4:
+        return name
+    index = rng.randrange(1, len(name) - 2)
+    return name[:index] + name[index + 1] + name[index] + name[index + 2 :]
+
+
+def queries(rng, names, count):
+    result = []
+    for _ in range(count):
+        name = rng.choice(names)
+        kind = rng.random()
+        if kind < 0.4:
+            word = rng.choice(name.split())
+            result.append(word[: rng.randint(1, len(word))])
+        elif kind < 0.7:
+            result.append(name)
+        else:
+            result.append(_typo(rng, name))
+    return result
+
+
+def main(args):
+    stations = _load("stations")
+    station_search = _load("station_search")
+    rng = random.Random(args.seed)
+
+    registry = stations.get_registry()
+    start = time.perf_counter()
+    engine = station_search.StationSearch(registry)
+    built = time.perf_counter() - start
+    print(f"Indexed {len(registry)} stations in {built * 1000:.1f} ms")
+
+    names = [station.name.lower() for station in registry]
+    batch = queries(rng, names, args.queries)
+    start = time.perf_counter()
+    for query in batch:
+        engine.search(query, args.limit)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{len(batch)} searches in {elapsed:.2f}s: {len(batch) / elapsed:,.0f}/s, "
+        f"{elapsed / len(batch) * 1e6:.0f} us each"
+    )
+
+    for query in SAMPLES:
+        results = engine.search(query, 3)
+        shown = ", ".join(f"{r.crs} {r.name} ({r.score:.1f})" for r in results)
+        print(f"  {query!r}: {shown}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--limit", type=int, default=10, help="results per search")
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
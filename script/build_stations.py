@@ -0,0 +1,73 @@
+"""Regenerate custom_components/nationalrailuk/stations.bin
+
+The station list comes from crs.py. Coordinates and TIPLOC codes are not part
+of it, they can be merged from a CSV file with the columns
+crs,latitude,longitude,tiplocs (TIPLOC codes space separated):
+
+    python script/build_stations.py --coordinates stations.csv
+"""
+
+import argparse
+import csv
+import importlib.util
+import os
+
+COMPONENT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "custom_components",
+    "nationalrailuk",
+)
+
+
+def _load(name):
+    """Load a module of the integration without importing Home Assistant"""
+    spec = importlib.util.spec_from_file_location(
+        name, os.path.join(COMPONENT, f"{name}.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _read_coordinates(path):
+    extra = {}
+    with open(path, newline="", encoding="utf-8") as file:
+        for row in csv.DictReader(file):
+            crs = row["crs"].strip().upper()
+            latitude = row.get("latitude") or None
+            longitude = row.get("longitude") or None
+            extra[crs] = (
+                float(latitude) if latitude else None,
+                float(longitude) if longitude else None,
+                tuple((row.get("tiplocs") or "").split()),
+            )
+    return extra
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--coordinates", help="CSV of crs,latitude,longitude,tiplocs")
+    parser.add_argument("--output", default=os.path.join(COMPONENT, "stations.bin"))
+    args = parser.parse_args()
+
+    crs = _load("crs")
+    station_data = _load("station_data")
+    extra = _read_coordinates(args.coordinates) if args.coordinates else {}
+
+    stations = []
+    for entry in crs.CRS:
+        code = entry["value"].upper()
+        latitude, longitude, tiplocs = extra.get(code, (None, None, ()))
+        stations.append(
+            station_data.StationRecord(
+                code, entry["label"], latitude, longitude, tiplocs
+            )
+        )
+
+    count = station_data.write_dataset(args.output, stations)
+    located = sum(1 for station in stations if station.latitude is not None)
+    print(f"Wrote {count} stations ({located} with coordinates) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
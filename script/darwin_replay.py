@@ -0,0 +1,220 @@
+"""Stand-in Darwin Push Port broker replaying messages over STOMP
+
+Point the push_host option of an entry at the machine running it (port
+61613 by default) to feed its boards without a Darwin subscription:
+
+    python script/darwin_replay.py --file messages.txt --rate 20 --loop
+    python script/darwin_replay.py --generate 200 --stations PAD,RDG,DID,SWI
+
+A replay file holds one Push Port XML message per line. --generate builds
+synthetic services calling at the given CRS codes, which the integration
+accepts in place of TIPLOCs, and --write saves them as a replay file.
+Every subscriber receives the whole replay, whatever its destination.
+"""
+
+import argparse
+import asyncio
+import datetime as dt
+import importlib.util
+import os
+import random
+
+COMPONENT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "custom_components",
+    "nationalrailuk",
+)
+
+PPORT = (
+    '<Pport xmlns="http://www.thalesgroup.com/rtti/PushPort/v16" '
+    'xmlns:ns2="http://www.thalesgroup.com/rtti/PushPort/Schedules/v3" '
+    'xmlns:ns5="http://www.thalesgroup.com/rtti/PushPort/Forecasts/v3" '
+    'ts="{ts}" version="16.0"><uR updateOrigin="CIS">{body}</uR></Pport>'
+)
+
+
+def _load(name):
+    """Load a module of the integration without importing Home Assistant"""
+    spec = importlib.util.spec_from_file_location(
+        name, os.path.join(COMPONENT, f"{name}.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _message(body):
+    return PPORT.format(ts=dt.datetime.now().astimezone().isoformat(), body=body)
+
+
+def _hhmm(value):
+    return value.strftime("%H:%M")
+
+
+def generate(count, stations, seed=0):
+    """Schedules, status updates and deactivations of count services
+
+    Services run along the stations in either direction, a few minutes
+    apart, and are then delayed, given platforms or cancelled at random.
+    """
+    rng = random.Random(seed)
+    start = dt.datetime.now().replace(second=0, microsecond=0)
+    schedules, updates, endings = [], [], []
+
+    for index in range(count):
+        rid = f"{start:%Y%m%d}{index:06d}"
+        calls = stations if index % 2 == 0 else stations[::-1]
+        first = start + dt.timedelta(minutes=2 * index - 30)
+        times = [first + dt.timedelta(minutes=12 * i) for i in range(len(calls))]
+
+        locations = []
+        for position, (crs, time) in enumerate(zip(calls, times)):
+            if position == 0:
+                locations.append(
+                    f'<ns2:OR tpl="{crs}" act="TB" ptd="{_hhmm(time)}" '
+                    f'wtd="{_hhmm(time)}"/>'
+                )
+            elif position == len(calls) - 1:
+                locations.append(
+                    f'<ns2:DT tpl="{crs}" act="TF" pta="{_hhmm(time)}" '
+                    f'wta="{_hhmm(time)}"/>'
+                )
+            else:
+                stop = _hhmm(time + dt.timedelta(minutes=1))
+                locations.append(
+                    f'<ns2:IP tpl="{crs}" act="T" pta="{_hhmm(time)}" '
+                    f'ptd="{stop}" wta="{_hhmm(time)}" wtd="{stop}"/>'
+                )
+        schedules.append(
+            _message(
+                f'<schedule rid="{rid}" uid="X{index:05d}" trainId="1A{index % 100:02d}" '
+                f'ssd="{first:%Y-%m-%d}" toc="GW">{"".join(locations)}</schedule>'
+            )
+        )
+
+        delay = rng.choice([0, 0, 0, 2, 5, 12])
+        status = []
+        for position, (crs, time) in enumerate(zip(calls, times)):
+            departs = time if position == 0 else time + dt.timedelta(minutes=1)
+            key = f'wtd="{_hhmm(departs)}"' if position < len(calls) - 1 else ""
+            key = key or f'wta="{_hhmm(time)}"'
+            tag = "dep" if position < len(calls) - 1 else "arr"
+            expected = _hhmm(
+                (departs if tag == "dep" else time) + dt.timedelta(minutes=delay)
+            )
+            status.append(
+                f'<ns5:Location tpl="{crs}" {key}><ns5:{tag} et="{expected}" '
+                f'src="Darwin"/><ns5:plat>{rng.randint(1, 12)}</ns5:plat>'
+                "</ns5:Location>"
+            )
+        updates.append(
+            _message(
+                f'<TS rid="{rid}" uid="X{index:05d}" ssd="{first:%Y-%m-%d}">'
+                f'{"".join(status)}</TS>'
+            )
+        )
+        if rng.random() < 0.05:
+            cancelled = "".join(locations).replace("/>", ' can="true"/>')
+            updates.append(
+                _message(
+                    f'<schedule rid="{rid}" uid="X{index:05d}" '
+                    f'ssd="{first:%Y-%m-%d}" toc="GW">{cancelled}'
+                    '<ns2:cancelReason>104</ns2:cancelReason></schedule>'
+                )
+            )
+        if times[-1] < start:
+            endings.append(_message(f'<deactivated rid="{rid}"/>'))
+
+    return schedules + updates + endings
+
+
+class Broker:
+    """Accepts STOMP subscriptions and replays the messages to each"""
+
+    def __init__(self, messages, rate, loop):
+        self._stomp = _load("stomp")
+        self._messages = messages
+        self._rate = rate
+        self._loop = loop
+
+    async def serve(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        stomp = self._stomp
+        try:
+            while True:
+                frame = await stomp.read_frame(reader)
+                if frame is None:
+                    continue
+                if frame.command in ("CONNECT", "STOMP"):
+                    writer.write(
+                        stomp.encode_frame(
+                            "CONNECTED", {"version": "1.2", "heart-beat": "0,0"}
+                        )
+                    )
+                    await writer.drain()
+                elif frame.command == "SUBSCRIBE":
+                    print(f"{peer} subscribed to {frame.headers.get('destination')}")
+                    await self._replay(writer, frame.headers)
+                elif frame.command == "DISCONNECT":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            print(f"{peer} disconnected")
+
+    async def _replay(self, writer, subscription):
+        stomp = self._stomp
+        sent = 0
+        while True:
+            for body in self._messages:
+                headers = {
+                    "subscription": subscription.get("id", "0"),
+                    "destination": subscription.get("destination", ""),
+                    "message-id": str(sent),
+                }
+                writer.write(stomp.encode_frame("MESSAGE", headers, body))
+                await writer.drain()
+                sent += 1
+                if self._rate:
+                    await asyncio.sleep(1 / self._rate)
+            if not self._loop:
+                return
+
+
+async def main(args):
+    if args.file:
+        with open(args.file, "rb") as file:
+            messages = [line.strip() for line in file if line.strip()]
+    else:
+        stations = [code.strip().upper() for code in args.stations.split(",")]
+        messages = [
+            message.encode("utf-8")
+            for message in generate(args.generate, stations, args.seed)
+        ]
+
+    if args.write:
+        with open(args.write, "wb") as file:
+            file.writelines(message + b"\n" for message in messages)
+        print(f"Wrote {len(messages)} messages to {args.write}")
+        return
+
+    broker = Broker(messages, args.rate, args.loop)
+    server = await asyncio.start_server(broker.serve, args.host, args.port)
+    print(f"Replaying {len(messages)} messages on {args.host}:{args.port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=61613)
+    parser.add_argument("--file", help="replay file, one message per line")
+    parser.add_argument("--generate", type=int, default=100, metavar="SERVICES")
+    parser.add_argument("--stations", default="PAD,RDG,DID,SWI")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rate", type=float, default=20, help="messages per second")
+    parser.add_argument("--loop", action="store_true", help="replay forever")
+    parser.add_argument("--write", metavar="FILE", help="save the messages instead")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,141 @@
+"""Load test of the history store: sustained ingestion from many stations
+
+    python script/load_history.py --stations 40 --seconds 20
+
+Each simulated station refreshes a board of --trains departures, each with
+--calls calling points, every --interval seconds, all on one event loop like
+the coordinators. The run reports the rows written per second and the
+longest the event loop was held up, which must stay small since the writes
+happen in the worker thread, and how many actual times were observed or
+inferred.
+"""
+
+import argparse
+import asyncio
+import datetime as dt
+import importlib.util
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+COMPONENT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "custom_components",
+    "nationalrailuk",
+)
+
+
+def _load(name):
+    """Load a module of the integration without importing Home Assistant"""
+    spec = importlib.util.spec_from_file_location(
+        name, os.path.join(COMPONENT, f"{name}.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+history_store = _load("history_store")
+
+
+def _code(index):
+    return f"{chr(65 + index // 26 % 26)}{chr(65 + index % 26)}X"
+
+
+def _board(rng, station, args, start):
+    """A processed board with delays moving between refreshes"""
+    trains = []
+    for index in range(args.trains):
+        scheduled = start + dt.timedelta(minutes=5 * index)
+        delay = dt.timedelta(minutes=rng.choice([0, 0, 0, 1, 3, 8]))
+        points = []
+        for call in range(args.calls):
+            st = scheduled + dt.timedelta(minutes=6 * (call + 1))
+            points.append(
+                {
+                    "crs": _code(call + 100),
+                    "st": st,
+                    "et": st + delay,
+                    "at": st if call == 0 and rng.random() < 0.2 else None,
+                    "isCancelled": False,
+                }
+            )
+        trains.append(
+            {
+                "serviceID": f"{station}{index:04d}",
+                "scheduled": scheduled,
+                "expected": scheduled + delay,
+                "isCancelled": rng.random() < 0.02,
+                "callingPoints": points,
+            }
+        )
+    return {"dests": {"ANY": {"Departure": {"trains": trains}, "Arrival": {}}}}
+
+
+async def _station(store, station, args, rng, start, stop):
+    while time.monotonic() < stop:
+        board = _board(rng, station, args, start)
+        if store.add_board(board, station):
+            asyncio.get_running_loop().create_task(store.async_flush())
+        await asyncio.sleep(args.interval)
+
+
+async def _watch_loop(stop, lags):
+    """Record how late the loop wakes a 10 ms sleeper"""
+    while time.monotonic() < stop:
+        before = time.monotonic()
+        await asyncio.sleep(0.01)
+        lags.append(time.monotonic() - before - 0.01)
+
+
+async def main(args):
+    path = args.database or os.path.join(tempfile.mkdtemp(), "history.db")
+    store = history_store.HistoryStore(path, retention_days=7)
+    rng = random.Random(args.seed)
+    start = dt.datetime.now(dt.timezone.utc).replace(second=0, microsecond=0)
+    began = time.monotonic()
+    stop = began + args.seconds
+    lags = []
+
+    await asyncio.gather(
+        _watch_loop(stop, lags),
+        *(
+            _station(store, _code(index), args, rng, start, stop)
+            for index in range(args.stations)
+        ),
+    )
+    await store.async_close()
+    elapsed = time.monotonic() - began
+
+    print(
+        f"{args.stations} stations for {elapsed:.1f}s: {store.written} rows written, "
+        f"{store.written / elapsed:,.0f} rows/s into {path}"
+    )
+    print(
+        f"Event loop lag: max {max(lags) * 1000:.1f} ms, "
+        f"mean {sum(lags) / len(lags) * 1000:.2f} ms"
+    )
+
+    connection = sqlite3.connect(path)
+    observed, inferred = connection.execute(
+        "SELECT total(actual IS NOT NULL AND NOT inferred), total(inferred) FROM calls"
+    ).fetchone()
+    connection.close()
+    print(
+        f"Actual times: {observed:.0f} observed, "
+        f"{inferred:.0f} inferred from trains leaving the boards"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stations", type=int, default=40)
+    parser.add_argument("--trains", type=int, default=20)
+    parser.add_argument("--calls", type=int, default=10)
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds")
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--database", help="SQLite file, a temporary one by default")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,350 @@
+"""Drive the TransportAPI and OJP clients end to end against a stub server
+
+    python script/stub_planners.py
+    python script/stub_planners.py --padding 5000 --chunk 64
+
+A local HTTP server answers the journey requests with canned responses,
+written in chunks of --chunk bytes so the clients parse them as they stream
+in. --padding routes or trips that break the request are added to each
+response. Every scenario checks the itineraries kept after the interchange,
+change and avoid filters and the ranking, and the run exits non-zero when
+one does not match.
+
+Needs httpx, like the integration.
+"""
+
+import argparse
+import asyncio
+import datetime as dt
+import importlib
+import json
+import os
+import sys
+import threading
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SCRIPT = os.path.dirname(os.path.abspath(__file__))
+COMPONENT = os.path.join(os.path.dirname(SCRIPT), "custom_components", "nationalrailuk")
+PACKAGE = "nationalrailuk_stub"
+
+OJP_NS = "http://www.vdv.de/ojp"
+SIRI_NS = "http://www.siri.org.uk/siri"
+
+
+def _load(name):
+    """Import a module of the integration without importing Home Assistant"""
+    if PACKAGE not in sys.modules:
+        # Stand-in package so the relative imports of the planners resolve
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [COMPONENT]
+        sys.modules[PACKAGE] = package
+    return importlib.import_module(f"{PACKAGE}.{name}")
+
+
+# TransportAPI
+
+
+def _part(origin, destination, departure, arrival, line="SW"):
+    return {
+        "mode": "train",
+        "from_point_name": origin,
+        "to_point_name": destination,
+        "departure_date": "2024-05-01",
+        "departure_time": departure,
+        "arrival_date": "2024-05-01",
+        "arrival_time": arrival,
+        "line_name": line,
+        "destination": destination,
+    }
+
+
+def _route(departure, arrival, duration, *parts):
+    return {
+        "departure_date": "2024-05-01",
+        "departure_time": departure,
+        "arrival_date": "2024-05-01",
+        "arrival_time": arrival,
+        "duration": duration,
+        "route_parts": list(parts),
+    }
+
+
+def transportapi_routes(padding):
+    """Routes from London Waterloo to Basingstoke, by label"""
+    routes = {
+        "direct": _route(
+            "10:00",
+            "10:50",
+            "00:50:00",
+            _part("London Waterloo", "Basingstoke", "10:00", "10:50"),
+        ),
+        "via_woking": _route(
+            "10:05",
+            "10:45",
+            "00:40:00",
+            _part("London Waterloo", "Woking", "10:05", "10:25"),
+            {"mode": "foot", "from_point_name": "Woking", "to_point_name": "Woking"},
+            _part("Woking", "Basingstoke", "10:33", "10:45"),
+        ),
+        "short_change": _route(
+            "10:02",
+            "10:40",
+            "00:38:00",
+            _part("London Waterloo", "Clapham Junction", "10:02", "10:10"),
+            _part("Clapham Junction", "Basingstoke", "10:13", "10:40"),
+        ),
+        "two_changes": _route(
+            "10:01",
+            "10:35",
+            "00:34:00",
+            _part("London Waterloo", "Clapham Junction", "10:01", "10:08"),
+            _part("Clapham Junction", "Woking", "10:15", "10:25"),
+            _part("Woking", "Basingstoke", "10:30", "10:35"),
+        ),
+        "later": _route(
+            "10:30",
+            "11:20",
+            "00:50:00",
+            _part("London Waterloo", "Basingstoke", "10:30", "11:20"),
+        ),
+        # Earliest of all, but its duration cannot be read so it is skipped
+        "malformed": _route(
+            "09:59",
+            "10:20",
+            "00:2l:00",
+            _part("London Waterloo", "Basingstoke", "09:59", "10:20"),
+        ),
+    }
+    # Routes breaking the change limit, parsed then dropped
+    routes.update(
+        (f"padding{index}", routes["two_changes"]) for index in range(padding)
+    )
+    return routes
+
+
+def transportapi_body(padding):
+    return json.dumps(
+        {
+            "request_time": "2024-05-01T09:59:00+01:00",
+            "routes": list(transportapi_routes(padding).values()),
+        }
+    ).encode()
+
+
+# OJP
+
+
+def _timed(board, board_name, alight, alight_name, departure, arrival):
+    return (
+        "<ojp:TripLeg><ojp:TimedLeg>"
+        f"<ojp:LegBoard><ojp:StopPointRef>{board}</ojp:StopPointRef>"
+        f"<ojp:StopPointName><ojp:Text>{board_name}</ojp:Text></ojp:StopPointName>"
+        "<ojp:ServiceDeparture>"
+        f"<ojp:TimetabledTime>2024-05-01T{departure}:00Z</ojp:TimetabledTime>"
+        "</ojp:ServiceDeparture></ojp:LegBoard>"
+        f"<ojp:LegAlight><ojp:StopPointRef>{alight}</ojp:StopPointRef>"
+        f"<ojp:StopPointName><ojp:Text>{alight_name}</ojp:Text></ojp:StopPointName>"
+        "<ojp:ServiceArrival>"
+        f"<ojp:TimetabledTime>2024-05-01T{arrival}:00Z</ojp:TimetabledTime>"
+        "</ojp:ServiceArrival></ojp:LegAlight>"
+        "<ojp:Service><ojp:OperatorRef>SW</ojp:OperatorRef>"
+        f"<ojp:DestinationText><ojp:Text>{alight_name}</ojp:Text></ojp:DestinationText>"
+        "</ojp:Service>"
+        "</ojp:TimedLeg></ojp:TripLeg>"
+    )
+
+
+def _trip(start, end, duration, *legs):
+    return (
+        "<ojp:TripResult><ojp:Trip>"
+        f"<ojp:StartTime>2024-05-01T{start}:00Z</ojp:StartTime>"
+        f"<ojp:EndTime>2024-05-01T{end}:00Z</ojp:EndTime>"
+        f"<ojp:Duration>{duration}</ojp:Duration>"
+        + "".join(legs)
+        + "</ojp:Trip></ojp:TripResult>"
+    )
+
+
+def ojp_trips(padding):
+    """Trips from London Waterloo to Basingstoke, by label"""
+    trips = {
+        "direct": _trip(
+            "10:00",
+            "10:50",
+            "PT50M",
+            _timed("WAT", "London Waterloo", "BSK", "Basingstoke", "10:00", "10:50"),
+        ),
+        "via_woking": _trip(
+            "10:05",
+            "10:45",
+            "PT40M",
+            _timed("WAT", "London Waterloo", "WOK", "Woking", "10:05", "10:25"),
+            _timed("WOK", "Woking", "BSK", "Basingstoke", "10:33", "10:45"),
+        ),
+        "short_change": _trip(
+            "10:02",
+            "10:40",
+            "PT38M",
+            _timed("WAT", "London Waterloo", "CLJ", "Clapham Jn", "10:02", "10:10"),
+            _timed("CLJ", "Clapham Jn", "BSK", "Basingstoke", "10:13", "10:40"),
+        ),
+        "later": _trip(
+            "10:30",
+            "11:20",
+            "PT50M",
+            _timed("WAT", "London Waterloo", "BSK", "Basingstoke", "10:30", "11:20"),
+        ),
+    }
+    trips.update((f"padding{index}", trips["short_change"]) for index in range(padding))
+    return trips
+
+
+def ojp_body(padding, error=False):
+    results = (
+        "<ojp:ErrorCondition><ojp:OtherError>"
+        "<ojp:Description>TRIP_NOTRIPFOUND</ojp:Description>"
+        "</ojp:OtherError></ojp:ErrorCondition>"
+        if error
+        else "".join(ojp_trips(padding).values())
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<OJP xmlns="{SIRI_NS}" xmlns:ojp="{OJP_NS}" version="1.0">'
+        "<OJPResponse><ServiceDelivery><ojp:OJPTripDelivery>"
+        f"{results}"
+        "</ojp:OJPTripDelivery></ServiceDelivery></OJPResponse></OJP>"
+    ).encode()
+
+
+# Stub server
+
+
+def serve(args):
+    """Start the stub server in a thread, return its base URL"""
+    bodies = {
+        "transportapi": transportapi_body(args.padding),
+        "ojp": ojp_body(args.padding),
+        "ojp_error": ojp_body(args.padding, error=True),
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, body, content_type):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for start in range(0, len(body), args.chunk):
+                chunk = body[start : start + args.chunk]
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"0\r\n\r\n")
+
+        def do_GET(self):  # noqa: N802
+            self._send(bodies["transportapi"], "application/json")
+
+        def do_POST(self):  # noqa: N802
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            name = "ojp_error" if self.path.endswith("/error") else "ojp"
+            self._send(bodies[name], "application/xml")
+
+        def log_message(self, *_args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def _labels(itineraries):
+    """Labels of the canned routes the itineraries came from"""
+    by_times = {}
+    for label, (departure, arrival) in TIMES.items():
+        by_times.setdefault((departure, arrival), label)
+    return [
+        by_times.get((it["departure_time"], it["arrival_time"]), "?")
+        for it in itineraries
+    ]
+
+
+TIMES = {
+    "direct": ("10:00", "10:50"),
+    "via_woking": ("10:05", "10:45"),
+    "short_change": ("10:02", "10:40"),
+    "two_changes": ("10:01", "10:35"),
+    "later": ("10:30", "11:20"),
+}
+
+
+async def main(args):
+    import httpx  # pylint: disable=import-outside-toplevel
+
+    base = _load("planner.base")
+    ranking = _load("planner.ranking")
+    transportapi = _load("planner.transportapi_client")
+    ojp = _load("planner.ojp_client")
+
+    url = serve(args)
+    transportapi.BASE_URL = f"{url}/v3/uk/public/journey"
+    when = dt.datetime(2024, 5, 1, 10, 0, tzinfo=dt.timezone.utc)
+
+    def request(**kwargs):
+        options = {"max_changes": 1, "min_interchange": 5, "count": 2}
+        options.update(kwargs)
+        return base.PlanRequest("WAT", "BSK", when, **options)
+
+    scenarios = [
+        # (name, provider, request, expected labels or the error expected)
+        ("transportapi arrival", "tapi", request(), ["via_woking", "direct"]),
+        ("transportapi avoid", "tapi", request(avoid="WOK"), ["direct", "later"]),
+        ("transportapi via", "tapi", request(via="WOK", count=3), ["via_woking"]),
+        (
+            "transportapi changes",
+            "tapi",
+            request(max_changes=2, min_interchange=2, count=1),
+            ["two_changes"],
+        ),
+        (
+            "transportapi duration",
+            "tapi",
+            request(rank=ranking.RANK_DURATION, min_interchange=2),
+            ["short_change", "via_woking"],
+        ),
+        ("ojp arrival", "ojp", request(), ["via_woking", "direct"]),
+        ("ojp avoid", "ojp", request(avoid="WOK"), ["direct", "later"]),
+        (
+            "ojp changes",
+            "ojp",
+            request(rank=ranking.RANK_CHANGES, count=3),
+            ["direct", "later", "via_woking"],
+        ),
+        ("ojp error", "ojp_error", request(), ojp.OjpError),
+    ]
+
+    failures = 0
+    async with httpx.AsyncClient(timeout=10) as client:
+        providers = {
+            "tapi": transportapi.TransportApiClient("id", "key", client),
+            "ojp": ojp.OjpClient(f"{url}/ojp", "token", client),
+            "ojp_error": ojp.OjpClient(f"{url}/ojp/error", "token", client),
+        }
+        for name, provider, plan_request, expected in scenarios:
+            try:
+                result = _labels(await providers[provider].plan(plan_request))
+            except base.PlannerError as err:
+                result = type(err)
+            ok = result == expected
+            failures += not ok
+            shown = result.__name__ if isinstance(result, type) else result
+            print(f"{'ok  ' if ok else 'FAIL'} {name}: {shown}")
+
+    print(f"{len(scenarios) - failures}/{len(scenarios)} scenarios passed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--padding", type=int, default=200)
+    parser.add_argument("--chunk", type=int, default=256, help="bytes")
+    sys.exit(asyncio.run(main(parser.parse_args())))